@@ -0,0 +1,469 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import logging
+import argparse
+import threading
+import mimetypes
+import urllib.parse
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加当前目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from wechat_article_crawler import WeChatArticleCrawler, FORMAT_MAPPING
+from config import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class ApiError(Exception):
+    """返回给调用方的请求错误，带HTTP状态码"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Job:
+    """一次提交的爬取任务（单篇或批量），结果在每篇文章完成时追加"""
+
+    def __init__(self, job_id, urls, options, folder):
+        self.id = job_id
+        self.urls = urls
+        self.options = options
+        self.folder = folder
+        self.status = QUEUED
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.results = []
+        self.counts = {"success": 0, "failed": 0, "unchanged": 0}
+        self.batch_folder = None
+        self.batch_log = None
+        self.cancel_event = threading.Event()
+        self._cond = threading.Condition()
+
+    def add_result(self, progress):
+        """batch_process 的进度回调：记录一篇文章的处理结果并唤醒等待结果的连接"""
+        record = {"index": progress["index"], **progress["entry"]}
+        # 文件路径改为相对任务目录的产物路径，可通过 /jobs/<id>/artifacts/<path> 下载
+        if "files" in record:
+            record["files"] = [[name, self.artifact_path(path)] for name, path in record["files"]]
+        if "article_folder" in record:
+            record["article_folder"] = self.artifact_path(record["article_folder"])
+        with self._cond:
+            self.results.append(record)
+            self.counts = {key: progress[key] for key in ("success", "failed", "unchanged")}
+            self._cond.notify_all()
+
+    def artifact_path(self, path):
+        return os.path.relpath(path, self.folder).replace('\\', '/')
+
+    def set_status(self, status, error=None):
+        with self._cond:
+            self.status = status
+            if error is not None:
+                self.error = error
+            if status == RUNNING:
+                self.started = time.time()
+            elif status in FINISHED_STATES:
+                self.finished = time.time()
+            self._cond.notify_all()
+
+    def wait_results(self, offset, timeout):
+        """等待 offset 之后的新结果或任务结束
+
+        Returns:
+            tuple: (新结果列表, 任务是否已结束)
+        """
+        with self._cond:
+            if len(self.results) <= offset and self.status not in FINISHED_STATES:
+                self._cond.wait(timeout)
+            return self.results[offset:], self.status in FINISHED_STATES
+
+    def to_dict(self):
+        """任务状态摘要"""
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "total": len(self.urls),
+            "done": len(self.results),
+            **self.counts,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "options": self.options
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.batch_log:
+            data["summary"] = self.artifact_path(self.batch_log)
+        return data
+
+
+class JobManager:
+    """有界任务队列和工作线程池，所有任务共用同一个爬虫实例（复用连接池）"""
+
+    def __init__(self, crawler, output_dir, workers=2, queue_size=100, max_jobs=1000):
+        """
+        Args:
+            crawler (WeChatArticleCrawler): 爬虫实例
+            output_dir (str): 任务输出根目录，每个任务使用其中的 <job_id> 子目录
+            workers (int, optional): 同时执行的任务数。默认为2。
+            queue_size (int, optional): 等待执行的任务上限，队列满时拒绝提交。默认为100。
+            max_jobs (int, optional): 保留状态的任务数上限，超出后丢弃最早结束的任务记录（输出文件保留）。默认为1000。
+        """
+        self.crawler = crawler
+        self.output_dir = output_dir
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._threads = []
+        for n in range(max(1, workers)):
+            thread = threading.Thread(target=self._worker, name=f"api-job-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, urls, options):
+        """提交任务
+
+        Returns:
+            Job: 新建的任务
+
+        Raises:
+            ApiError: 队列已满
+        """
+        job_id = uuid.uuid4().hex[:16]
+        job = Job(job_id, urls, options, os.path.join(self.output_dir, job_id))
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise ApiError(429, "任务队列已满，请稍后重试", {"Retry-After": "5"})
+            self.jobs[job_id] = job
+            self._evict()
+        logger.info(f"已提交任务 {job_id} [文章数: {len(urls)}]")
+        return job
+
+    def list_jobs(self):
+        """全部任务的状态摘要"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [job.to_dict() for job in jobs]
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ApiError(404, f"任务不存在: {job_id}")
+        return job
+
+    def cancel(self, job_id):
+        """取消任务：排队中的任务直接取消，运行中的任务不再处理新的文章"""
+        job = self.get(job_id)
+        job.cancel_event.set()
+        if job.status == QUEUED:
+            job.set_status(CANCELLED)
+        return job
+
+    def stop(self):
+        """停止工作线程（正在执行的任务完成后退出）"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _evict(self):
+        while len(self.jobs) > self.max_jobs:
+            for job_id, job in self.jobs.items():
+                if job.status in FINISHED_STATES:
+                    del self.jobs[job_id]
+                    break
+            else:
+                return
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            if job.cancel_event.is_set():
+                continue
+            job.set_status(RUNNING)
+            try:
+                # 增量模式下所有任务共用一个指纹库
+                fingerprint_db = None
+                if job.options.get("incremental"):
+                    fingerprint_db = os.path.join(self.output_dir, config.get("fingerprint_db", ".fingerprints.db"))
+                batch_result = self.crawler.batch_process(
+                    urls=job.urls,
+                    output_dir=job.folder,
+                    fingerprint_db=fingerprint_db,
+                    progress_callback=job.add_result,
+                    cancel_event=job.cancel_event,
+                    keep_results=False,
+                    # API任务不写入界面的最近使用记录，避免每条URL都改写一次 config.json
+                    record_history=False,
+                    **job.options
+                )
+                job.batch_folder = batch_result.get("batch_folder")
+                job.batch_log = batch_result.get("batch_log")
+                job.set_status(CANCELLED if batch_result.get("cancelled") else DONE)
+                logger.info(f"任务 {job.id} 完成 [成功: {batch_result['success']}/{batch_result['total']}]")
+            except Exception as e:
+                logger.error(f"任务 {job.id} 执行出错: {e}")
+                job.set_status(FAILED, str(e))
+
+
+def parse_job_request(body, max_urls):
+    """校验提交任务的请求体，返回 (urls, batch_process 参数)"""
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise ApiError(400, "请求体不是有效的JSON")
+    if not isinstance(data, dict):
+        raise ApiError(400, "请求体必须是JSON对象")
+
+    urls = data.get("urls")
+    if urls is None and data.get("url"):
+        urls = [data["url"]]
+    if not isinstance(urls, list) or not urls:
+        raise ApiError(400, "需要提供 url 或 urls")
+    if not all(isinstance(url, str) and url.startswith("http") for url in urls):
+        raise ApiError(400, "urls 必须是以 http 开头的链接")
+    if max_urls and len(urls) > max_urls:
+        raise ApiError(413, f"单个任务最多 {max_urls} 个链接")
+
+    formats = data.get("formats", ["json"])
+    if not isinstance(formats, list) or any(f not in FORMAT_MAPPING for f in formats):
+        raise ApiError(400, f"formats 可选值: {', '.join(sorted(set(FORMAT_MAPPING.values())))}")
+
+    options = {
+        "formats": formats,
+        "download_media": bool(data.get("download_media", False)),
+        "download_videos": bool(data.get("download_videos", False)),
+        "incremental": bool(data.get("incremental", False))
+    }
+    return urls, options
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """REST接口
+
+    - POST   /jobs                      提交任务，请求体 {"url": ...} 或 {"urls": [...]}，可选 formats/download_media/download_videos/incremental
+    - GET    /jobs                      任务列表
+    - GET    /jobs/<id>                 任务状态
+    - DELETE /jobs/<id>                 取消任务
+    - GET    /jobs/<id>/results         已完成的文章结果，?offset=N 跳过前N条，?stream=1 以NDJSON流式返回直到任务结束
+    - GET    /jobs/<id>/artifacts       任务产物文件列表
+    - GET    /jobs/<id>/artifacts/<path> 下载产物文件
+    - GET    /health, /metrics
+    """
+
+    manager = None
+    token = ""
+    max_urls = 1000
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _dispatch(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(p) for p in url.path.strip("/").split("/") if p]
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            if parts == ["health"]:
+                return self._send_json(200, {"status": "ok", "jobs": len(self.manager.jobs)})
+            if parts == ["metrics"]:
+                return self._send(200, metrics.REGISTRY.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            self._check_token()
+            if parts == ["jobs"] and method == "POST":
+                length = int(self.headers.get("Content-Length") or 0)
+                urls, options = parse_job_request(self.rfile.read(length), self.max_urls)
+                job = self.manager.submit(urls, options)
+                return self._send_json(202, {**job.to_dict(), "status_url": f"/jobs/{job.id}"})
+            if parts == ["jobs"] and method == "GET":
+                return self._send_json(200, {"jobs": self.manager.list_jobs()})
+            if len(parts) >= 2 and parts[0] == "jobs":
+                job = self.manager.get(parts[1])
+                if len(parts) == 2 and method == "GET":
+                    return self._send_json(200, job.to_dict())
+                if len(parts) == 2 and method == "DELETE":
+                    return self._send_json(200, self.manager.cancel(job.id).to_dict())
+                if parts[2:] == ["results"] and method == "GET":
+                    offset = query.get("offset", ["0"])[0]
+                    if not offset.isdigit():
+                        raise ApiError(400, "offset 必须是非负整数")
+                    offset = int(offset)
+                    if query.get("stream", ["0"])[0] in ("1", "true"):
+                        return self._stream_results(job, offset)
+                    return self._send_json(200, {**job.to_dict(), "results": job.results[offset:]})
+                if parts[2:3] == ["artifacts"] and method == "GET":
+                    return self._send_artifact(job, "/".join(parts[3:]))
+            raise ApiError(404, "接口不存在")
+        except ApiError as e:
+            self._send_json(e.status, {"error": e.message}, e.headers)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            logger.error(f"处理API请求出错 [{method} {self.path}]: {e}")
+            self._send_json(500, {"error": str(e)})
+
+    def _check_token(self):
+        if self.token and self.headers.get("Authorization") != f"Bearer {self.token}":
+            raise ApiError(401, "缺少或错误的访问令牌", {"WWW-Authenticate": "Bearer"})
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8", headers)
+
+    def _stream_results(self, job, offset):
+        """以NDJSON逐行推送结果，每行 {"type": "result", ...}，任务结束时以 {"type": "end", ...} 结尾"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        finished = False
+        while not finished:
+            records, finished = job.wait_results(offset, timeout=15)
+            offset += len(records)
+            lines = [{"type": "result", **record} for record in records]
+            if finished:
+                lines.append({"type": "end", **job.to_dict()})
+            elif not records:
+                # 长时间没有新结果时发送心跳，便于调用方检测连接状态
+                lines.append({"type": "heartbeat", "done": offset})
+            self.wfile.write("".join(json.dumps(line, ensure_ascii=False, default=str) + "\n" for line in lines).encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+    def _send_artifact(self, job, relative):
+        root = os.path.realpath(job.folder)
+        if not relative:
+            files = []
+            for folder, _, names in os.walk(root):
+                for name in names:
+                    path = os.path.join(folder, name)
+                    files.append({"path": job.artifact_path(path), "size": os.path.getsize(path)})
+            return self._send_json(200, {"job_id": job.id, "artifacts": sorted(files, key=lambda f: f["path"])})
+
+        path = os.path.realpath(os.path.join(root, relative))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            raise ApiError(404, f"文件不存在: {relative}")
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/json":
+            content_type += "; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(65536)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+
+def start_api_server(manager, host="127.0.0.1", port=8700, token="", max_urls=1000):
+    """在后台线程中启动REST接口
+
+    Args:
+        manager (JobManager): 任务管理器
+        host (str, optional): 监听地址。默认为"127.0.0.1"。
+        port (int, optional): 监听端口，0表示随机端口。默认为8700。
+        token (str, optional): 访问令牌，非空时 /jobs 接口需要 Authorization: Bearer <token>。默认为空。
+        max_urls (int, optional): 单个任务最多的链接数。默认为1000。
+
+    Returns:
+        ThreadingHTTPServer: 服务器实例，调用 shutdown() 停止
+    """
+    handler = type("Handler", (ApiHandler,), {"manager": manager, "token": token, "max_urls": max_urls})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="api-server", daemon=True)
+    thread.start()
+    logger.info(f"API服务已启动: http://{host}:{server.server_address[1]}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='微信文章爬虫 HTTP API 服务')
+    parser.add_argument('--host', default=config.get("api_host", "127.0.0.1"), help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=config.get("api_port", 8700), help='监听端口 (默认: 8700)')
+    parser.add_argument('--workers', type=int, default=config.get("api_workers", 2), help='同时执行的任务数 (默认: 2)')
+    parser.add_argument('--queue_size', type=int, default=config.get("api_queue_size", 100), help='等待执行的任务上限 (默认: 100)')
+    parser.add_argument('--token', default=config.get("api_token", ""), help='访问令牌，设置后请求需携带 Authorization: Bearer <token>')
+    parser.add_argument('-d', '--output_dir', default=os.path.join(config.get("output_dir", "outputs"), "api_jobs"),
+                        help='任务输出目录 (默认: outputs/api_jobs)')
+    parser.add_argument('-p', '--proxy', default=config.get("proxy", ""), help='使用代理服务器 (格式: http://127.0.0.1:7890)')
+    parser.add_argument('-r', '--retry', type=int, default=config.get("retry_times", 3), help='请求失败重试次数 (默认: 3)')
+    parser.add_argument('--timeout', type=int, default=config.get("timeout", 10), help='请求超时时间(秒) (默认: 10)')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    crawler = WeChatArticleCrawler(
+        proxy=args.proxy or None,
+        timeout=args.timeout,
+        retry_times=args.retry,
+        retry_delay=config.get("retry_delay", 2)
+    )
+    manager = JobManager(
+        crawler,
+        args.output_dir,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        max_jobs=config.get("api_max_jobs", 1000)
+    )
+    server = start_api_server(manager, args.host, args.port, args.token, config.get("api_max_urls_per_job", 1000))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        logger.info("正在停止API服务...")
+    finally:
+        server.shutdown()
+        crawler.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
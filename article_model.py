@@ -0,0 +1,177 @@
+from collections.abc import MutableMapping
+
+# Article 中尚未计算的字段
+LAZY = object()
+
+
+class MediaItem:
+    """媒体条目的基类：用 __slots__ 保存字段，按字典方式读写（值为None的字段视为不存在）
+
+    批量处理和界面中同时存在大量文章时，比每个条目一个字典节省内存；
+    to_dict() 得到与原来相同的字典结构（字段顺序与 __slots__ 一致）。
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError(f"{type(self).__name__} 不支持的字段: {', '.join(fields)}")
+
+    def __getitem__(self, key):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def __iter__(self):
+        return (name for name in self.__slots__ if getattr(self, name) is not None)
+
+    def __eq__(self, other):
+        if isinstance(other, MediaItem):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def keys(self):
+        return list(self)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class ImageItem(MediaItem):
+    """图片条目：original_url，以及 local_path（已下载）或 skipped（跳过原因）"""
+
+    __slots__ = ('original_url', 'local_path', 'skipped')
+
+
+class VideoItem(MediaItem):
+    """视频条目：type、original_url、vid（腾讯视频）、iframe_data（原始嵌入数据，可选）、
+    alternate_urls（备选链接），以及 local_path（已下载）或 skipped（跳过原因）"""
+
+    __slots__ = ('type', 'original_url', 'vid', 'iframe_data', 'alternate_urls', 'local_path', 'skipped')
+
+
+def _plain(item):
+    return item.to_dict() if isinstance(item, MediaItem) else item
+
+
+def json_default(obj):
+    """json.dump 的 default 参数：把 Article 和媒体条目转换为普通字典"""
+    if isinstance(obj, (Article, MediaItem)):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# 文章的固定字段，按原来字典的顺序排列
+ARTICLE_FIELDS = ("original_url", "permanent_url", "title", "author", "publish_time",
+                  "content_text", "full_content_text", "content_html", "media_files", "fingerprint")
+LAZY_FIELDS = ("content_text", "full_content_text", "content_html")
+
+
+class Article(MutableMapping):
+    """parse_article_page 的结果，按字典方式读写
+
+    固定字段保存在 __slots__ 中，调用方额外写入的键（如 previous_output）放在单独的字典里。
+    content_text、full_content_text、content_html 在第一次读取时才由 content 计算，之后缓存；
+    遍历、dict(result)、to_dict() 以及 pickle 得到与原来相同的字典结构（会计算全部字段）。
+    """
+
+    __slots__ = ARTICLE_FIELDS + ("_content", "_extra")
+
+    def __init__(self, content=None, **fields):
+        """
+        Args:
+            content (ArticleContent, optional): 延迟计算正文文本和HTML的对象，为None时使用"未找到文章内容"
+            **fields: ARTICLE_FIELDS 中的字段，未提供的延迟字段由 content 计算
+        """
+        for name in ARTICLE_FIELDS:
+            setattr(self, name, fields.pop(name, LAZY if name in LAZY_FIELDS else None))
+        self._content = content
+        self._extra = fields or None
+
+    def _compute(self, key):
+        if self._content is None:
+            return "未找到文章内容" if key != "content_html" else ""
+        if key == "content_html":
+            return self._content.html()
+        text = self._content.text()
+        if key == "content_text" and len(text) > 500:
+            return text[:500] + "..."  # 限制输出长度
+        return text
+
+    def __getitem__(self, key):
+        if key in ARTICLE_FIELDS:
+            value = getattr(self, key)
+            if value is LAZY:
+                value = self._compute(key)
+                setattr(self, key, value)
+            elif value is None:
+                raise KeyError(key)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in ARTICLE_FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in ARTICLE_FIELDS:
+            if getattr(self, key) is None:
+                raise KeyError(key)
+            setattr(self, key, None)
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key):
+        if key in ARTICLE_FIELDS:
+            return getattr(self, key) is not None
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for name in ARTICLE_FIELDS:
+            if getattr(self, name) is not None:
+                yield name
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Article(title={self.title!r})"
+
+    def to_dict(self):
+        """转换为普通字典（计算全部延迟字段，媒体条目转换为字典）"""
+        data = {key: self[key] for key in self}
+        media_files = data.get("media_files")
+        if media_files is not None:
+            data["media_files"] = {kind: [_plain(item) for item in items] for kind, items in media_files.items()}
+        return data
+
+    def __reduce__(self):
+        return dict, (self.to_dict(),)
@@ -0,0 +1,490 @@
+import re
+import os
+import logging
+import threading
+from bs4 import BeautifulSoup
+from article_model import Article, ImageItem, VideoItem
+from incremental import content_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def extract_permanent_url(page_url):
+    """从（重定向后的）文章URL中提取永久链接，缺少参数时返回None"""
+    biz_match = re.search(r'__biz=([^&]+)', page_url)
+    mid_match = re.search(r'mid=([^&]+)', page_url)
+    idx_match = re.search(r'idx=([^&]+)', page_url)
+    sn_match = re.search(r'sn=([^&]+)', page_url)
+
+    if biz_match and mid_match and idx_match and sn_match:
+        biz = biz_match.group(1)
+        mid = mid_match.group(1)
+        idx = idx_match.group(1)
+        sn = sn_match.group(1)
+        return f"https://mp.weixin.qq.com/s?__biz={biz}&mid={mid}&idx={idx}&sn={sn}"
+    return None
+
+
+def extract_video_info(iframe_data, keep_iframe_data=True):
+    """从iframe数据中提取视频信息
+
+    Args:
+        iframe_data (str): 视频元素的 data-src、src 或完整HTML
+        keep_iframe_data (bool, optional): 是否在结果中保留原始 iframe_data（可能是整段HTML）。默认为True。
+
+    Returns:
+        VideoItem or None: 视频信息，无法识别时返回None
+    """
+    video_info = {}
+
+    # 尝试提取视频源
+    video_url = None
+    vid = None
+
+    # 处理腾讯视频
+    vid_match = re.search(r'vid=([^&]+)', iframe_data)
+    if vid_match:
+        vid = vid_match.group(1)
+        # 修改构建腾讯视频链接的方式，使用更可靠的格式
+        video_url = f"https://v.qq.com/txp/iframe/player.html?vid={vid}"
+        video_info = {
+            'type': 'tencent',
+            'original_url': video_url,
+            'vid': vid,
+            'iframe_data': iframe_data
+        }
+
+    # 检查是否包含完整URL（常见于视频号）
+    url_match = re.search(r'(https?://[^\s"\'>]+)', iframe_data)
+    if url_match and not video_url:
+        found_url = url_match.group(1)
+        # 检查是否是视频链接
+        if 'v.qq.com' in found_url or 'video' in found_url or '.mp4' in found_url:
+            video_url = found_url
+            video_info = {
+                'type': 'embedded_url',
+                'original_url': video_url,
+                'iframe_data': iframe_data
+            }
+
+    # 处理直接包含视频源的情况
+    src_match = re.search(r'src=[\'"]([^\'"]+)[\'"]', iframe_data)
+    if src_match and not video_url:
+        src = src_match.group(1)
+        if src.endswith('.mp4') or 'video' in src:
+            video_url = src
+            video_info = {
+                'type': 'direct',
+                'original_url': video_url,
+                'iframe_data': iframe_data
+            }
+        elif 'v.qq.com' in src:
+            # 如果是腾讯视频的嵌入链接
+            video_url = src
+            # 检查是否有vid参数
+            vid_in_src = re.search(r'vid=([^&]+)', src)
+            if vid_in_src:
+                video_info = {
+                    'type': 'tencent',
+                    'original_url': video_url,
+                    'vid': vid_in_src.group(1),
+                    'iframe_data': iframe_data
+                }
+            else:
+                video_info = {
+                    'type': 'tencent_embed',
+                    'original_url': video_url,
+                    'iframe_data': iframe_data
+                }
+
+    # 如果发现了视频信息但链接可能存在问题，确保提供备选链接
+    if video_info and video_info.get('type') == 'tencent' and 'vid' in video_info:
+        # 提供多个可能的链接格式
+        video_info['alternate_urls'] = [
+            f"https://v.qq.com/txp/iframe/player.html?vid={video_info['vid']}",  # iframe嵌入播放器
+            f"https://v.qq.com/x/page/{video_info['vid']}.html",                # 常规页面
+            f"https://v.qq.com/x/cover/mzc002007knwk8q/{video_info['vid']}.html" # 带封面ID的格式
+        ]
+
+    if not video_info:
+        return None
+    if not keep_iframe_data:
+        del video_info['iframe_data']
+    return VideoItem(**video_info)
+
+
+def find_video_elements(content_div):
+    """查找正文中的视频元素 - 处理多种可能的视频容器"""
+    video_elements = []
+    # 1. 常规视频iframe视频
+    video_elements.extend(content_div.find_all("div", class_=lambda c: c and "video_iframe" in c))
+    # 2. iframe标签
+    video_elements.extend(content_div.find_all("iframe"))
+    # 3. video标签
+    video_elements.extend(content_div.find_all("video"))
+    # 4. 包含wxv-video类的div
+    video_elements.extend(content_div.find_all("div", class_=lambda c: c and "wxv-video" in c))
+    # 5. 微信视频号的特殊容器
+    video_elements.extend(content_div.find_all("div", class_=lambda c: c and "js_editor_wxvideo" in c))
+    # 6. 新增：处理js_video_page_wrap类
+    video_elements.extend(content_div.find_all("div", class_=lambda c: c and "js_video_page_wrap" in c))
+    return video_elements
+
+
+def get_image_url(img):
+    """获取图片URL（优先使用懒加载的 data-src）"""
+    return img.get("data-src") or img.get("src")
+
+
+class SkippedMedia:
+    """media_resolver 返回的跳过标记：媒体没有下载，reason 记录原因（会写入 media_files）"""
+
+    __slots__ = ('reason',)
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"SkippedMedia({self.reason!r})"
+
+
+class MediaMap:
+    """已下载媒体的查找表，作为 parse_article_page 的 media_resolver 使用
+
+    按图片/视频在文章中的出现顺序（position）记录本地路径或 SkippedMedia，可以跨进程传递。
+    """
+
+    def __init__(self, images=None, videos=None):
+        self.images = images or {}
+        self.videos = videos or {}
+
+    def __call__(self, kind, target, position, prefix):
+        if kind == 'img':
+            return self.images.get(position)
+        return self.videos.get(position)
+
+
+def video_placeholder(soup, video_info, local_video_path=None):
+    """生成替换视频元素的播放提示：已下载时为 <video> 标签，否则为在线播放链接"""
+    # 替换为更明显的视频播放提示
+    new_tag = soup.new_tag("div")
+    new_tag["style"] = "padding:10px; border:1px solid #ddd; background-color:#f9f9f9; margin:10px 0; text-align:center;"
+
+    # 如果成功下载视频，添加视频标签
+    if local_video_path:
+        video_tag = soup.new_tag("video")
+        video_tag["controls"] = ""
+        video_tag["width"] = "100%"
+        video_tag["style"] = "max-width:600px;"
+
+        source_tag = soup.new_tag("source")
+        source_tag["src"] = os.path.relpath(local_video_path, '.').replace('\\', '/')
+        source_tag["type"] = "video/mp4"
+
+        video_tag.append(source_tag)
+        new_tag.append(video_tag)
+
+        video_link = soup.new_tag("p")
+        video_link.string = "[已下载视频]"
+        new_tag.append(video_link)
+    elif video_info.get('type') == 'tencent':
+        video_link = soup.new_tag("a")
+        video_link["href"] = video_info['original_url']
+        video_link["target"] = "_blank"
+        video_link.string = f"[腾讯视频: {video_info['vid']}]"
+        new_tag.append(video_link)
+
+        # 如果有备选链接，添加提示
+        if 'alternate_urls' in video_info:
+            new_tag.append(soup.new_tag("br"))
+            alt_text = soup.new_tag("small")
+            alt_text.string = "若链接无效，请尝试："
+            new_tag.append(alt_text)
+
+            for i, alt_url in enumerate(video_info['alternate_urls']):
+                if i > 0:  # 跳过第一个，因为和原始链接相同
+                    new_tag.append(soup.new_tag("br"))
+                    alt_link = soup.new_tag("a")
+                    alt_link["href"] = alt_url
+                    alt_link["target"] = "_blank"
+                    alt_link.string = f"备选链接 {i}"
+                    new_tag.append(alt_link)
+    else:
+        # 其他类型视频
+        if 'original_url' in video_info and video_info['original_url'].startswith('http'):
+            video_link = soup.new_tag("a")
+            video_link["href"] = video_info['original_url']
+            video_link["target"] = "_blank"
+            video_link.string = f"[视频链接: {video_info.get('type', '未知类型')}]"
+            new_tag.append(video_link)
+        else:
+            video_text = soup.new_tag("p")
+            video_text.string = f"[视频内容: {video_info.get('type', '未知类型')}]"
+            new_tag.append(video_text)
+    return new_tag
+
+
+class ArticleContent:
+    """文章正文的延迟处理：生成视频播放提示、提取纯文本、清理HTML属性
+
+    解析时只记录正文节点和待替换的视频元素，各项处理在第一次需要时执行一次并缓存，
+    只输出JSON以外格式的调用方不再为用不到的结果付出代价。
+    """
+
+    def __init__(self, soup, content_div, pending_videos):
+        self._soup = soup
+        self._content_div = content_div
+        self._pending_videos = pending_videos
+        self._text = None
+        self._html = None
+        self._lock = threading.Lock()
+
+    def _replace_videos(self):
+        for video_div, video_info, local_video_path in self._pending_videos:
+            video_div.replace_with(video_placeholder(self._soup, video_info, local_video_path))
+        self._pending_videos = []
+
+    def text(self):
+        """正文纯文本（包含视频播放提示）"""
+        with self._lock:
+            if self._text is None:
+                self._replace_videos()
+                self._text = self._content_div.get_text(separator="\n", strip=True)
+                if self._html is not None:
+                    self._release()
+            return self._text
+
+    def html(self):
+        """去除多余属性、只保留基本结构的正文HTML"""
+        with self._lock:
+            if self._html is None:
+                self._replace_videos()
+                for tag in self._content_div.find_all(True):
+                    attrs = dict(tag.attrs)
+                    for attr in attrs:
+                        if attr not in ['src', 'href', 'alt', 'width', 'height', 'style', 'target']:
+                            del tag[attr]
+                self._html = str(self._content_div)
+                # 文本和HTML都已生成后不再需要解析树
+                if self._text is not None:
+                    self._release()
+            return self._html
+
+    def _release(self):
+        self._soup = None
+        self._content_div = None
+
+
+def parse_article_page(page, url, final_url=None, media_resolver=None, track_fingerprint=False,
+                       previous_fingerprint=None, scan_only=False, image_filter=None, keep_iframe_data=True):
+    """解析文章页面，提取标题、作者、发布时间、正文和媒体信息
+
+    纯CPU操作，不访问网络，可以在进程池中执行。需要下载的媒体通过 media_resolver 回调获取本地路径。
+
+    Args:
+        page (bytes or str): 文章页面的原始HTML（bytes按UTF-8解码）
+        url (str): 请求的文章URL
+        final_url (str, optional): 重定向后的URL，用于提取永久链接。默认与url相同。
+        media_resolver (callable, optional): 媒体回调 resolver(kind, target, position, prefix)，
+            kind 为 'img'（target为图片URL）或 'video'（target为 VideoItem），返回本地路径、None，
+            或 SkippedMedia（记录为跳过）。为None时不下载任何媒体。默认为None。
+        track_fingerprint (bool, optional): 是否计算内容指纹并写入结果。默认为False。
+        previous_fingerprint (str, optional): 上次记录的指纹，一致时直接返回带 "unchanged" 标记的简要信息。
+        scan_only (bool, optional): 只扫描媒体，返回图片URL和视频信息列表，不生成正文。默认为False。
+        image_filter (ImageFilter, optional): 下载媒体时的图片筛选规则，被跳过的图片不交给 media_resolver，
+            在 media_files 中记录为跳过；其余图片按规则改为限宽版本的地址下载。默认为None。
+        keep_iframe_data (bool, optional): 视频信息中是否保留原始 iframe_data。默认为True。
+
+    Returns:
+        Article or dict: 文章信息；文章访问受限时返回带 "error" 的字典
+    """
+    if isinstance(page, bytes):
+        page = page.decode('utf-8', errors='replace')
+    final_url = final_url or url
+
+    # 解析页面内容
+    soup = BeautifulSoup(page, 'html.parser')
+
+    # 提取文章标题
+    title = soup.select_one("#activity-name")
+    title_text = title.text.strip() if title else "未找到标题"
+
+    # 检查是否找到内容，如果标题为"未找到标题"，可能是文章已被删除或者访问受限
+    if title_text == "未找到标题":
+        # 尝试查找其他可能的错误信息
+        error_msg = soup.select_one(".weui-msg__title") or soup.select_one(".tips")
+        if error_msg:
+            error_text = error_msg.text.strip()
+            logger.error(f"文章访问受限: {error_text}")
+            return {
+                "error": True,
+                "message": error_text,
+                "original_url": url
+            }
+
+    # 提取文章作者
+    author = soup.select_one("#js_name") or soup.select_one(".wx_article_info .wx_article_info_one span:first-child")
+    author_text = author.text.strip() if author else "未找到作者"
+
+    # 提取发布时间
+    publish_time = soup.select_one("#publish_time") or soup.select_one("#js_publish_time") or soup.select_one(".wx_article_info_one span.time")
+    publish_time_text = publish_time.text.strip() if publish_time else "未找到发布时间"
+
+    # 提取永久链接参数（如果有）
+    permanent_url = extract_permanent_url(final_url)
+
+    # 创建用于存储媒体文件的字典
+    media_files = {
+        'images': [],
+        'videos': []
+    }
+
+    # 创建用于文章标识的安全文件名前缀
+    safe_prefix = re.sub(r'[^\w\s-]', '', title_text).replace(' ', '_')
+    if len(safe_prefix) > 50:
+        safe_prefix = safe_prefix[:50]
+
+    # 提取文章内容
+    content_div = soup.select_one("#js_content")
+    if not content_div:
+        logger.warning("未找到文章内容区域，尝试其他选择器")
+        content_div = soup.select_one(".rich_media_content") or soup.select_one(".wx_article_content")
+
+    # 增量模式：内容指纹未变化时跳过媒体下载和后续处理
+    fingerprint = None
+    if track_fingerprint or previous_fingerprint:
+        fingerprint = content_fingerprint(title_text, content_div)
+        if previous_fingerprint and previous_fingerprint == fingerprint:
+            logger.info(f"文章内容未变化，跳过处理: {title_text}")
+            return {
+                "unchanged": True,
+                "original_url": url,
+                "permanent_url": permanent_url if permanent_url else url,
+                "title": title_text,
+                "author": author_text,
+                "publish_time": publish_time_text,
+                "fingerprint": fingerprint
+            }
+
+    # 只扫描媒体：供进程池模式在下载媒体前使用
+    if scan_only:
+        images = []
+        videos = []
+        if content_div:
+            # 被筛选规则跳过的图片保留位置（None），与完整解析时的图片编号一致
+            for img in content_div.find_all("img"):
+                img_url = get_image_url(img)
+                if not img_url:
+                    continue
+                if image_filter is None:
+                    images.append(img_url)
+                elif image_filter.check(img_url, img):
+                    images.append(None)
+                else:
+                    images.append(image_filter.variant_url(img_url, img))
+            for mpvoice in content_div.find_all("mpvoice"):
+                mpvoice.extract()
+            for video_div in find_video_elements(content_div):
+                iframe_data = video_div.get("data-src") or video_div.get("src") or str(video_div)
+                video_info = extract_video_info(iframe_data, keep_iframe_data) if iframe_data else None
+                if video_info:
+                    videos.append(video_info)
+        return {
+            "scan": True,
+            "original_url": url,
+            "permanent_url": permanent_url if permanent_url else url,
+            "title": title_text,
+            "safe_prefix": safe_prefix,
+            "fingerprint": fingerprint,
+            "images": images,
+            "videos": videos
+        }
+
+    if content_div:
+        # 处理所有图片
+        img_position = 0
+        for img in content_div.find_all("img"):
+            # 获取图片URL
+            img_url = None
+            if img.get("data-src"):
+                img_url = img["data-src"]
+                img["src"] = img_url  # 更新src属性
+            elif img.get("src"):
+                img_url = img["src"]
+
+            # 如果需要下载图片
+            if media_resolver and img_url:
+                download_url = img_url
+                if image_filter is not None:
+                    reason = image_filter.check(img_url, img)
+                    if reason:
+                        img_position += 1
+                        media_files['images'].append(ImageItem(original_url=img_url, skipped=reason))
+                        continue
+                    download_url = image_filter.variant_url(img_url, img)
+                local_path = media_resolver('img', download_url, img_position, safe_prefix)
+                img_position += 1
+                if isinstance(local_path, SkippedMedia):
+                    media_files['images'].append(ImageItem(original_url=img_url, skipped=local_path.reason))
+                elif local_path:
+                    # 将本地路径添加到图片列表
+                    media_files['images'].append(ImageItem(original_url=img_url, local_path=local_path))
+                    # 修改HTML中的图片路径（相对路径）
+                    img["src"] = os.path.relpath(local_path, '.').replace('\\', '/')
+
+        # 处理所有视频
+        video_position = 0
+        pending_videos = []
+        # 删除音频元素，因为难以提取
+        for mpvoice in content_div.find_all("mpvoice"):
+            mpvoice.extract()
+
+        # 查找视频元素 - 处理多种可能的视频容器
+        video_elements = find_video_elements(content_div)
+
+        logger.info(f"找到 {len(video_elements)} 个视频元素")
+
+        for video_div in video_elements:
+            # 尝试获取视频URL
+            iframe_data = video_div.get("data-src") or video_div.get("src") or str(video_div)
+
+            # 提取视频元素
+            if iframe_data:
+                # 提取视频信息
+                video_info = extract_video_info(iframe_data, keep_iframe_data)
+
+                if video_info:
+                    # 如果需要下载视频
+                    local_video_path = None
+                    if media_resolver:
+                        local_video_path = media_resolver('video', video_info, video_position, safe_prefix)
+                        if isinstance(local_video_path, SkippedMedia):
+                            # 超出媒体预算等原因未下载，保留在线播放链接
+                            video_info['skipped'] = local_video_path.reason
+                            local_video_path = None
+                        elif local_video_path:
+                            video_info['local_path'] = local_video_path
+
+                    # 收集视频信息，播放提示在首次读取正文时再生成
+                    media_files['videos'].append(video_info)
+                    pending_videos.append((video_div, video_info, local_video_path))
+                    video_position += 1
+
+        content = ArticleContent(soup, content_div, pending_videos)
+    else:
+        content = None
+
+    # 返回结果：正文文本和清理后的HTML在首次读取时才计算
+    return Article(
+        content,
+        original_url=url,
+        permanent_url=permanent_url if permanent_url else url,
+        title=title_text,
+        author=author_text,
+        publish_time=publish_time_text,
+        media_files=media_files,
+        fingerprint=fingerprint or None
+    )
@@ -0,0 +1,358 @@
+import os
+import re
+import json
+import logging
+from bs4 import BeautifulSoup
+from article_parser import parse_article_page
+from article_model import json_default
+from deadline import DEADLINE_REASON
+from media_queue import DEFERRED_REASON
+from image_filter import is_filtered
+
+logger = logging.getLogger(__name__)
+
+# 输出格式：(内部名称, 显示名称, 扩展名)，顺序即文件保存顺序
+OUTPUT_FORMATS = [
+    ("json", "JSON", ".json"),
+    ("text", "文本", ".txt"),
+    ("html", "HTML", ".html"),
+    ("markdown", "Markdown", ".md"),
+]
+
+
+def count_images(images):
+    """统计文章图片：(保留的图片数, 被筛选规则跳过的装饰性图片数)"""
+    filtered = sum(1 for item in images if is_filtered(item.get('skipped')))
+    return len(images) - filtered, filtered
+
+
+def render_text(result):
+    """生成纯文本输出"""
+    parts = [
+        f"标题: {result['title']}\n",
+        f"作者: {result['author']}\n",
+        f"发布时间: {result['publish_time']}\n",
+        f"链接: {result['permanent_url']}\n\n",
+    ]
+
+    # 添加视频信息
+    if result['media_files']['videos']:
+        parts.append("视频链接:\n")
+        for i, video in enumerate(result['media_files']['videos']):
+            if 'local_path' in video:
+                parts.append(f"视频 {i+1}: 已下载到 {video['local_path']}\n")
+            elif 'original_url' in video:
+                parts.append(f"视频 {i+1}: {video['original_url']}\n")
+        parts.append("\n")
+
+    parts.append(result['full_content_text'])
+    return "".join(parts)
+
+
+def render_html(result, html_path, show_media_info=False):
+    """生成HTML输出
+
+    Args:
+        result (dict): 文章信息字典
+        html_path (str): HTML文件路径，用于计算本地视频的相对路径
+        show_media_info (bool, optional): 是否附加媒体文件统计。默认为False。
+    """
+    # 媒体文件统计中只计保留的图片，被筛选规则跳过的装饰性图片单独列出
+    image_count, filtered_count = count_images(result['media_files']['images'])
+
+    # 准备视频HTML部分
+    videos_html = ""
+    if result['media_files']['videos']:
+        videos_html = "<div class='video-links'><h3>视频链接</h3><ul>"
+        for i, video in enumerate(result['media_files']['videos']):
+            videos_html += f"<li>"
+
+            # 如果视频已下载，添加视频播放器
+            if 'local_path' in video:
+                local_path = os.path.relpath(video['local_path'], os.path.dirname(html_path)).replace('\\', '/')
+                videos_html += f"""
+                <div>
+                    <video controls style="max-width:100%; height:auto;">
+                        <source src="{local_path}" type="video/mp4">
+                        您的浏览器不支持视频标签
+                    </video>
+                    <p>已下载视频</p>
+                </div>
+                """
+            # 否则提供链接
+            elif 'original_url' in video:
+                videos_html += f"<a href='{video['original_url']}' target='_blank'>视频 {i+1}"
+                if 'type' in video:
+                    videos_html += f" ({video['type']})"
+                videos_html += "</a>"
+
+                # 添加备选链接
+                if 'alternate_urls' in video:
+                    videos_html += "<div style='margin-left:20px; font-size:0.9em;'><p>备选链接：</p>"
+                    for j, alt_url in enumerate(video['alternate_urls']):
+                        if j > 0:  # 跳过第一个，因为和原始链接相同
+                            videos_html += f"<a href='{alt_url}' target='_blank'>备选 {j}</a><br>"
+                    videos_html += "</div>"
+
+            videos_html += "</li>"
+        videos_html += "</ul></div>"
+
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>{result['title']}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }}
+        h1 {{ font-size: 24px; margin-bottom: 10px; }}
+        .meta {{ color: #666; margin-bottom: 20px; }}
+        img {{ max-width: 100%; height: auto; }}
+        .media-info {{ margin-top: 20px; padding: 10px; background-color: #f5f5f5; border-radius: 5px; }}
+        .video-links {{ margin-top: 20px; padding: 10px; background-color: #e9f7fe; border-radius: 5px; }}
+        .video-links h3 {{ margin-top: 0; }}
+        .video-links ul {{ padding-left: 20px; }}
+        video {{ max-width: 100%; }}
+    </style>
+</head>
+<body>
+    <h1>{result['title']}</h1>
+    <div class="meta">
+        作者: {result['author']}<br>
+        发布时间: {result['publish_time']}<br>
+        原始链接: <a href="{result['original_url']}" target="_blank">{result['original_url']}</a>
+    </div>
+    
+    {videos_html}
+    
+    <div class="content">
+        {result['content_html']}
+    </div>
+    
+    {f'''<div class="media-info">
+        <h3>媒体文件信息</h3>
+        <p>图片数量: {image_count}</p>
+        {f"<p>跳过的装饰性图片: {filtered_count}</p>" if filtered_count else ''}
+        <p>视频数量: {len(result['media_files']['videos'])}</p>
+    </div>''' if show_media_info else ''}
+</body>
+</html>"""
+
+
+def html_to_markdown(content_html):
+    """将正文HTML转换为Markdown文本"""
+    # 从BeautifulSoup对象创建
+    soup = BeautifulSoup(content_html, 'html.parser')
+
+    # 处理图片 - 确保使用正确的相对路径
+    for i, img in enumerate(soup.find_all('img')):
+        img_src = img.get('src', '')
+        img_alt = img.get('alt', f'图片{i+1}')
+
+        # 检查图片是否已下载（是否为相对路径）
+        if img_src and not img_src.startswith(('http://', 'https://', 'data:')):
+            img_md = f"![{img_alt}]({img_src})"
+        elif img_src:
+            img_md = f"![{img_alt}]({img_src})"
+        else:
+            img_md = f"![图片{i+1}](图片链接不可用)"
+
+        # 替换img标签为Markdown格式
+        img.replace_with(BeautifulSoup(img_md, 'html.parser'))
+
+    # 处理标题
+    for h in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        level = int(h.name[1])
+        h_text = h.get_text().strip()
+        h.replace_with(BeautifulSoup(f"{'#' * level} {h_text}\n\n", 'html.parser'))
+
+    # 处理段落
+    for p in soup.find_all('p'):
+        p_text = p.get_text().strip()
+        if p_text:
+            p.replace_with(BeautifulSoup(f"{p_text}\n\n", 'html.parser'))
+
+    # 处理列表
+    for ul in soup.find_all('ul'):
+        items = []
+        for li in ul.find_all('li'):
+            items.append(f"- {li.get_text().strip()}")
+        ul.replace_with(BeautifulSoup("\n".join(items) + "\n\n", 'html.parser'))
+
+    for ol in soup.find_all('ol'):
+        items = []
+        for i, li in enumerate(ol.find_all('li')):
+            items.append(f"{i+1}. {li.get_text().strip()}")
+        ol.replace_with(BeautifulSoup("\n".join(items) + "\n\n", 'html.parser'))
+
+    # 处理链接
+    for a in soup.find_all('a'):
+        href = a.get('href', '')
+        text = a.get_text().strip() or href
+        a.replace_with(BeautifulSoup(f"[{text}]({href})", 'html.parser'))
+
+    # 处理粗体和斜体
+    for strong in soup.find_all(['strong', 'b']):
+        text = strong.get_text().strip()
+        strong.replace_with(BeautifulSoup(f"**{text}**", 'html.parser'))
+
+    for em in soup.find_all(['em', 'i']):
+        text = em.get_text().strip()
+        em.replace_with(BeautifulSoup(f"*{text}*", 'html.parser'))
+
+    # 处理引用
+    for blockquote in soup.find_all('blockquote'):
+        lines = blockquote.get_text().strip().split('\n')
+        quote_text = '\n'.join([f"> {line}" for line in lines])
+        blockquote.replace_with(BeautifulSoup(quote_text + "\n\n", 'html.parser'))
+
+    # 处理分割线
+    for hr in soup.find_all('hr'):
+        hr.replace_with(BeautifulSoup("\n---\n\n", 'html.parser'))
+
+    # 获取转换后的文本
+    markdown_content = soup.get_text()
+
+    # 清理多余的空行
+    return re.sub(r'\n{3,}', '\n\n', markdown_content)
+
+
+def render_markdown(result, output_path):
+    """生成Markdown输出
+
+    Args:
+        result (dict): 文章信息字典
+        output_path (str): Markdown文件路径，用于计算本地视频的相对路径
+    """
+    parts = []
+    # 写入标题
+    parts.append(f"# {result['title']}\n\n")
+
+    # 写入元数据
+    parts.append(f"> **作者:** {result['author']}  \n")
+    parts.append(f"> **发布时间:** {result['publish_time']}  \n")
+    parts.append(f"> **原文链接:** [{result['permanent_url']}]({result['permanent_url']})  \n\n")
+
+    # 写入视频信息（如果有）
+    if result['media_files']['videos']:
+        parts.append("## 视频链接\n\n")
+        for i, video in enumerate(result['media_files']['videos']):
+            parts.append(f"### 视频 {i+1}\n")
+
+            # 如果视频已下载
+            if 'local_path' in video:
+                # 获取相对路径
+                rel_path = os.path.relpath(video['local_path'], os.path.dirname(output_path)).replace('\\', '/')
+                parts.append(f"- 本地视频: [{os.path.basename(video['local_path'])}]({rel_path})\n")
+                parts.append(f"- 播放命令: `<video controls><source src=\"{rel_path}\" type=\"video/mp4\"></video>`\n")
+
+            # 否则提供原始链接
+            if 'original_url' in video:
+                parts.append(f"- 原始链接: [{video['original_url']}]({video['original_url']})\n")
+
+            # 如果有备选链接
+            if 'alternate_urls' in video and len(video['alternate_urls']) > 1:
+                parts.append("- 备选链接:\n")
+                for j, alt_url in enumerate(video['alternate_urls']):
+                    if j > 0:  # 跳过第一个
+                        parts.append(f"  - [{alt_url}]({alt_url})\n")
+
+            parts.append("\n")
+
+        parts.append("---\n\n")
+
+    # 处理正文内容 - 转换HTML为Markdown
+    content_html = result.get('content_html', '')
+    parts.append("## 正文\n\n")
+    if content_html:
+        parts.append(html_to_markdown(content_html))
+    else:
+        # 如果没有HTML内容，直接使用纯文本
+        parts.append(result.get('full_content_text', '未找到文章内容'))
+
+    # 添加图片信息
+    if result['media_files']['images']:
+        parts.append("\n\n## 图片信息\n\n")
+        kept, filtered = count_images(result['media_files']['images'])
+        skipped = f"（另有 {filtered} 张装饰性图片未下载）" if filtered else ""
+        parts.append(f"文章共包含 {kept} 张图片{skipped}\n\n")
+
+    return "".join(parts)
+
+
+def render_article_outputs(result, article_folder, article_id, formats, show_media_info=False):
+    """按输出格式渲染文章（纯CPU操作，不写文件，可在进程池中执行）
+
+    Args:
+        result (dict): 文章信息字典
+        article_folder (str): 文章输出文件夹
+        article_id (str): 文章ID，用作文件名
+        formats (list): 已规范化的输出格式列表
+        show_media_info (bool, optional): HTML中是否附加媒体文件统计。默认为False。
+
+    Returns:
+        list: [(格式显示名称, 文件路径, 文件内容), ...]
+    """
+    outputs = []
+    for fmt, format_name, ext in OUTPUT_FORMATS:
+        if fmt not in formats:
+            continue
+        path = os.path.join(article_folder, f"{article_id}{ext}")
+        if fmt == "json":
+            content = json.dumps(result, ensure_ascii=False, indent=2, default=json_default)
+        elif fmt == "text":
+            content = render_text(result)
+        elif fmt == "html":
+            content = render_html(result, path, show_media_info)
+        else:
+            content = render_markdown(result, path)
+        outputs.append((format_name, path, content))
+    return outputs
+
+
+def summarize_article(result):
+    """提取文章的简要信息（用于汇总报告，跨进程传递时避免携带正文）"""
+    images = result['media_files']['images']
+    videos = result['media_files']['videos']
+    return {
+        "original_url": result['original_url'],
+        "permanent_url": result['permanent_url'],
+        "title": result['title'],
+        "author": result['author'],
+        "publish_time": result['publish_time'],
+        "fingerprint": result.get('fingerprint'),
+        "image_count": sum(1 for i in images if 'local_path' in i),
+        "skipped_images": sum(1 for i in images if 'skipped' in i and i['skipped'] != DEFERRED_REASON),
+        "video_count": len(videos),
+        "downloaded_videos": sum(1 for v in videos if 'local_path' in v),
+        "skipped_videos": sum(1 for v in videos if 'skipped' in v and v['skipped'] != DEFERRED_REASON),
+        # 文本优先模式下等待补全的媒体数
+        "deferred_media": sum(1 for item in images + videos if item.get('skipped') == DEFERRED_REASON),
+        # 超出处理时限时已下载的媒体照常保存，其余媒体标记跳过，文章记为未完成
+        "incomplete": any(item.get('skipped') == DEADLINE_REASON for item in images + videos)
+    }
+
+
+def parse_and_render_article(page, url, final_url, article_folder, article_id, formats, media_map=None,
+                             track_fingerprint=False, previous_fingerprint=None, show_media_info=False,
+                             image_filter=None, keep_iframe_data=True):
+    """在进程池中执行的CPU阶段：解析、清理并渲染文章
+
+    只有原始页面和渲染后的字符串跨进程传递，解析树不会离开子进程。
+
+    Returns:
+        tuple: (文章简要信息或错误/未变化字典, [(格式显示名称, 文件路径, 文件内容), ...])
+    """
+    result = parse_article_page(
+        page,
+        url,
+        final_url,
+        media_resolver=media_map,
+        track_fingerprint=track_fingerprint,
+        previous_fingerprint=previous_fingerprint,
+        image_filter=image_filter if media_map is not None else None,
+        keep_iframe_data=keep_iframe_data
+    )
+    if "error" in result or result.get("unchanged"):
+        return result, []
+    outputs = render_article_outputs(result, article_folder, article_id, formats, show_media_info)
+    return summarize_article(result), outputs
@@ -0,0 +1,382 @@
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from bs4 import BeautifulSoup
+
+# 添加当前目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from wechat_article_crawler import WeChatArticleCrawler
+from article_parser import extract_video_info
+from article_render import render_text, render_html
+
+logger = logging.getLogger(__name__)
+
+# 单个用例每轮的目标耗时（秒），据此自动确定每轮调用次数
+TARGET_ROUND_SECONDS = 0.2
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+<div class="rich_media_area_primary">
+<h1 class="rich_media_title" id="activity-name">
+{title}
+</h1>
+<div id="meta_content">
+<span class="rich_media_meta rich_media_meta_nickname" id="profileBt"><a id="js_name">{author}</a></span>
+<em id="publish_time" class="rich_media_meta rich_media_meta_text">{publish_time}</em>
+</div>
+{content_html}
+</div>
+</body>
+</html>"""
+
+
+class FakeResponse:
+    """离线基准测试使用的响应对象，提供 get_article_info 用到的属性"""
+
+    status_code = 200
+
+    def __init__(self, url, content):
+        self.url = url
+        self.content = content
+        self.encoding = 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class OfflineCrawler(WeChatArticleCrawler):
+    """网络请求被替换为本地页面的爬虫，媒体“下载”只返回路径而不写文件"""
+
+    def __init__(self, pages):
+        super().__init__()
+        self.pages = pages
+
+    def _request(self, url, method="get", **kwargs):
+        page = self.pages.get(url)
+        if page is None:
+            return None
+        return FakeResponse(url, page)
+
+    def download_media(self, url, save_folder, prefix, index, media_type='img'):
+        if not url or url.startswith('data:'):
+            return None
+        return os.path.join(save_folder, f"{prefix}_{media_type}_{index}.jpg")
+
+    def download_video(self, video_info, save_folder, prefix, index):
+        if not video_info or 'original_url' not in video_info:
+            return None
+        return os.path.join(save_folder, f"{prefix}_video_{index}.mp4")
+
+
+def _restore_remote_images(content_html, images):
+    """把已保存文章中的本地图片路径还原为微信页面中的懒加载写法（data-src 指向原始URL）"""
+    by_name = {
+        os.path.basename(image['local_path'].replace('\\', '/')): image['original_url']
+        for image in images if 'local_path' in image
+    }
+    soup = BeautifulSoup(content_html, 'html.parser')
+    for img in soup.find_all('img'):
+        src = img.get('src', '')
+        original_url = src if src.startswith('http') else by_name.get(os.path.basename(src))
+        if original_url:
+            img['data-src'] = original_url
+            img['src'] = 'data:image/gif;base64,R0lGODlhAQABAAAAACw='
+    return str(soup)
+
+
+def _video_iframes(videos):
+    """根据已保存的视频信息重建视频iframe"""
+    iframes = []
+    for video in videos:
+        iframe_data = video.get('iframe_data') or video.get('original_url')
+        if iframe_data:
+            iframes.append(f'<iframe class="video_iframe" data-src="{iframe_data}"></iframe>')
+    return ''.join(iframes)
+
+
+def load_sample_fixtures(pattern="outputs/article_*"):
+    """从已保存的文章输出（JSON）重建文章页面
+
+    Returns:
+        list: [{"name": ..., "url": ..., "page": bytes}, ...]
+    """
+    fixtures = []
+    for folder in sorted(glob.glob(pattern)):
+        for json_path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+            try:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    article = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"跳过无法读取的样本 {json_path}: {e}")
+                continue
+            if not isinstance(article, dict) or not article.get('content_html'):
+                continue
+
+            media_files = article.get('media_files', {})
+            # 保存的正文已去掉 id/class 等属性，重新包上正文容器
+            content_html = (
+                '<div class="rich_media_content" id="js_content">'
+                + _video_iframes(media_files.get('videos', []))
+                + _restore_remote_images(article['content_html'], media_files.get('images', []))
+                + '</div>'
+            )
+            page = PAGE_TEMPLATE.format(
+                title=article.get('title', ''),
+                author=article.get('author', ''),
+                publish_time=article.get('publish_time', ''),
+                content_html=content_html
+            )
+            fixtures.append({
+                "name": os.path.basename(folder),
+                "url": article.get('permanent_url') or article.get('original_url'),
+                "page": page.encode('utf-8')
+            })
+    return fixtures
+
+
+def synthetic_fixture(name="synthetic_large", images=150, videos=12, paragraphs=400):
+    """生成包含大量图片和视频的合成文章页面"""
+    video_sources = [
+        '<iframe class="video_iframe" data-src="https://v.qq.com/iframe/preview.html?vid=v00{0}abcd&width=500"></iframe>',
+        '<div class="js_editor_wxvideo" data-src="https://mp.weixin.qq.com/mp/videoplayer?video=wxv_{0}.mp4"></div>',
+        '<video src="https://mpvideo.qpic.cn/0bc3{0}.f10002.mp4"></video>',
+    ]
+    blocks = []
+    for i in range(paragraphs):
+        blocks.append(
+            f'<section style="margin: 0px 8px;"><p style="font-size: 15px; line-height: 1.75em;" data-pm-slice="{i}">'
+            f'第{i + 1}段：<strong>大模型后训练</strong>包括监督微调、偏好对齐与强化学习，'
+            f'<span style="color: rgb(0, 82, 255);">本段用于基准测试</span>，'
+            f'<a href="https://mp.weixin.qq.com/s/link{i}">相关阅读</a>。</p></section>'
+        )
+        if i % max(1, paragraphs // images) == 0 and i // max(1, paragraphs // images) < images:
+            n = i // max(1, paragraphs // images)
+            blocks.append(
+                f'<p style="text-align: center;"><img class="rich_pages wxw-img" data-ratio="0.5625" data-w="1080" '
+                f'data-type="png" data-src="https://mmbiz.qpic.cn/mmbiz_png/synthetic{n:04d}/640?wx_fmt=png&amp;from=appmsg" '
+                f'src="data:image/gif;base64,R0lGODlhAQABAAAAACw="></p>'
+            )
+        if i % max(1, paragraphs // videos) == 0 and i // max(1, paragraphs // videos) < videos:
+            n = i // max(1, paragraphs // videos)
+            blocks.append(video_sources[n % len(video_sources)].format(n))
+    content_html = '<div class="rich_media_content" id="js_content">' + ''.join(blocks) + '</div>'
+    page = PAGE_TEMPLATE.format(
+        title="合成大文章 基准测试", author="基准测试", publish_time="2025-01-01", content_html=content_html
+    )
+    return {
+        "name": name,
+        "url": f"https://mp.weixin.qq.com/s?__biz=MzBench==&mid=1&idx=1&sn={name}",
+        "page": page.encode('utf-8')
+    }
+
+
+def measure(func, repeat=5, min_time=TARGET_ROUND_SECONDS):
+    """多轮计时，返回单次调用耗时的统计（秒）"""
+    # 先调用一次预热，并估算每轮需要的调用次数
+    started = time.perf_counter()
+    func()
+    single = time.perf_counter() - started
+    number = max(1, int(min_time / single)) if single > 0 else 1000
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+        "number": number,
+        "rounds": repeat
+    }
+
+
+def build_cases(fixtures, work_dir):
+    """为每个样本生成基准测试用例
+
+    Returns:
+        list: [(用例名称, 无参函数), ...]
+    """
+    crawler = OfflineCrawler({fixture["url"]: fixture["page"] for fixture in fixtures})
+    media_folder = os.path.join(work_dir, "media")
+    cases = []
+
+    for fixture in fixtures:
+        name = fixture["name"]
+        url = fixture["url"]
+        result = crawler.get_article_info(url, download_media=True, media_folder=media_folder, download_videos=True)
+        if not result or "error" in result:
+            logger.warning(f"样本解析失败，已跳过: {name}")
+            continue
+        iframe_data = [video['iframe_data'] for video in result['media_files']['videos'] if 'iframe_data' in video]
+        md_path = os.path.join(work_dir, f"{name}.md")
+        html_path = os.path.join(work_dir, f"{name}.html")
+
+        cases.extend([
+            (f"get_article_info/{name}",
+             lambda url=url: crawler.get_article_info(url)),
+            (f"get_article_info_media/{name}",
+             lambda url=url: crawler.get_article_info(url, download_media=True, media_folder=media_folder,
+                                                      download_videos=True)),
+            (f"export_to_markdown/{name}",
+             lambda result=result, md_path=md_path: crawler.export_to_markdown(result, md_path)),
+            (f"render_html/{name}",
+             lambda result=result, html_path=html_path: render_html(result, html_path, True)),
+            (f"render_text/{name}",
+             lambda result=result: render_text(result)),
+        ])
+        if iframe_data:
+            cases.append((f"extract_video_info/{name}",
+                          lambda iframe_data=iframe_data: [extract_video_info(data) for data in iframe_data]))
+    return cases
+
+
+def run_benchmarks(pattern="outputs/article_*", synthetic=True, repeat=5, filter_text=None):
+    """运行全部基准测试
+
+    Args:
+        pattern (str, optional): 已保存文章输出的通配符。默认为"outputs/article_*"。
+        synthetic (bool, optional): 是否加入合成大文章。默认为True。
+        repeat (int, optional): 每个用例的计时轮数。默认为5。
+        filter_text (str, optional): 只运行名称包含该文本的用例。默认为None。
+
+    Returns:
+        dict: 基准测试结果，可直接保存为JSON
+    """
+    fixtures = load_sample_fixtures(pattern)
+    if synthetic:
+        fixtures.append(synthetic_fixture())
+    if not fixtures:
+        raise ValueError(f"没有找到可用的样本: {pattern}")
+
+    # 屏蔽爬虫的逐条日志，避免日志输出计入耗时
+    previous_level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory(prefix="wechat_bench_") as work_dir:
+            results = {}
+            for name, func in build_cases(fixtures, work_dir):
+                if filter_text and filter_text not in name:
+                    continue
+                results[name] = measure(func, repeat=repeat)
+                print(f"{name:<60} {results[name]['min'] * 1000:10.3f} ms")
+    finally:
+        logging.getLogger().setLevel(previous_level)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": _git_commit(),
+            "fixtures": [fixture["name"] for fixture in fixtures]
+        },
+        "cases": results
+    }
+
+
+def compare_results(baseline, current, threshold=0.1):
+    """比较两次基准测试结果（按最小耗时）
+
+    Args:
+        baseline (dict): 基线结果
+        current (dict): 当前结果
+        threshold (float, optional): 判定为性能回退的相对变慢比例。默认为0.1（10%）。
+
+    Returns:
+        tuple: (比较结果行列表, 回退的用例名称列表)
+    """
+    rows = []
+    regressions = []
+    for name in sorted(set(baseline["cases"]) | set(current["cases"])):
+        old = baseline["cases"].get(name)
+        new = current["cases"].get(name)
+        if old is None or new is None:
+            rows.append((name, old and old["min"], new and new["min"], None, "新增" if old is None else "缺失"))
+            continue
+        change = new["min"] / old["min"] - 1 if old["min"] else 0.0
+        if change > threshold:
+            status = "回退"
+            regressions.append(name)
+        elif change < -threshold:
+            status = "提升"
+        else:
+            status = "持平"
+        rows.append((name, old["min"], new["min"], change, status))
+    return rows, regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=current_dir, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='微信文章爬虫离线基准测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='运行基准测试并保存结果')
+    run_parser.add_argument('-o', '--output', default='benchmark_results.json', help='结果文件 (默认: benchmark_results.json)')
+    run_parser.add_argument('--samples', default='outputs/article_*', help='已保存文章输出的通配符 (默认: outputs/article_*)')
+    run_parser.add_argument('--no_synthetic', action='store_true', help='不加入合成大文章')
+    run_parser.add_argument('--repeat', type=int, default=5, help='每个用例的计时轮数 (默认: 5)')
+    run_parser.add_argument('-k', '--filter', help='只运行名称包含该文本的用例')
+
+    compare_parser = subparsers.add_parser('compare', help='比较两次基准测试结果')
+    compare_parser.add_argument('baseline', help='基线结果文件')
+    compare_parser.add_argument('current', help='当前结果文件')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='判定为回退的变慢比例 (默认: 0.1)')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run_benchmarks(args.samples, not args.no_synthetic, args.repeat, args.filter)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n基准测试结果已保存到: {args.output}")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, 'r', encoding='utf-8') as f:
+        current = json.load(f)
+    rows, regressions = compare_results(baseline, current, args.threshold)
+
+    print(f"{'用例':<60} {'基线(ms)':>12} {'当前(ms)':>12} {'变化':>9}  结论")
+    for name, old, new, change, status in rows:
+        change_text = "-" if change is None else f"{change * 100:+.1f}%"
+        print(f"{name:<60} {_format_ms(old):>12} {_format_ms(new):>12} {change_text:>9}  {status}")
+
+    if regressions:
+        print(f"\n{len(regressions)} 个用例性能回退超过 {args.threshold * 100:.0f}%")
+        return 1
+    print("\n没有发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
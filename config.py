@@ -1,10 +1,13 @@
 import os
 import json
 import time
+import threading
 
 class Config:
     def __init__(self, config_path="config.json"):
         self.config_path = config_path
+        # 多个批量任务可能同时更新历史记录并保存配置
+        self._lock = threading.RLock()
         # 默认配置
         self.default_config = {
             "output_dir": "outputs",
@@ -13,12 +16,71 @@ class Config:
             "download_media": True,
             "download_videos": False,
             "proxy": "",
+            "proxy_pool": [],
+            "proxy_pin_hosts": False,
+            "proxy_max_failures": 3,
+            "proxy_quarantine_seconds": 300,
+            "proxy_max_quarantine_seconds": 3600,
             "retry_times": 3,
             "retry_delay": 2,
+            "retry_after_max": 60,
+            "retry_budget_tokens": 100,
+            "retry_budget_ratio": 0.1,
             "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
             "timeout": 10,
+            "connect_timeout": 5,
+            "article_deadline": 0,
             "last_used_urls": [],
-            "max_url_history": 10
+            "max_url_history": 10,
+            "incremental": False,
+            "fingerprint_db": ".fingerprints.db",
+            "dedupe_capacity": 100000000,
+            "dedupe_memory_items": 1000000,
+            "dedupe_error_rate": 0.001,
+            "cpu_workers": 0,
+            "pipeline": False,
+            "pipeline_workers": {"fetch": 8, "parse": 2, "media": 8, "render": 2, "write": 2},
+            "pipeline_queue_size": 16,
+            "pipeline_max_inflight_mb": 256,
+            "metrics_port": 0,
+            "metrics_host": "127.0.0.1",
+            "profile_interval_ms": 5,
+            "profile_top": 30,
+            "trace_max_events": 1000000,
+            "http_pool_size": 32,
+            "http2": False,
+            "crawler_cache_size": 4,
+            "result_cache_size": 64,
+            "result_cache_ttl": 3600,
+            "api_host": "127.0.0.1",
+            "api_port": 8700,
+            "api_workers": 2,
+            "api_queue_size": 100,
+            "api_max_jobs": 1000,
+            "api_max_urls_per_job": 1000,
+            "api_token": "",
+            "schedule_db": ".schedule.db",
+            "schedule_min_interval_hours": 1,
+            "schedule_max_interval_hours": 720,
+            "schedule_initial_interval_hours": 24,
+            "schedule_requests_per_hour": 600,
+            "schedule_batch_size": 50,
+            "image_filter": False,
+            "image_min_width": 60,
+            "image_min_ratio": 0.05,
+            "image_skip_formats": [],
+            "image_skip_classes": ["emoji"],
+            "image_skip_url_patterns": ["/mpres/htmledition/images/icon/"],
+            "image_probe": True,
+            "image_max_width": 0,
+            "media_max_file_mb": 0,
+            "media_max_article_mb": 0,
+            "media_max_batch_mb": 0,
+            "defer_media": False,
+            "hydrate_workers": 2,
+            "keep_iframe_data": True,
+            "warc_max_file_mb": 1024,
+            "warc_queue_size": 1000
         }
         # 加载配置
         self.config = self.load_config()
@@ -38,7 +100,7 @@ class Config:
     def save_config(self):
         """保存配置到文件"""
         try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
+            with self._lock, open(self.config_path, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, ensure_ascii=False, indent=2)
             return True
         except Exception as e:
@@ -61,16 +123,17 @@ class Config:
         if not url:
             return
             
-        urls = self.config.get("last_used_urls", [])
-        # 如果URL已存在，先移除
-        if url in urls:
-            urls.remove(url)
-        # 添加到列表开头
-        urls.insert(0, url)
-        # 限制历史记录数量
-        max_history = self.config.get("max_url_history", 10)
-        self.config["last_used_urls"] = urls[:max_history]
-        self.save_config()
+        with self._lock:
+            urls = self.config.get("last_used_urls", [])
+            # 如果URL已存在，先移除
+            if url in urls:
+                urls.remove(url)
+            # 添加到列表开头
+            urls.insert(0, url)
+            # 限制历史记录数量
+            max_history = self.config.get("max_url_history", 10)
+            self.config["last_used_urls"] = urls[:max_history]
+            self.save_config()
 
 # 创建全局配置实例
 config = Config() 
\ No newline at end of file
@@ -0,0 +1,55 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# 超出文章处理时限而未下载的媒体在 media_files 中记录的跳过原因
+DEADLINE_REASON = "超出文章处理时限"
+
+_local = threading.local()
+
+
+class Deadline:
+    """单篇文章的处理时限（墙钟时间），覆盖页面请求、重试等待和全部媒体下载"""
+
+    def __init__(self, seconds=0):
+        """
+        Args:
+            seconds (float, optional): 从现在起的秒数，0表示不限制。默认为0。
+        """
+        self.seconds = seconds or 0
+        self.expires = time.monotonic() + self.seconds if self.seconds else None
+
+    def remaining(self):
+        """剩余秒数，不限制时返回None"""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.expires is not None and time.monotonic() >= self.expires
+
+
+@contextmanager
+def active(deadline):
+    """在当前线程内启用文章的处理时限（流水线中同一篇文章的各阶段线程传入同一个对象）"""
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+
+def current():
+    """当前线程启用的处理时限，没有时返回None"""
+    return getattr(_local, "deadline", None)
+
+
+def clip_timeout(timeout, remaining):
+    """把 requests 的超时参数（秒数或 (连接, 读取) 元组）限制在剩余时间内"""
+    if remaining is None:
+        return timeout
+    remaining = max(remaining, 0.01)
+    if isinstance(timeout, tuple):
+        return tuple(remaining if value is None else min(value, remaining) for value in timeout)
+    return remaining if timeout is None else min(timeout, remaining)
@@ -0,0 +1,169 @@
+import ssl
+import logging
+import threading
+import urllib.parse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+_HTTP_VERSIONS = {"HTTP/2": 20, "HTTP/1.1": 11, "HTTP/1.0": 10}
+
+
+def available():
+    """是否安装了 HTTP/2 所需的依赖（pip install "httpx[http2]"）"""
+    return httpx is not None
+
+
+def _timeout(value):
+    """requests 的超时参数（秒数或 (连接, 读取) 元组）转换为 httpx.Timeout"""
+    if isinstance(value, tuple):
+        connect, read = value
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(value)
+
+
+def _convert_error(error):
+    """把 httpx 的异常转换为对应的 requests 异常，重试策略按同一套类型判断"""
+    if isinstance(error, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(str(error))
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.ReadTimeout(str(error))
+    if isinstance(error, httpx.ProxyError):
+        return requests.exceptions.ProxyError(str(error))
+    if isinstance(error, httpx.ConnectError):
+        cause = error.__context__
+        while cause is not None and not isinstance(cause, ssl.SSLError):
+            cause = cause.__context__
+        if cause is not None:
+            return requests.exceptions.SSLError(str(error))
+        return requests.exceptions.ConnectionError(str(error))
+    if isinstance(error, httpx.DecodingError):
+        return requests.exceptions.ContentDecodingError(str(error))
+    if isinstance(error, (httpx.ReadError, httpx.WriteError, httpx.RemoteProtocolError)):
+        return requests.exceptions.ChunkedEncodingError(str(error))
+    if isinstance(error, httpx.TooManyRedirects):
+        return requests.exceptions.TooManyRedirects(str(error))
+    if isinstance(error, httpx.UnsupportedProtocol):
+        return requests.exceptions.InvalidSchema(str(error))
+    if isinstance(error, httpx.InvalidURL):
+        return requests.exceptions.InvalidURL(str(error))
+    return requests.exceptions.RequestException(str(error))
+
+
+class _RawStream:
+    """供 requests.Response 使用的原始响应流，iter_content 和 close 通过它读取和关闭 httpx 响应"""
+
+    def __init__(self, response):
+        self._response = response
+        self.version = _HTTP_VERSIONS.get(response.http_version, 11)
+
+    def stream(self, chunk_size, decode_content=True):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.HTTPError as e:
+            raise _convert_error(e) from e
+
+    def close(self):
+        self._response.close()
+
+
+def _to_requests_response(response, stream):
+    """把 httpx 响应包装为 requests.Response，调用方（重试、流式下载、WARC记录）无需区分传输方式"""
+    result = requests.Response()
+    result.status_code = response.status_code
+    result.headers = CaseInsensitiveDict(response.headers.items())
+    result.url = str(response.url)
+    result.reason = response.reason_phrase
+    result.encoding = get_encoding_from_headers(result.headers)
+    result.raw = _RawStream(response)
+    request = response.request
+    result.request = requests.Request(request.method, str(request.url), headers=dict(request.headers)).prepare()
+    result.history = [_to_requests_response(item, False) for item in response.history]
+    if not stream:
+        result._content = response.read()
+        result._content_consumed = True
+        response.close()
+    return result
+
+
+class Http2Client:
+    """基于 httpx 的 HTTP/2 传输，接口与 requests.Session 的 get/post 相同，返回 requests.Response
+
+    同一主机的并发请求（如流水线媒体阶段多个线程下载 mmbiz.qpic.cn 上的图片）复用一条连接多路传输。
+    HTTPS 通过 ALPN 协商协议，服务器不支持 HTTP/2 时自动使用 HTTP/1.1；http:// 地址、
+    httpx 不支持的参数或代理（如缺少 socksio 的 SOCKS 代理），以及出现协议错误的主机改用 fallback 会话。
+    """
+
+    def __init__(self, fallback, pool_size=32, verify=True):
+        """
+        Args:
+            fallback (requests.Session): 无法使用 HTTP/2 时使用的会话
+            pool_size (int, optional): 每个客户端的最大连接数。默认为32。
+            verify (bool or str, optional): 证书校验，同 requests 的 verify。默认为True。
+        """
+        self.fallback = fallback
+        self.pool_size = pool_size
+        self.verify = verify
+        self._clients = {}
+        self._http1_hosts = set()
+        self._lock = threading.Lock()
+
+    def _client(self, proxy):
+        """按代理地址缓存的 httpx 客户端，创建失败（缺少代理依赖等）时返回None"""
+        with self._lock:
+            if proxy not in self._clients:
+                try:
+                    self._clients[proxy] = httpx.Client(
+                        http2=True,
+                        verify=self.verify,
+                        proxy=proxy,
+                        follow_redirects=True,
+                        limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                    )
+                except Exception as e:
+                    logger.warning(f"无法创建HTTP/2客户端，使用HTTP/1.1 [代理: {proxy}, 错误: {e}]")
+                    self._clients[proxy] = None
+            return self._clients[proxy]
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, headers=None, proxies=None, timeout=None, stream=False, **kwargs):
+        parts = urllib.parse.urlsplit(url)
+        client = None
+        if parts.scheme == "https" and parts.netloc not in self._http1_hosts and not kwargs:
+            client = self._client((proxies or {}).get("https"))
+        if client is None:
+            return self.fallback.request(method, url, headers=headers, proxies=proxies, timeout=timeout,
+                                         stream=stream, **kwargs)
+        try:
+            request = client.build_request(method, url, headers=headers, timeout=_timeout(timeout))
+            response = client.send(request, stream=stream)
+        except httpx.RemoteProtocolError as e:
+            # 协议层出错（服务器的 HTTP/2 实现有问题等），该主机之后改用 HTTP/1.1
+            logger.warning(f"HTTP/2请求出错，主机 {parts.netloc} 改用HTTP/1.1 [错误: {e}]")
+            self._http1_hosts.add(parts.netloc)
+            return self.fallback.request(method, url, headers=headers, proxies=proxies, timeout=timeout,
+                                         stream=stream, **kwargs)
+        except httpx.HTTPError as e:
+            raise _convert_error(e) from e
+        return _to_requests_response(response, stream)
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                if client is not None:
+                    client.close()
+            self._clients.clear()
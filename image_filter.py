@@ -0,0 +1,181 @@
+import struct
+import logging
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+# 微信图片CDN的域名，这些地址的最后一段路径是宽度（0表示原图）
+MMBIZ_HOSTS = ('mmbiz.qpic.cn', 'mmbiz.qlogo.cn')
+
+# 筛选规则跳过的图片在 skipped 中记录的原因前缀，与媒体预算、处理时限等其他跳过原因区分
+FILTER_REASON = "装饰性图片"
+
+# 探测图片尺寸时最多读取的字节数（JPEG的尺寸信息可能位于较大的EXIF之后）
+PROBE_BYTES = 64 * 1024
+
+
+def image_size(data):
+    """从图片文件开头的字节中解析宽高，支持 PNG、GIF、JPEG、WebP
+
+    Args:
+        data (bytes): 文件开头的字节
+
+    Returns:
+        tuple or None: (宽, 高)，数据不足或格式不支持时返回None
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n') and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    if data.startswith(b'RIFF') and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3fff, height & 0x3fff
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        return None
+    if data.startswith(b'\xff\xd8'):
+        # 依次跳过JPEG段，直到帧头（SOF0-SOF15，排除DHT/JPG/DAC）
+        position = 2
+        while position + 9 <= len(data):
+            if data[position] != 0xff:
+                return None
+            marker = data[position + 1]
+            if marker == 0xff:
+                position += 1
+                continue
+            if marker in (0xd8, 0x01) or 0xd0 <= marker <= 0xd7:
+                position += 2
+                continue
+            length = struct.unpack('>H', data[position + 2:position + 4])[0]
+            if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                height, width = struct.unpack('>HH', data[position + 5:position + 9])
+                return width, height
+            position += 2 + length
+    return None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_filtered(reason):
+    """skipped 中的跳过原因是否来自图片筛选规则"""
+    return bool(reason) and reason.startswith(FILTER_REASON)
+
+
+class ImageFilter:
+    """图片筛选规则：跳过装饰性图片（间隔图、表情、分隔线等），并请求限宽的图片版本
+
+    规则依次基于图片URL（wx_fmt、地址特征）、<img> 标签的 class 与 data-w/data-ratio 属性，
+    以及下载时文件开头字节中的实际尺寸判断。对象只包含简单属性，可以传入进程池。
+    """
+
+    def __init__(self, min_width=60, min_ratio=0.05, skip_formats=(), skip_classes=(), skip_url_patterns=(),
+                 probe=True, max_width=0):
+        """
+        Args:
+            min_width (int, optional): 宽度小于该值（像素）的图片视为装饰图。0表示不限制。默认为60。
+            min_ratio (float, optional): 高宽比小于该值的图片视为分隔线。0表示不限制。默认为0.05。
+            skip_formats (iterable, optional): 跳过的图片格式（URL中的 wx_fmt，如 "gif"）。
+            skip_classes (iterable, optional): 带有这些 class 的图片跳过（如 "emoji"）。
+            skip_url_patterns (iterable, optional): URL包含这些文本的图片跳过。
+            probe (bool, optional): 下载时根据文件开头字节中的实际尺寸再判断一次，不符合时中止下载。默认为True。
+            max_width (int, optional): 大于0时把微信图片地址改为该宽度的版本（如640），不再下载原图。默认为0。
+        """
+        self.min_width = min_width or 0
+        self.min_ratio = min_ratio or 0
+        self.skip_formats = {fmt.lower() for fmt in skip_formats}
+        self.skip_classes = set(skip_classes)
+        self.skip_url_patterns = tuple(skip_url_patterns)
+        self.probe = probe
+        self.max_width = max_width or 0
+
+    @classmethod
+    def from_config(cls, config):
+        """根据配置创建筛选规则，config["image_filter"] 为False时返回None"""
+        if not config.get("image_filter", False):
+            return None
+        return cls(
+            min_width=config.get("image_min_width", 60),
+            min_ratio=config.get("image_min_ratio", 0.05),
+            skip_formats=config.get("image_skip_formats", []),
+            skip_classes=config.get("image_skip_classes", []),
+            skip_url_patterns=config.get("image_skip_url_patterns", []),
+            probe=config.get("image_probe", True),
+            max_width=config.get("image_max_width", 0)
+        )
+
+    def check(self, url, img=None):
+        """根据URL和 <img> 标签属性判断是否跳过图片
+
+        Args:
+            url (str): 图片URL
+            img (Tag, optional): 图片标签
+
+        Returns:
+            str or None: 跳过原因，不跳过时返回None
+        """
+        for pattern in self.skip_url_patterns:
+            if pattern in url:
+                return f"{FILTER_REASON}: 地址匹配 {pattern}"
+        if self.skip_formats:
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+            fmt = (query.get('wx_fmt') or [''])[0].lower()
+            if fmt in self.skip_formats:
+                return f"{FILTER_REASON}: 格式 {fmt}"
+        if img is None:
+            return None
+
+        classes = img.get('class') or []
+        if isinstance(classes, str):
+            classes = classes.split()
+        for name in classes:
+            if name in self.skip_classes:
+                return f"{FILTER_REASON}: class {name}"
+
+        width = _number(img.get('data-w'))
+        ratio = _number(img.get('data-ratio'))
+        if width and ratio:
+            return self.check_size(width, width * ratio)
+        if width and self.min_width and width < self.min_width:
+            return f"{FILTER_REASON}: 宽度 {width:.0f}px"
+        if ratio and self.min_ratio and ratio < self.min_ratio:
+            return f"{FILTER_REASON}: 高宽比 {ratio:.3f}"
+        return None
+
+    def check_size(self, width, height):
+        """根据实际尺寸判断是否跳过图片
+
+        Returns:
+            str or None: 跳过原因，不跳过时返回None
+        """
+        if self.min_width and width < self.min_width:
+            return f"{FILTER_REASON}: 宽度 {width:.0f}px"
+        if self.min_ratio and width and height / width < self.min_ratio:
+            return f"{FILTER_REASON}: 分隔线 {width:.0f}x{height:.0f}"
+        return None
+
+    def variant_url(self, url, img=None):
+        """返回限宽版本的微信图片地址（未设置 max_width、不是微信图片或原图本身更窄时返回原地址）"""
+        if not self.max_width:
+            return url
+        parts = urllib.parse.urlsplit(url)
+        if not parts.netloc.endswith(MMBIZ_HOSTS):
+            return url
+        head, _, last = parts.path.rstrip('/').rpartition('/')
+        if not head or not last.isdigit():
+            return url
+        if last != '0' and int(last) <= self.max_width:
+            return url
+        width = _number(img.get('data-w')) if img is not None else None
+        if width and width <= self.max_width:
+            return url
+        return urllib.parse.urlunsplit(parts._replace(path=f"{head}/{self.max_width}"))
@@ -0,0 +1,187 @@
+import os
+import html
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import urllib.parse
+from bs4 import Tag, NavigableString, Comment
+
+logger = logging.getLogger(__name__)
+
+# 清理HTML时保留的属性，与 get_article_info 中的清理规则保持一致
+KEPT_ATTRS = ('src', 'href', 'alt', 'width', 'height', 'style', 'target')
+
+# 分享链接中常见的跟踪参数，不影响文章内容
+TRACKING_PARAMS = {
+    'chksm', 'scene', 'srcid', 'sharer_sharetime', 'sharer_shareid', 'sharer_shareinfo',
+    'sharer_shareinfo_first', 'from', 'isappinstalled', 'clicktime', 'enterid', 'ascene',
+    'devicetype', 'version', 'nettype', 'pass_ticket', 'wx_header', 'key', 'uin',
+    'exportkey', 'lang', 'sessionid', 'subscene', 'mpshare', 'poc_token', 'rd2werd'
+}
+
+
+def canonical_article_url(url):
+    """规范化文章URL，作为增量爬取和去重的键
+
+    - 长链接只保留 __biz/mid/idx/sn 四个参数
+    - 短链接 /s/xxx 去掉全部查询参数
+    - 其他链接去掉跟踪参数并对剩余参数排序
+    """
+    if not url:
+        return url
+    parsed = urllib.parse.urlsplit(html.unescape(url.strip()))
+    scheme = 'https' if parsed.scheme in ('http', 'https') else parsed.scheme
+    host = parsed.netloc.lower()
+    path = parsed.path.rstrip('/') or '/'
+    query = urllib.parse.parse_qs(parsed.query)
+
+    if path == '/s' and all(k in query for k in ('__biz', 'mid', 'idx', 'sn')):
+        params = [(k, query[k][0]) for k in ('__biz', 'mid', 'idx', 'sn')]
+    elif path.startswith('/s/'):
+        params = []
+    else:
+        params = sorted((k, v[0]) for k, v in query.items() if k not in TRACKING_PARAMS)
+
+    query_str = urllib.parse.urlencode(params, safe='=/+')
+    return urllib.parse.urlunsplit((scheme, host, path, query_str, ''))
+
+
+def content_fingerprint(title, content_div):
+    """计算文章内容指纹（标题 + 清理后的正文HTML）
+
+    直接遍历节点树，按清理后的结构（只保留 KEPT_ATTRS 中的属性）更新哈希，
+    避免为计算指纹而复制或序列化整棵树。图片的 data-src 视为 src。
+
+    Args:
+        title (str): 文章标题
+        content_div (Tag or None): 正文节点
+
+    Returns:
+        str: 十六进制的SHA-256指纹
+    """
+    digest = hashlib.sha256()
+    digest.update((title or '').encode('utf-8'))
+    digest.update(b'\x00')
+
+    if content_div is not None:
+        for node in content_div.descendants:
+            if isinstance(node, Tag):
+                attrs = []
+                for attr in KEPT_ATTRS:
+                    value = node.get(attr)
+                    if attr == 'src' and node.name == 'img' and node.get('data-src'):
+                        value = node['data-src']
+                    if value is not None:
+                        if isinstance(value, list):
+                            value = ' '.join(value)
+                        attrs.append(f'{attr}={value}')
+                digest.update(f"<{node.name} {' '.join(attrs)}>".encode('utf-8'))
+            elif isinstance(node, NavigableString) and not isinstance(node, Comment):
+                text = node.strip()
+                if text:
+                    digest.update(text.encode('utf-8'))
+                    digest.update(b'\x00')
+
+    return digest.hexdigest()
+
+
+class FingerprintStore:
+    """基于SQLite的文章指纹库，记录每篇文章（规范化URL）最近一次的内容指纹"""
+
+    def __init__(self, db_path):
+        """打开（或创建）指纹库
+
+        Args:
+            db_path (str): SQLite数据库文件路径
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                title TEXT,
+                output_folder TEXT,
+                first_seen REAL,
+                last_crawled REAL,
+                last_changed REAL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, url):
+        """查询文章的指纹记录
+
+        Returns:
+            dict or None: 指纹记录，不存在时返回None
+        """
+        key = canonical_article_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, title, output_folder, first_seen, last_crawled, last_changed "
+                "FROM fingerprints WHERE url = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "url": key,
+            "fingerprint": row[0],
+            "title": row[1],
+            "output_folder": row[2],
+            "first_seen": row[3],
+            "last_crawled": row[4],
+            "last_changed": row[5]
+        }
+
+    def update(self, url, fingerprint, title=None, output_folder=None):
+        """写入文章的最新指纹
+
+        Returns:
+            bool: 指纹是否发生变化（新文章也视为变化）
+        """
+        key = canonical_article_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM fingerprints WHERE url = ?", (key,)
+            ).fetchone()
+            changed = not row or row[0] != fingerprint
+            if not row:
+                self._conn.execute(
+                    "INSERT INTO fingerprints VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, fingerprint, title, output_folder, now, now, now)
+                )
+            elif changed:
+                self._conn.execute(
+                    "UPDATE fingerprints SET fingerprint = ?, title = ?, output_folder = ?, "
+                    "last_crawled = ?, last_changed = ? WHERE url = ?",
+                    (fingerprint, title, output_folder, now, now, key)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE fingerprints SET last_crawled = ? WHERE url = ?", (now, key)
+                )
+            self._conn.commit()
+        return changed
+
+    def touch(self, url):
+        """仅更新最近爬取时间（内容未变化时使用）"""
+        key = canonical_article_url(url)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE fingerprints SET last_crawled = ? WHERE url = ?", (time.time(), key)
+            )
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,112 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ByteCounter:
+    """有上限的字节计数器（线程安全），批次内的多篇文章、多个线程共用"""
+
+    def __init__(self, limit=0):
+        """
+        Args:
+            limit (int, optional): 字节上限，0表示不限制。默认为0。
+        """
+        self.limit = limit or 0
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self, nbytes):
+        """占用字节，超出上限时不占用
+
+        Returns:
+            bool: 是否占用成功
+        """
+        with self._lock:
+            if self.limit and self.used + nbytes > self.limit:
+                return False
+            self.used += nbytes
+            return True
+
+    def give_back(self, nbytes):
+        """归还预占但没有实际下载的字节"""
+        with self._lock:
+            self.used -= nbytes
+
+    def exhausted(self):
+        return bool(self.limit) and self.used >= self.limit
+
+    def remaining(self):
+        """剩余字节数，不限制时返回None"""
+        if not self.limit:
+            return None
+        return max(0, self.limit - self.used)
+
+
+def _mb(nbytes):
+    if nbytes < 1024 * 1024:
+        return f"{nbytes / 1024:.0f}KB"
+    return f"{nbytes / 1024 / 1024:.1f}MB"
+
+
+class MediaBudget:
+    """单篇文章的媒体下载预算：单个文件、本篇文章和整个批次三级字节上限
+
+    下载前按 Content-Length 预占，长度未知（或实际超出声明长度）时边下载边计数，
+    超出任一上限的文件不下载或中止下载，调用方将其记录为跳过。
+    """
+
+    def __init__(self, max_file=0, max_article=0, batch=None):
+        """
+        Args:
+            max_file (int, optional): 单个文件的字节上限，0表示不限制。默认为0。
+            max_article (int, optional): 本篇文章全部媒体的字节上限，0表示不限制。默认为0。
+            batch (ByteCounter, optional): 批次共用的计数器。默认为None（不限制）。
+        """
+        self.max_file = max_file or 0
+        self.article = ByteCounter(max_article)
+        self.batch = batch or ByteCounter()
+
+    def exhausted(self):
+        """本篇文章或批次的预算是否已用完
+
+        Returns:
+            str or None: 已用完时返回原因
+        """
+        if self.article.exhausted():
+            return f"超出单篇媒体预算 {_mb(self.article.limit)}"
+        if self.batch.exhausted():
+            return f"超出批次媒体预算 {_mb(self.batch.limit)}"
+        return None
+
+    def reserve(self, nbytes, file_total=None):
+        """预占字节
+
+        Args:
+            nbytes (int): 本次占用的字节数
+            file_total (int, optional): 占用后该文件的总字节数，用于检查单文件上限。默认等于 nbytes。
+
+        Returns:
+            str or None: 超出上限时返回原因（此时不占用），否则返回None
+        """
+        file_total = nbytes if file_total is None else file_total
+        if self.max_file and file_total > self.max_file:
+            return f"文件超过 {_mb(self.max_file)}"
+        if not self.article.take(nbytes):
+            return f"超出单篇媒体预算 {_mb(self.article.limit)}"
+        if not self.batch.take(nbytes):
+            self.article.give_back(nbytes)
+            return f"超出批次媒体预算 {_mb(self.batch.limit)}"
+        return None
+
+    def release(self, nbytes):
+        """归还预占但没有下载的字节"""
+        if nbytes > 0:
+            self.article.give_back(nbytes)
+            self.batch.give_back(nbytes)
+
+    def max_download(self):
+        """下一个文件最多允许下载的字节数（用于 yt-dlp 的 max_filesize），不限制时返回None"""
+        limits = [limit for limit in (self.max_file or None, self.article.remaining(), self.batch.remaining())
+                  if limit is not None]
+        return min(limits) if limits else None
@@ -0,0 +1,231 @@
+import os
+import json
+import queue
+import shutil
+import logging
+import threading
+
+from article_parser import SkippedMedia
+
+logger = logging.getLogger(__name__)
+
+# 文本优先模式下尚未下载的媒体在 media_files 中记录的跳过原因
+DEFERRED_REASON = "延后下载"
+# 批处理文件夹中保存待补全文章的子文件夹
+QUEUE_FOLDER = "media_queue"
+
+_STOP = object()
+
+
+class DeferredMedia:
+    """文本优先模式的 media_resolver：不下载媒体，全部记录为延后下载，输出中保留在线地址
+
+    get_article_info 会把原始页面和重定向后的URL保存在 page/final_url 中，补全时重新解析。
+    不保存页面时可以跨进程传递（流水线进程池模式的渲染阶段）。
+    """
+
+    def __init__(self, download_videos=False):
+        self.download_videos = download_videos
+        self.page = None
+        self.final_url = None
+
+    def __call__(self, kind, target, position, prefix):
+        if kind == 'img' or self.download_videos:
+            return SkippedMedia(DEFERRED_REASON)
+        return None
+
+
+class MediaQueue:
+    """待补全媒体的文章队列（线程安全）
+
+    保存在批处理文件夹的 media_queue/ 下：queue.jsonl 每行一篇文章（输出位置、媒体文件夹、输出格式等），
+    原始页面保存为 <文章ID>.html。补全成功后删除页面文件，之后的补全跳过该文章。
+    """
+
+    def __init__(self, folder, on_add=None):
+        """
+        Args:
+            folder (str): 队列文件夹
+            on_add (callable, optional): 文章加入队列后调用 on_add(folder, entry)，用于后台补全。默认为None。
+        """
+        self.folder = folder
+        self.on_add = on_add
+        self.count = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def add(self, page, url, final_url, article_id, article_folder, media_folder, formats,
+            download_videos=False, track_fingerprint=False):
+        """把已写入文本输出的文章加入队列，补全时按同样的输出位置和格式重新渲染
+
+        Args:
+            page (bytes): 文章的原始页面
+            url (str): 请求的文章URL
+            final_url (str): 重定向后的URL
+            article_id (str): 文章ID，用作输出文件名
+            article_folder (str): 文章输出文件夹
+            media_folder (str): 媒体文件保存文件夹
+            formats (list): 已规范化的输出格式列表
+            download_videos (bool, optional): 是否下载视频。默认为False。
+            track_fingerprint (bool, optional): 输出中是否包含内容指纹。默认为False。
+
+        Returns:
+            dict: 队列中的文章记录
+        """
+        entry = {
+            "article_id": article_id,
+            "url": url,
+            "final_url": final_url,
+            "article_folder": article_folder,
+            "media_folder": media_folder,
+            "formats": formats,
+            "videos": download_videos,
+            "fingerprint": track_fingerprint,
+            "page": f"{article_id}.html"
+        }
+        with open(os.path.join(self.folder, entry["page"]), 'wb') as f:
+            f.write(page)
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(os.path.join(self.folder, "queue.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+            self.count += 1
+        if self.on_add is not None:
+            self.on_add(self.folder, entry)
+        return entry
+
+
+def pending(folder):
+    """读取队列中尚未补全（页面文件仍在）的文章记录"""
+    path = os.path.join(folder, "queue.jsonl")
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if os.path.exists(os.path.join(folder, entry["page"])):
+                yield entry
+
+
+def cleanup(folder):
+    """队列中的文章全部补全后删除队列文件夹
+
+    Returns:
+        int: 仍未补全的文章数
+    """
+    remaining = sum(1 for _ in pending(folder))
+    if not remaining and os.path.isdir(folder):
+        shutil.rmtree(folder, ignore_errors=True)
+    return remaining
+
+
+def find_queues(paths):
+    """在批处理文件夹（或其上级目录）中查找媒体队列文件夹"""
+    folders = []
+    for path in paths:
+        if os.path.basename(os.path.normpath(path)) == QUEUE_FOLDER:
+            folders.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            if os.path.basename(root) == QUEUE_FOLDER and "queue.jsonl" in names:
+                folders.append(root)
+                dirs[:] = []
+    return folders
+
+
+class MediaHydrator:
+    """在后台线程中补全延后的媒体：下载媒体后重新渲染并替换已写入的输出"""
+
+    def __init__(self, crawler, workers=2, batch_bytes=None, retry_budget=None):
+        """
+        Args:
+            crawler (WeChatArticleCrawler): 用于下载媒体的爬虫
+            workers (int, optional): 补全线程数。默认为2。
+            batch_bytes (ByteCounter, optional): 批次共用的媒体字节计数器。默认为None。
+            retry_budget (RetryBudget, optional): 批次共用的重试预算。默认为None。
+        """
+        self.crawler = crawler
+        self.workers = max(1, workers)
+        self.batch_bytes = batch_bytes
+        self.retry_budget = retry_budget
+        self.hydrated = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"media-hydrate-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, folder, entry):
+        self._queue.put((folder, entry))
+
+    def stop(self):
+        """等待已提交的文章全部补全后结束"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            folder, entry = item
+            page_path = os.path.join(folder, entry["page"])
+            try:
+                with open(page_path, 'rb') as f:
+                    page = f.read()
+                result = self.crawler.hydrate_article(entry, page, self.batch_bytes, self.retry_budget)
+                if result.get("unresolved_media"):
+                    # 已下载的媒体写入了输出，仍有媒体未下载时保留页面，以后的 --hydrate 再次补全
+                    with self._lock:
+                        self.failed += 1
+                    logger.warning(f"媒体补全未完成: {result.get('title')} [未下载: {result['unresolved_media']}个, "
+                                   f"URL: {entry['url']}]")
+                    continue
+                os.remove(page_path)
+                with self._lock:
+                    self.hydrated += 1
+                logger.info(f"媒体补全完成: {result.get('title')} [图片: {result.get('image_count', 0)}张, "
+                            f"视频: {result.get('downloaded_videos', 0)}个]")
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                logger.error(f"媒体补全失败 [URL: {entry['url']}, 错误: {e}]")
+
+
+def hydrate(crawler, paths, workers=2, batch_bytes=None, retry_budget=None):
+    """单独补全以前的文本优先批次中延后的媒体
+
+    Args:
+        crawler (WeChatArticleCrawler): 用于下载媒体的爬虫
+        paths (list): 批处理文件夹、其上级目录或 media_queue 文件夹
+        workers (int, optional): 补全线程数。默认为2。
+        batch_bytes (ByteCounter, optional): 共用的媒体字节计数器。默认为None。
+        retry_budget (RetryBudget, optional): 共用的重试预算。默认为None。
+
+    Returns:
+        dict: {"hydrated", "failed", "remaining"}
+    """
+    hydrator = MediaHydrator(crawler, workers, batch_bytes, retry_budget)
+    hydrator.start()
+    folders = find_queues(paths)
+    try:
+        for folder in folders:
+            for entry in pending(folder):
+                hydrator.submit(folder, entry)
+    finally:
+        hydrator.stop()
+    remaining = sum(cleanup(folder) for folder in folders)
+    logger.info(f"媒体补全完成 [队列: {len(folders)}个, 成功: {hydrator.hydrated}篇, "
+                f"失败: {hydrator.failed}篇, 未完成: {remaining}篇]")
+    return {"hydrated": hydrator.hydrated, "failed": hydrator.failed, "remaining": remaining}
@@ -0,0 +1,325 @@
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager, ExitStack
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# 默认的延迟直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """带标签的指标基类，每组标签值对应一个子指标，子指标创建后被缓存复用"""
+
+    type_name = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def labels(self, *values):
+        """获取指定标签值的子指标"""
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    def collect(self):
+        """生成Prometheus文本格式的样本行"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._samples(values, child))
+        return lines
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self, values, child):
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "function", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """采集时调用 function() 取值，为None时恢复为普通数值"""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return 0
+        return self.value
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _samples(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"]
+
+
+class Gauge(Counter):
+    """可增可减的瞬时值，也可以在采集时通过回调取值"""
+
+    type_name = "gauge"
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """分桶直方图，用于记录延迟分布"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.upper_bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _samples(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, ("le", _format_value(float(bound))))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标已存在: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """以Prometheus文本格式输出全部指标"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# 全局注册表和爬虫使用的指标
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    "wechat_crawler_requests_total", "HTTP请求次数（每次尝试计一次），status为状态码或error", ("host", "status")
+)
+RETRIES = REGISTRY.counter("wechat_crawler_retries_total", "请求重试次数", ("host",))
+DOWNLOADED_BYTES = REGISTRY.counter(
+    "wechat_crawler_downloaded_bytes_total", "下载的字节数，kind为page/img/video", ("kind",)
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "wechat_crawler_stage_duration_seconds", "各处理阶段（fetch/parse/media/render/write）的耗时", ("stage",)
+)
+QUEUE_DEPTH = REGISTRY.gauge("wechat_crawler_queue_depth", "流水线各阶段等待处理的文章数", ("stage",))
+BYTES_IN_FLIGHT = REGISTRY.gauge("wechat_crawler_bytes_in_flight", "流水线在途数据字节数")
+ARTICLES = REGISTRY.counter(
+    "wechat_crawler_articles_total", "处理完成的文章数，result为success/failed/unchanged", ("result",)
+)
+
+
+# 阶段钩子：hook(name) 返回上下文管理器，在每个阶段内进入（性能剖析、追踪等功能开启时注册）
+_stage_hooks = ()
+
+
+def add_stage_hook(hook):
+    """注册阶段钩子"""
+    global _stage_hooks
+    _stage_hooks = _stage_hooks + (hook,)
+
+
+def remove_stage_hook(hook):
+    """移除阶段钩子"""
+    global _stage_hooks
+    _stage_hooks = tuple(h for h in _stage_hooks if h is not hook)
+
+
+@contextmanager
+def stage(name, observe=True):
+    """记录一个处理阶段的耗时，并进入已注册的阶段钩子
+
+    用法:
+        with metrics.stage("fetch"):
+            ...
+
+    Args:
+        name (str): 阶段名称
+        observe (bool, optional): 是否计入阶段耗时直方图。为False时只触发钩子，
+            用于嵌套在其他阶段中、耗时已单独统计的代码段。默认为True。
+    """
+    hooks = _stage_hooks
+    if not hooks:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if observe:
+                STAGE_SECONDS.labels(name).observe(time.perf_counter() - started)
+        return
+
+    with ExitStack() as stack:
+        for hook in hooks:
+            stack.enter_context(hook(name))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if observe:
+                STAGE_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+def record_article(entry):
+    """按处理记录统计文章成功/失败/未变化数量"""
+    if not entry["success"]:
+        ARTICLES.labels("failed").inc()
+    elif entry.get("unchanged"):
+        ARTICLES.labels("unchanged").inc()
+    else:
+        ARTICLES.labels("success").inc()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=None):
+    """在后台线程中启动 /metrics HTTP 端点
+
+    Args:
+        port (int): 监听端口
+        host (str, optional): 监听地址，默认只允许本机访问；需要被其他主机采集时显式指定（如"0.0.0.0"）。默认为"127.0.0.1"。
+        registry (Registry, optional): 指标注册表。默认为全局 REGISTRY。
+
+    Returns:
+        ThreadingHTTPServer: 服务器实例，调用 shutdown() 停止
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or REGISTRY})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"指标端点已启动: http://{host}:{server.server_address[1]}/metrics")
+    return server
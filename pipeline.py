@@ -0,0 +1,213 @@
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_STOP = object()
+
+
+class ByteBudget:
+    """按字节计量的在途数据预算，用于流水线的背压控制
+
+    只有数据进入流水线的阶段（如请求页面）在预算不足时阻塞，后续阶段的数据增减只做记账，
+    不会阻塞，避免上下游互相等待造成死锁。预算为空时单个超大条目也允许通过，保证总能前进。
+    """
+
+    def __init__(self, limit):
+        """
+        Args:
+            limit (int): 在途字节上限，0或None表示不限制
+        """
+        self.limit = limit or 0
+        self.in_flight = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes):
+        """申请字节预算，超出上限时阻塞等待其他条目释放"""
+        with self._cond:
+            if self.limit:
+                while self.in_flight and self.in_flight + nbytes > self.limit:
+                    self._cond.wait()
+            self._add(nbytes)
+
+    def adjust(self, delta):
+        """调整已占用的字节数（不阻塞），delta为负数时释放"""
+        with self._cond:
+            self._add(delta)
+            if delta < 0:
+                self._cond.notify_all()
+
+    def release(self, nbytes):
+        """释放字节预算"""
+        self.adjust(-nbytes)
+
+    def _add(self, delta):
+        self.in_flight += delta
+        if self.in_flight > self.peak:
+            self.peak = self.in_flight
+
+
+class PipelineItem:
+    """在流水线各阶段之间传递的条目"""
+
+    __slots__ = ('index', 'data', 'nbytes', 'finished', 'error')
+
+    def __init__(self, index, data):
+        self.index = index
+        self.data = data
+        self.nbytes = 0
+        self.finished = False
+        self.error = None
+
+    def finish(self, error=None):
+        """结束条目，跳过剩余阶段直接交给结果回调"""
+        self.finished = True
+        if error is not None:
+            self.error = error
+
+
+class Stage:
+    """流水线阶段
+
+    Args:
+        name (str): 阶段名称
+        func (callable): 处理函数 func(item)，直接修改 item.data，并把条目当前占用的内存字节数写入 item.nbytes
+        workers (int, optional): 并发线程数。默认为1。
+        admit (bool, optional): 是否为数据进入阶段。为True时该阶段新增的字节需要申请预算（可能阻塞）。默认为False。
+    """
+
+    def __init__(self, name, func, workers=1, admit=False):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers or 1))
+        self.admit = admit
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+
+class Pipeline:
+    """多阶段流水线：各阶段由有界队列连接，每个阶段有独立的线程数
+
+    队列长度限制条目数量，ByteBudget 限制在途字节数。输入迭代器只在第一个队列有空位时才被读取，
+    因此可以直接接入惰性的URL流。
+    """
+
+    def __init__(self, stages, on_done, queue_size=16, max_bytes=0):
+        """
+        Args:
+            stages (list): Stage 列表，按处理顺序排列
+            on_done (callable): 条目处理完成（或失败）时的回调 on_done(item)，调用是串行的
+            queue_size (int, optional): 阶段之间的队列长度。默认为16。
+            max_bytes (int, optional): 在途字节上限，0表示不限制。默认为0。
+        """
+        self.stages = stages
+        self.on_done = on_done
+        self.budget = ByteBudget(max_bytes)
+        self._queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+        self._alive = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._done_lock = threading.Lock()
+        self._threads = []
+
+    def run(self, items):
+        """在当前线程读取输入并阻塞到全部条目处理完成
+
+        Args:
+            items (iterable): (index, data) 元组的迭代器
+        """
+        for position, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(position,), name=f"{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+        try:
+            for index, data in items:
+                self._queues[0].put(PipelineItem(index, data))
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._queues[0].put(_STOP)
+            for thread in self._threads:
+                thread.join()
+
+    def queue_depth(self, name):
+        """指定阶段等待处理的条目数"""
+        for position, stage in enumerate(self.stages):
+            if stage.name == name:
+                return self._queues[position].qsize()
+        return 0
+
+    def stats(self):
+        """各阶段的处理统计和当前队列深度"""
+        return {
+            "stages": {
+                stage.name: {
+                    "workers": stage.workers,
+                    "processed": stage.processed,
+                    "failed": stage.failed,
+                    "busy_seconds": round(stage.busy_seconds, 3),
+                    "queue_depth": self._queues[position].qsize()
+                }
+                for position, stage in enumerate(self.stages)
+            },
+            "bytes_in_flight": self.budget.in_flight,
+            "peak_bytes_in_flight": self.budget.peak
+        }
+
+    def _worker(self, position):
+        stage = self.stages[position]
+        inbox = self._queues[position]
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                break
+
+            before = item.nbytes
+            started = time.perf_counter()
+            failed = False
+            try:
+                stage.func(item)
+            except Exception as e:
+                logger.error(f"流水线阶段 {stage.name} 出错: {e}")
+                item.finish(str(e))
+                failed = True
+            with self._lock:
+                stage.busy_seconds += time.perf_counter() - started
+                stage.processed += 1
+                stage.failed += failed
+
+            delta = item.nbytes - before
+            if delta > 0 and stage.admit:
+                self.budget.acquire(delta)
+            elif delta:
+                self.budget.adjust(delta)
+
+            if item.finished or position == len(self.stages) - 1:
+                self._complete(item)
+            else:
+                self._queues[position + 1].put(item)
+
+        # 本阶段最后一个线程退出时，通知下一阶段的全部线程
+        with self._lock:
+            self._alive[position] -= 1
+            last = self._alive[position] == 0
+        if last and position + 1 < len(self.stages):
+            for _ in range(self.stages[position + 1].workers):
+                self._queues[position + 1].put(_STOP)
+
+    def _complete(self, item):
+        try:
+            with self._done_lock:
+                self.on_done(item)
+        except Exception as e:
+            logger.error(f"处理流水线结果时出错: {e}")
+        finally:
+            self.budget.release(item.nbytes)
+            item.nbytes = 0
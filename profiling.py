@@ -0,0 +1,236 @@
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 当前运行中的剖析器，None 表示未开启（此时网络计时钩子直接返回空上下文，没有额外开销）
+_active = None
+_NULL = nullcontext()
+
+
+def network():
+    """标记一段网络等待（HTTP请求、读取响应体），用于区分网络等待与CPU计算"""
+    profiler = _active
+    if profiler is None:
+        return _NULL
+    return profiler.account("network")
+
+
+def retry_sleep():
+    """标记一段重试退避等待"""
+    profiler = _active
+    if profiler is None:
+        return _NULL
+    return profiler.account("sleep")
+
+
+class _ThreadState(threading.local):
+    def __init__(self):
+        self.frames = []
+        # 本线程累计的网络/重试等待（墙钟时间和其中的CPU时间）
+        self.network_wall = 0.0
+        self.network_cpu = 0.0
+        self.sleep_wall = 0.0
+
+
+class StageProfiler:
+    """按处理阶段统计的采样剖析器
+
+    - 墙钟归因：每个阶段记录墙钟时间、线程CPU时间、网络等待和重试退避，
+      嵌套阶段的耗时只计入最内层阶段。
+    - CPU剖析：后台线程定期采样所有处于阶段内的线程的调用栈，以阶段名作为栈底，
+      输出 flamegraph.pl / speedscope 可直接读取的折叠栈格式。
+
+    采样方式不依赖 cProfile，因此可以同时剖析多个线程，也不会与其他剖析工具冲突。
+    进程池中的解析/渲染不在本进程内执行，会表现为等待时间。
+    """
+
+    def __init__(self, interval=0.005):
+        """
+        Args:
+            interval (float, optional): 采样间隔（秒）。默认为0.005。
+        """
+        self.interval = interval
+        self.stats = defaultdict(lambda: {"calls": 0, "wall": 0.0, "cpu": 0.0, "network": 0.0, "sleep": 0.0})
+        self.stacks = Counter()
+        self.samples = 0
+        self._local = _ThreadState()
+        self._thread_stages = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started = None
+        self._elapsed = 0.0
+
+    def start(self):
+        """开始剖析：注册阶段钩子并启动采样线程"""
+        global _active
+        _active = self
+        metrics.add_stage_hook(self.stage)
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample_loop, name="stage-profiler", daemon=True)
+        self._sampler.start()
+        logger.info(f"性能剖析已开启 [采样间隔: {self.interval * 1000:.0f}ms]")
+
+    def stop(self):
+        """停止剖析"""
+        global _active
+        metrics.remove_stage_hook(self.stage)
+        if _active is self:
+            _active = None
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        if self._started is not None:
+            self._elapsed = time.perf_counter() - self._started
+
+    @contextmanager
+    def stage(self, name):
+        """阶段钩子：统计阶段内的墙钟时间、CPU时间和各类等待，并登记当前线程所处的阶段"""
+        local = self._local
+        frame = {
+            "name": name,
+            "wall": time.perf_counter(),
+            "cpu": time.thread_time(),
+            "network_wall": local.network_wall,
+            "network_cpu": local.network_cpu,
+            "sleep": local.sleep_wall,
+            # 子阶段的耗时，结束时从本阶段中扣除
+            "child": [0.0, 0.0, 0.0, 0.0]
+        }
+        local.frames.append(frame)
+        ident = threading.get_ident()
+        self._thread_stages[ident] = tuple(f["name"] for f in local.frames)
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - frame["wall"]
+            cpu = time.thread_time() - frame["cpu"]
+            network_wall = local.network_wall - frame["network_wall"]
+            network_cpu = local.network_cpu - frame["network_cpu"]
+            sleep = local.sleep_wall - frame["sleep"]
+            # 网络请求期间的CPU时间（TLS、解压等）计入CPU，只把剩余部分算作网络等待
+            network = max(0.0, network_wall - network_cpu)
+
+            local.frames.pop()
+            if local.frames:
+                self._thread_stages[ident] = tuple(f["name"] for f in local.frames)
+                child = local.frames[-1]["child"]
+                child[0] += wall
+                child[1] += cpu
+                child[2] += network
+                child[3] += sleep
+            else:
+                self._thread_stages.pop(ident, None)
+
+            own = frame["child"]
+            with self._lock:
+                stats = self.stats[name]
+                stats["calls"] += 1
+                stats["wall"] += max(0.0, wall - own[0])
+                stats["cpu"] += max(0.0, cpu - own[1])
+                stats["network"] += max(0.0, network - own[2])
+                stats["sleep"] += max(0.0, sleep - own[3])
+
+    @contextmanager
+    def account(self, kind):
+        """累计当前线程的网络等待（kind="network"）或重试退避（kind="sleep"）"""
+        local = self._local
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            if kind == "sleep":
+                local.sleep_wall += time.perf_counter() - wall
+            else:
+                local.network_wall += time.perf_counter() - wall
+                local.network_cpu += time.thread_time() - cpu
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stages = dict(self._thread_stages)
+            if not stages:
+                continue
+            frames = sys._current_frames()
+            collected = []
+            for ident, stage_names in stages.items():
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                collected.append(";".join(stage_names + tuple(stack)))
+            del frames
+            with self._lock:
+                self.samples += len(collected)
+                self.stacks.update(collected)
+
+    def summary(self, top=30):
+        """生成文本摘要：各阶段的墙钟归因，以及采样中自身耗时和累计耗时最多的函数"""
+        lines = ["# 性能剖析摘要", ""]
+        lines.append(f"总耗时: {self._elapsed:.2f}s, 采样间隔: {self.interval * 1000:.0f}ms, 样本数: {self.samples}")
+        lines.append("")
+        lines.append("## 各阶段墙钟时间归因（秒，多线程累计）")
+        lines.append("")
+        lines.append(f"{'阶段':<10} {'次数':>8} {'墙钟':>10} {'CPU':>10} {'网络等待':>10} {'重试退避':>10} {'其他等待':>10} {'CPU占比':>8}")
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1]["wall"]):
+            other = max(0.0, stats["wall"] - stats["cpu"] - stats["network"] - stats["sleep"])
+            share = stats["cpu"] / stats["wall"] * 100 if stats["wall"] else 0.0
+            lines.append(
+                f"{name:<10} {stats['calls']:>8} {stats['wall']:>10.2f} {stats['cpu']:>10.2f} "
+                f"{stats['network']:>10.2f} {stats['sleep']:>10.2f} {other:>10.2f} {share:>7.1f}%"
+            )
+        lines.append("")
+        lines.append("其他等待包括锁、队列、磁盘I/O以及进程池中执行的解析/渲染。")
+
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            parts = stack.split(";")
+            # 第一个非阶段名的帧之后才是函数
+            functions = [part for part in parts if " (" in part]
+            if functions:
+                self_counts[functions[-1]] += count
+            for function in set(functions):
+                total_counts[function] += count
+
+        for title, counts in (("自身耗时最多的函数", self_counts), ("累计耗时最多的函数", total_counts)):
+            lines.append("")
+            lines.append(f"## {title}（Top {top}）")
+            lines.append("")
+            for function, count in counts.most_common(top):
+                share = count / self.samples * 100 if self.samples else 0.0
+                lines.append(f"{count:>8} {share:>6.1f}%  {function}")
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self, folder, top=30):
+        """将折叠栈和摘要写入目录
+
+        Returns:
+            tuple: (折叠栈文件路径, 摘要文件路径)
+        """
+        os.makedirs(folder, exist_ok=True)
+        collapsed_path = os.path.join(folder, "profile.collapsed.txt")
+        summary_path = os.path.join(folder, "profile_summary.txt")
+        with self._lock:
+            stacks = sorted(self.stacks.items())
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks:
+                f.write(f"{stack} {count}\n")
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(self.summary(top))
+        logger.info(f"性能剖析结果已保存: {collapsed_path}, {summary_path}")
+        return collapsed_path, summary_path
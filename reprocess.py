@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import warc
+from article_render import parse_and_render_article, render_article_outputs
+
+logger = logging.getLogger(__name__)
+
+# 原始文章页面的特征（本项目输出的HTML中没有这些元素）
+RAW_PAGE_MARKERS = (b'activity-name', b'rich_media_title')
+
+# 原始页面中记录的文章链接
+_OG_URL = re.compile(rb'<meta[^>]+property=["\']og:url["\'][^>]+content=["\']([^"\']+)["\']')
+_MSG_LINK = re.compile(rb'var\s+msg_link\s*=\s*["\']([^"\']+)["\']')
+
+
+def is_raw_page(data):
+    return any(marker in data for marker in RAW_PAGE_MARKERS)
+
+
+def page_url(data, default):
+    """从原始页面中找出文章链接，找不到时返回 default"""
+    match = _OG_URL.search(data) or _MSG_LINK.search(data)
+    if not match:
+        return default
+    return match.group(1).decode('utf-8', 'replace').replace('&amp;', '&').replace('\\x26amp;', '&')
+
+
+def iter_sources(paths):
+    """遍历离线重处理的输入，按出现顺序产生任务
+
+    目录会被递归遍历。.json（文章JSON）和 .html/.htm（原始页面）由子进程读取；
+    .warc/.warc.gz 在主进程中逐条读取，只取状态码200的原始文章页面交给子进程。
+
+    Yields:
+        tuple: ("json", 路径)、("html", 路径) 或 ("page", 来源, 页面URL, 页面bytes)
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            files = []
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files = [path]
+        for file_path in files:
+            name = file_path.lower()
+            if name.endswith('.json'):
+                yield "json", file_path
+            elif name.endswith(('.html', '.htm')):
+                yield "html", file_path
+            elif name.endswith(('.warc', '.warc.gz')):
+                try:
+                    for number, (url, status, headers, body) in enumerate(warc.iter_responses(file_path)):
+                        if status == 200 and 'html' in headers.get('content-type', 'text/html') and is_raw_page(body):
+                            yield "page", f"{file_path}#{number}", url, body
+                except (OSError, ValueError, EOFError) as e:
+                    logger.error(f"读取WARC文件出错 [{file_path}: {e}]")
+
+
+def reprocess_item(index, source, output_folder, formats):
+    """在子进程中重新提取（原始页面）或重新渲染（文章JSON）一篇文章并写入输出
+
+    Returns:
+        dict: 处理记录，包含 source、success，以及成功时的 url、title、files 或失败/跳过原因
+    """
+    kind = source[0]
+    label = source[1]
+    article_id = f"article_{index:06d}"
+    article_folder = os.path.join(output_folder, article_id)
+    try:
+        if kind == "json":
+            with open(label, encoding='utf-8') as f:
+                result = json.load(f)
+            if not isinstance(result, dict) or "content_html" not in result or "title" not in result:
+                return {"source": label, "success": False, "skipped": "不是文章JSON"}
+            outputs = render_article_outputs(result, article_folder, article_id, formats)
+            url = result.get("original_url")
+        else:
+            if kind == "html":
+                with open(label, 'rb') as f:
+                    page = f.read()
+                if not is_raw_page(page):
+                    return {"source": label, "success": False, "skipped": "不是原始文章页面"}
+                url = page_url(page, label)
+            else:
+                url, page = source[2], source[3]
+            result, outputs = parse_and_render_article(page, url, url, article_folder, article_id, formats)
+            if "error" in result:
+                return {"source": label, "success": False, "url": url, "error": result.get("message", "解析失败")}
+
+        os.makedirs(article_folder, exist_ok=True)
+        for _, file_path, content in outputs:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        return {
+            "source": label,
+            "success": True,
+            "url": url,
+            "title": result.get("title"),
+            "files": [(format_name, file_path) for format_name, file_path, _ in outputs]
+        }
+    except Exception as e:
+        return {"source": label, "success": False, "error": str(e)}
+
+
+def reprocess(paths, output_dir="outputs", formats=None, workers=None, max_pending=None):
+    """离线重新提取和渲染已保存的文章，不访问网络
+
+    原始页面（保存的HTML或WARC存档）会重新经过完整的提取和渲染，文章JSON只重新渲染输出格式。
+    各篇文章在进程池中并行处理，同时提交的任务数有上限，输入可以是几十万篇文章。
+    原始页面中的图片和视频使用在线地址，文章JSON中已下载的本地媒体路径保持不变。
+
+    Args:
+        paths (list): 输入的文件或目录列表
+        output_dir (str, optional): 输出目录，结果写入其中的 reprocess_<时间戳>/。默认为"outputs"。
+        formats (list, optional): 已规范化的输出格式列表。默认为["json"]。
+        workers (int, optional): 进程数。默认为CPU核数。
+        max_pending (int, optional): 同时提交的任务数上限。默认为进程数的4倍。
+
+    Returns:
+        dict: {"success", "failed", "skipped", "total", "folder", "summary", "failures"}
+    """
+    formats = formats or ["json"]
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    folder = os.path.join(output_dir, f"reprocess_{timestamp}")
+    os.makedirs(folder, exist_ok=True)
+    summary_path = os.path.join(folder, "reprocess_summary.md")
+
+    counts = {"success": 0, "failed": 0, "skipped": 0}
+    failures = []
+    started = time.perf_counter()
+    logger.info(f"开始离线重处理 [输入: {', '.join(paths)}, 进程: {workers}]")
+
+    with open(summary_path, 'w', encoding='utf-8') as summary:
+        summary.write("# 离线重处理结果\n\n")
+        summary.write(f"- 处理时间: {timestamp}\n")
+        summary.write(f"- 输入: {', '.join(paths)}\n")
+        summary.write(f"- 输出格式: {', '.join(formats)}\n\n")
+        summary.write("## 处理结果\n\n")
+
+        def collect(future):
+            entry = future.result()
+            if entry["success"]:
+                counts["success"] += 1
+                files = ", ".join(os.path.relpath(path, folder).replace('\\', '/') for _, path in entry["files"])
+                summary.write(f"- ✅ [{entry['title']}]({entry['url']}) ← {entry['source']}: {files}\n")
+            elif "skipped" in entry:
+                counts["skipped"] += 1
+            else:
+                counts["failed"] += 1
+                failures.append(entry)
+                summary.write(f"- ❌ {entry['source']}: {entry.get('error', '未知错误')}\n")
+            done = counts["success"] + counts["failed"]
+            if done and done % 1000 == 0:
+                logger.info(f"已处理 {done} 篇 [{done / (time.perf_counter() - started):.0f}篇/秒]")
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for index, source in enumerate(iter_sources(paths), 1):
+                if len(pending) >= max_pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        collect(future)
+                pending.add(executor.submit(reprocess_item, index, source, folder, formats))
+            for future in wait(pending).done:
+                collect(future)
+
+        elapsed = time.perf_counter() - started
+        summary.write("\n## 汇总\n\n")
+        summary.write(f"- 成功: {counts['success']} 篇\n")
+        summary.write(f"- 失败: {counts['failed']} 篇\n")
+        summary.write(f"- 跳过(非文章文件): {counts['skipped']} 个\n")
+        summary.write(f"- 耗时: {elapsed:.1f}秒\n")
+
+    logger.info(f"离线重处理完成 [成功: {counts['success']}, 失败: {counts['failed']}, "
+                f"跳过: {counts['skipped']}, 耗时: {elapsed:.1f}秒]")
+    return {
+        **counts,
+        "total": counts["success"] + counts["failed"],
+        "folder": folder,
+        "summary": summary_path,
+        "failures": failures
+    }
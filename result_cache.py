@@ -0,0 +1,75 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """带过期时间的LRU缓存（线程安全）
+
+    超过容量时淘汰最久未使用的条目，超过有效期的条目在读取时视为不存在。
+    """
+
+    def __init__(self, capacity=64, ttl=3600):
+        """
+        Args:
+            capacity (int, optional): 最多缓存的条目数，0表示不缓存。默认为64。
+            ttl (float, optional): 条目有效期（秒），0表示不过期。默认为3600。
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, validate=None):
+        """读取缓存
+
+        Args:
+            key: 缓存键
+            validate (callable, optional): 校验函数 validate(value)，返回False时丢弃该条目（如输出文件已被删除）
+
+        Returns:
+            tuple: (值, 写入至今的秒数)，未命中时返回 (None, None)
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                value, stored = item
+                age = time.monotonic() - stored
+                if self.ttl and age > self.ttl:
+                    del self._items[key]
+                elif validate is not None and not validate(value):
+                    del self._items[key]
+                else:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value, age
+            self.misses += 1
+            return None, None
+
+    def put(self, key, value):
+        """写入缓存"""
+        if not self.capacity:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic())
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key):
+        """删除指定条目"""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,169 @@
+import time
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# 可重试的状态码：限流、超时和服务端临时故障；其余非200状态（404、403、410等）重试也不会成功
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# 可重试的异常：连接失败、超时、传输中断
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+# 即使属于上面的类型也不重试的异常（证书错误等配置问题）
+PERMANENT_ERRORS = (
+    requests.exceptions.SSLError,
+    requests.exceptions.InvalidURL,
+    requests.exceptions.InvalidSchema,
+    requests.exceptions.MissingSchema,
+)
+
+# 重试决定在日志和汇总报告中的名称
+ACTIONS = {
+    "retry": "重试",
+    "permanent": "不可重试",
+    "exhausted": "达到最大重试次数",
+    "budget": "批次重试预算不足",
+    "retry_after": "Retry-After 过长",
+    "deadline": "超出文章处理时限",
+}
+
+_local = threading.local()
+
+
+def classify(response=None, error=None):
+    """判断一次失败的请求是否值得重试
+
+    Args:
+        response (Response, optional): 非200的响应
+        error (Exception, optional): 请求抛出的异常
+
+    Returns:
+        tuple: (是否可重试, 失败原因：状态码或异常类名)
+    """
+    if error is not None:
+        retryable = isinstance(error, RETRYABLE_ERRORS) and not isinstance(error, PERMANENT_ERRORS)
+        return retryable, type(error).__name__
+    return response.status_code in RETRYABLE_STATUS, response.status_code
+
+
+def retry_after(response):
+    """读取响应的 Retry-After 头部（秒数或HTTP日期）
+
+    Returns:
+        float or None: 需要等待的秒数，没有或无法解析时返回None
+    """
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class RetryBudget:
+    """批次共用的重试预算（线程安全），上游整体故障时停止重试，避免重试风暴
+
+    令牌数从 max_tokens 开始，每次可重试的失败消耗1个，每次成功归还 token_ratio 个（不超过上限）；
+    令牌数低于上限的一半时不再重试，失败的请求直接放弃，直到成功的请求把令牌数补回来。
+    """
+
+    def __init__(self, max_tokens=100, token_ratio=0.1):
+        """
+        Args:
+            max_tokens (float, optional): 令牌上限，0表示不限制重试。默认为100。
+            token_ratio (float, optional): 每次成功归还的令牌数。默认为0.1。
+        """
+        self.max_tokens = max_tokens or 0
+        self.token_ratio = token_ratio
+        self.tokens = self.max_tokens
+        self.retries = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def on_success(self):
+        if self.max_tokens:
+            with self._lock:
+                self.tokens = min(self.max_tokens, self.tokens + self.token_ratio)
+
+    def on_failure(self):
+        """记录一次可重试的失败
+
+        Returns:
+            bool: 是否允许重试
+        """
+        with self._lock:
+            if self.max_tokens:
+                self.tokens = max(0, self.tokens - 1)
+                if self.tokens <= self.max_tokens / 2:
+                    self.denied += 1
+                    return False
+            self.retries += 1
+            return True
+
+
+@contextmanager
+def recording(decisions, budget=None):
+    """在当前线程内记录重试决定并使用指定的重试预算
+
+    一篇文章可能在多个线程中处理（流水线的请求阶段和媒体阶段），各线程传入同一个列表即可汇总到一起。
+
+    Args:
+        decisions (list): 追加重试决定的列表
+        budget (RetryBudget, optional): 批次共用的重试预算。默认为None（不限制）。
+    """
+    previous = getattr(_local, "context", None)
+    _local.context = (decisions, budget)
+    try:
+        yield decisions
+    finally:
+        _local.context = previous
+
+
+def current_budget():
+    context = getattr(_local, "context", None)
+    return context[1] if context else None
+
+
+def record(url, attempt, outcome, action, delay=None):
+    """记录一次失败请求的处理决定（不在 recording 范围内时直接返回）"""
+    context = getattr(_local, "context", None)
+    if context is None:
+        return
+    decision = {"url": url, "attempt": attempt, "outcome": outcome, "action": action}
+    if delay is not None:
+        decision["delay"] = round(delay, 2)
+    context[0].append(decision)
+
+
+def describe(decisions):
+    """把一篇文章的重试决定汇总为一行文字，如 "重试 3次, 不可重试(404) 2次" """
+    counts = {}
+    for decision in decisions:
+        label = ACTIONS.get(decision["action"], decision["action"])
+        if decision["action"] != "retry":
+            label += f"({decision['outcome']})"
+        counts[label] = counts.get(label, 0) + 1
+    return ", ".join(f"{label} {count}次" for label, count in counts.items())
+
+
+def is_permanent(decisions, url=None):
+    """请求最终是否因不可重试的失败（classify 判定，如404、证书错误）而放弃，重新处理也不会成功
+
+    Args:
+        decisions (list): recording 记录的重试决定
+        url (str, optional): 只看该URL（如文章页面）的决定，忽略媒体下载的失败。默认为None。
+    """
+    decisions = [d for d in decisions or [] if url is None or d["url"] == url]
+    return bool(decisions) and decisions[-1]["action"] == "permanent"
@@ -0,0 +1,335 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+import retry_policy
+from incremental import canonical_article_url
+
+logger = logging.getLogger(__name__)
+
+# 一次重爬的结果
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+# 文章已删除、违规或返回404等不可重试的失败，重爬也不会成功
+GONE = "gone"
+
+
+class RateBudget:
+    """按小时计的请求预算（令牌桶），令牌匀速补充，最多积累 burst 个"""
+
+    def __init__(self, per_hour, burst=None):
+        """
+        Args:
+            per_hour (float): 每小时允许的请求数，0表示不限制
+            burst (int, optional): 最多积累的令牌数。默认为每小时预算的1/60（至少1个）。
+        """
+        self.per_hour = per_hour or 0
+        self.burst = burst or max(1, int(self.per_hour / 60))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.per_hour / 3600)
+        self._updated = now
+
+    def available(self):
+        """当前可用的请求数（不限制时返回None）"""
+        if not self.per_hour:
+            return None
+        self._refill()
+        return int(self._tokens)
+
+    def consume(self, count):
+        if self.per_hour:
+            self._refill()
+            self._tokens -= count
+
+    def wait_time(self):
+        """距离下一个令牌可用的秒数"""
+        if not self.per_hour:
+            return 0.0
+        self._refill()
+        return max(0.0, (1 - self._tokens) * 3600 / self.per_hour)
+
+
+class RecrawlScheduler:
+    """按文章实际变化频率安排重爬的调度器
+
+    每篇跟踪的文章记录最近爬取时间、变化历史和当前重爬间隔：内容变化时间隔减半，
+    未变化时间隔按 backoff 倍数增长，限制在 [min_interval, max_interval] 之间。
+    经常变化的文章间隔短、被重爬得更频繁，很少变化的文章逐渐降到最低频率，
+    预算因此集中在真正会变化的文章上。
+
+    到期文章按逾期程度（距上次爬取的时间 / 重爬间隔）排序，逾期越久越优先；
+    从未爬取过的文章最先处理。
+    """
+
+    def __init__(self, db_path, min_interval=3600, max_interval=30 * 86400, initial_interval=86400, backoff=1.5):
+        """
+        Args:
+            db_path (str): SQLite数据库文件路径
+            min_interval (float, optional): 最短重爬间隔（秒）。默认为1小时。
+            max_interval (float, optional): 最长重爬间隔（秒）。默认为30天。
+            initial_interval (float, optional): 新文章的初始重爬间隔（秒）。默认为1天。
+            backoff (float, optional): 内容未变化时间隔的增长倍数。默认为1.5。
+        """
+        self.db_path = db_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = min(max(initial_interval, min_interval), max_interval)
+        self.backoff = backoff
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS schedule (
+                url TEXT PRIMARY KEY,
+                source_url TEXT NOT NULL,
+                added REAL NOT NULL,
+                last_crawled REAL,
+                last_changed REAL,
+                next_due REAL NOT NULL,
+                interval REAL NOT NULL,
+                crawls INTEGER NOT NULL DEFAULT 0,
+                changes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                last_result TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_schedule_due ON schedule (next_due)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_history (
+                url TEXT NOT NULL,
+                crawled_at REAL NOT NULL,
+                result TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_url ON crawl_history (url, crawled_at)")
+        self._conn.commit()
+
+    def track(self, urls):
+        """添加要跟踪的文章，已跟踪的（按规范化URL）会被忽略，新文章立即到期
+
+        Returns:
+            int: 新增的文章数
+        """
+        now = time.time()
+        added = 0
+        with self._lock:
+            for url in urls:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO schedule (url, source_url, added, next_due, interval) VALUES (?, ?, ?, ?, ?)",
+                    (canonical_article_url(url), url, now, now, self.initial_interval)
+                )
+                added += cursor.rowcount
+            self._conn.commit()
+        return added
+
+    def untrack(self, url):
+        """停止跟踪文章"""
+        with self._lock:
+            self._conn.execute("DELETE FROM schedule WHERE url = ?", (canonical_article_url(url),))
+            self._conn.commit()
+
+    def due(self, limit, now=None):
+        """取出已到期的文章，按优先级排列
+
+        Returns:
+            list: 文章原始URL列表
+        """
+        now = now or time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source_url FROM schedule WHERE next_due <= ? "
+                "ORDER BY last_crawled IS NOT NULL, (? - COALESCE(last_crawled, 0)) / interval DESC LIMIT ?",
+                (now, now, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def next_due_time(self):
+        """最早的到期时间，没有跟踪的文章时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(next_due) FROM schedule").fetchone()
+        return row[0]
+
+    def record(self, url, result, now=None):
+        """记录一次重爬结果并计算下次到期时间
+
+        Args:
+            url (str): 文章URL
+            result (str): CHANGED、UNCHANGED、FAILED 或 GONE
+        """
+        now = now or time.time()
+        key = canonical_article_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT interval, failures, last_crawled FROM schedule WHERE url = ?", (key,)
+            ).fetchone()
+            if not row:
+                return
+            interval, failures, last_crawled = row
+            if result == GONE:
+                # 不可重试的失败：按最长间隔推迟，只偶尔确认文章是否恢复，不占用重爬预算
+                failures += 1
+                self._conn.execute(
+                    "UPDATE schedule SET failures = ?, next_due = ?, last_result = ? WHERE url = ?",
+                    (failures, now + self.max_interval, result, key)
+                )
+            elif result == FAILED:
+                # 失败不改变间隔，按失败次数指数退避后重试，最长不超过正常间隔
+                failures += 1
+                delay = min(interval, self.min_interval * 2 ** min(failures - 1, 10))
+                self._conn.execute(
+                    "UPDATE schedule SET failures = ?, next_due = ?, last_result = ? WHERE url = ?",
+                    (failures, now + delay, result, key)
+                )
+            else:
+                # 首次爬取只建立基线，不据此调整间隔
+                if last_crawled is not None:
+                    if result == CHANGED:
+                        interval = max(self.min_interval, interval / 2)
+                    else:
+                        interval = min(self.max_interval, interval * self.backoff)
+                changed = result == CHANGED and last_crawled is not None
+                self._conn.execute(
+                    "UPDATE schedule SET last_crawled = ?, interval = ?, next_due = ?, crawls = crawls + 1, "
+                    "changes = changes + ?, failures = 0, last_result = ?, "
+                    "last_changed = CASE WHEN ? THEN ? ELSE COALESCE(last_changed, ?) END WHERE url = ?",
+                    (now, interval, now + interval, int(changed), result, changed, now, now, key)
+                )
+            self._conn.execute("INSERT INTO crawl_history VALUES (?, ?, ?)", (key, now, result))
+            self._conn.commit()
+
+    def history(self, url, limit=100):
+        """文章最近的重爬记录
+
+        Returns:
+            list: [(爬取时间, 结果), ...]，按时间倒序
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT crawled_at, result FROM crawl_history WHERE url = ? ORDER BY crawled_at DESC LIMIT ?",
+                (canonical_article_url(url), limit)
+            ).fetchall()
+
+    def stats(self, now=None):
+        """汇总跟踪状态
+
+        Returns:
+            dict: {"tracked", "due", "never_crawled", "crawls", "changes", "failing", "gone", "intervals": {...}}
+        """
+        now = now or time.time()
+        with self._lock:
+            tracked, due, never, crawls, changes, failing, gone = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(next_due <= ?), 0), COALESCE(SUM(last_crawled IS NULL), 0), "
+                "COALESCE(SUM(crawls), 0), COALESCE(SUM(changes), 0), COALESCE(SUM(failures > 0), 0), "
+                "COALESCE(SUM(last_result = ?), 0) FROM schedule",
+                (now, GONE)
+            ).fetchone()
+            buckets = self._conn.execute(
+                "SELECT CASE WHEN interval < 86400 THEN '<1天' WHEN interval < 7 * 86400 THEN '1-7天' "
+                "ELSE '>=7天' END AS bucket, COUNT(*) FROM schedule GROUP BY bucket"
+            ).fetchall()
+        return {
+            "tracked": tracked,
+            "due": due,
+            "never_crawled": never,
+            "crawls": crawls,
+            "changes": changes,
+            "failing": failing,
+            "gone": gone,
+            "intervals": dict(buckets)
+        }
+
+    def run(self, crawler, output_dir, formats=None, download_media=False, download_videos=False,
+            requests_per_hour=600, batch_size=50, fingerprint_db=None, once=False, stop_event=None, **batch_options):
+        """循环取出到期文章交给爬虫处理，直到 stop_event 被设置（once 为True时处理完当前到期的文章即返回）
+
+        每批到期文章以增量模式交给 crawler.batch_process，根据是否变化调整各文章的重爬间隔。
+        预算按文章页面请求计算，媒体下载不计入。
+
+        Args:
+            crawler (WeChatArticleCrawler): 爬虫实例
+            output_dir (str): 输出目录，每批生成一个批处理文件夹
+            formats (list, optional): 输出格式。默认为["json"]。
+            download_media (bool, optional): 是否下载媒体文件。默认为False。
+            download_videos (bool, optional): 是否下载视频。默认为False。
+            requests_per_hour (float, optional): 每小时最多重爬的文章数，0表示不限制。默认为600。
+            batch_size (int, optional): 每批最多处理的文章数。默认为50。
+            fingerprint_db (str, optional): 增量模式的指纹库路径。默认为输出目录下的 config["fingerprint_db"]。
+            once (bool, optional): 只处理当前到期的文章。默认为False。
+            stop_event (threading.Event, optional): 停止标记。
+            **batch_options: 传递给 batch_process 的其他参数（如 pipeline）
+
+        Returns:
+            dict: 本次运行的 {"changed", "unchanged", "failed", "gone"} 计数
+        """
+        budget = RateBudget(requests_per_hour, burst=batch_size)
+        totals = {CHANGED: 0, UNCHANGED: 0, FAILED: 0, GONE: 0}
+
+        def on_progress(progress):
+            entry = progress["entry"]
+            if not entry["success"]:
+                # 文章已删除或页面返回404等不可重试的状态
+                permanent = entry.get("permanent") or retry_policy.is_permanent(entry.get("retries"), entry["url"])
+                result = GONE if permanent else FAILED
+            elif entry.get("unchanged"):
+                result = UNCHANGED
+            else:
+                result = CHANGED
+            self.record(entry["url"], result)
+            totals[result] += 1
+
+        while stop_event is None or not stop_event.is_set():
+            available = budget.available()
+            limit = batch_size if available is None else min(batch_size, available)
+            urls = self.due(limit) if limit > 0 else []
+
+            if not urls:
+                if once and limit > 0:
+                    break
+                # 预算不足时等待令牌，否则等待最早的到期时间（最长1分钟，以便及时响应新添加的文章）
+                if limit <= 0:
+                    wait = budget.wait_time()
+                else:
+                    next_due = self.next_due_time()
+                    wait = 60 if next_due is None else min(60, max(1, next_due - time.time()))
+                if stop_event is not None:
+                    stop_event.wait(wait)
+                else:
+                    time.sleep(wait)
+                continue
+
+            budget.consume(len(urls))
+            logger.info(f"重爬 {len(urls)} 篇到期文章")
+            crawler.batch_process(
+                urls,
+                output_dir=output_dir,
+                formats=formats,
+                download_media=download_media,
+                download_videos=download_videos,
+                incremental=True,
+                fingerprint_db=fingerprint_db,
+                keep_results=False,
+                # 长期运行的调度不写入界面的最近使用记录，避免每篇文章都改写一次 config.json
+                record_history=False,
+                progress_callback=on_progress,
+                cancel_event=stop_event,
+                **batch_options
+            )
+
+        logger.info(f"重爬调度结束 [变化: {totals[CHANGED]}, 未变化: {totals[UNCHANGED]}, 失败: {totals[FAILED]}, "
+                    f"不可访问: {totals[GONE]}]")
+        return {"changed": totals[CHANGED], "unchanged": totals[UNCHANGED], "failed": totals[FAILED],
+                "gone": totals[GONE]}
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,77 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 最小的文章页面：包含标题、作者、发布时间和正文
+ARTICLE_PAGE = (
+    '<html><body><h1 id="activity-name">测试文章</h1><span id="js_name">作者</span>'
+    '<em id="publish_time">2025-01-01</em><div id="js_content"><p>正文</p></div></body></html>'
+).encode('utf-8')
+
+
+class LocalSite:
+    """本地HTTP服务：每个路径按顺序返回预设的响应（最后一个重复使用），并记录请求次数"""
+
+    def __init__(self):
+        self.routes = {}
+        self.hits = {}
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                site.hits[path] = site.hits.get(path, 0) + 1
+                responses = site.routes.get(path, [(404, {}, b'not found')])
+                status, headers, body = responses[min(site.hits[path], len(responses)) - 1]
+                self.send_response(status)
+                # 头部值为None时不发送该头部（如不声明 Content-Length，以关闭连接结束响应）
+                for name, value in headers.items():
+                    if value is not None:
+                        self.send_header(name, value)
+                if 'Content-Length' not in headers:
+                    self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def route(self, path, *responses):
+        """设置路径的响应序列，每个响应为 (状态码, 头部, 内容)"""
+        self.routes[path] = list(responses)
+
+
+@pytest.fixture
+def site():
+    local = LocalSite()
+    yield local
+    local.server.shutdown()
+    local.server.server_close()
+
+
+@pytest.fixture
+def crawler(monkeypatch):
+    """默认配置的爬虫，重试等待缩短为0秒"""
+    import wechat_article_crawler
+    monkeypatch.setattr(wechat_article_crawler.random, "uniform", lambda a, b: 0)
+    instance = wechat_article_crawler.WeChatArticleCrawler(retry_times=3, retry_delay=0)
+    yield instance
+    instance.close()
+
+
+@pytest.fixture(autouse=True)
+def no_config_writes(monkeypatch):
+    """测试中不改写 config.json（批量处理会写入URL历史记录），返回本应发生的写入次数记录"""
+    from config import config
+    writes = []
+    monkeypatch.setattr(config, "save_config", lambda: writes.append(True))
+    return writes
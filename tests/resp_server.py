@@ -0,0 +1,281 @@
+"""测试用的本地RESP服务：实现 RedisWorkQueue 用到的Redis命令子集（含 WATCH/MULTI/EXEC），数据只保存在内存中"""
+import socketserver
+import threading
+
+
+class RespError(Exception):
+    pass
+
+
+class Store:
+    """所有连接共享的数据，每个键记录修改版本号供 WATCH 判断"""
+
+    def __init__(self):
+        self.data = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def get(self, key, kind):
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def setdefault(self, key, kind):
+        value = self.get(key, kind)
+        if value is None:
+            value = self.data[key] = kind()
+        self.touch(key)
+        return value
+
+    def cleanup(self, key):
+        if key in self.data and not self.data[key]:
+            del self.data[key]
+
+
+def _score(value):
+    # float() 可以解析 -inf/+inf
+    return float(value)
+
+
+def _format_score(score):
+    return repr(score) if score != int(score) else str(int(score))
+
+
+class Commands:
+    """命令实现：每个方法接收参数列表，返回 Python 值（str/int/list/None）"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def ping(self, args):
+        return RespOk("PONG")
+
+    def auth(self, args):
+        return RespOk("OK")
+
+    def select(self, args):
+        return RespOk("OK")
+
+    def flushall(self, args):
+        for key in list(self.store.data):
+            self.store.touch(key)
+        self.store.data.clear()
+        return RespOk("OK")
+
+    def get(self, args):
+        return self.store.get(args[0], str)
+
+    def incr(self, args):
+        value = int(self.store.get(args[0], str) or 0) + 1
+        self.store.data[args[0]] = str(value)
+        self.store.touch(args[0])
+        return value
+
+    def sadd(self, args):
+        members = self.store.setdefault(args[0], set)
+        added = len(set(args[1:]) - members)
+        members.update(args[1:])
+        return added
+
+    def sismember(self, args):
+        return int(args[1] in (self.store.get(args[0], set) or ()))
+
+    def scard(self, args):
+        return len(self.store.get(args[0], set) or ())
+
+    def hset(self, args):
+        fields = self.store.setdefault(args[0], dict)
+        added = 0
+        for field, value in zip(args[1::2], args[2::2]):
+            added += field not in fields
+            fields[field] = value
+        return added
+
+    def hget(self, args):
+        return (self.store.get(args[0], dict) or {}).get(args[1])
+
+    def hincrby(self, args):
+        fields = self.store.setdefault(args[0], dict)
+        value = int(fields.get(args[1], 0)) + int(args[2])
+        fields[args[1]] = str(value)
+        return value
+
+    def hgetall(self, args):
+        result = []
+        for field, value in (self.store.get(args[0], dict) or {}).items():
+            result += [field, value]
+        return result
+
+    def zadd(self, args):
+        members = self.store.setdefault(args[0], dict)
+        added = 0
+        for score, member in zip(args[1::2], args[2::2]):
+            added += member not in members
+            members[member] = _score(score)
+        return added
+
+    def zrem(self, args):
+        members = self.store.get(args[0], dict)
+        if not members:
+            return 0
+        removed = 0
+        for member in args[1:]:
+            if members.pop(member, None) is not None:
+                removed += 1
+        if removed:
+            self.store.touch(args[0])
+            self.store.cleanup(args[0])
+        return removed
+
+    def zscore(self, args):
+        score = (self.store.get(args[0], dict) or {}).get(args[1])
+        return None if score is None else _format_score(score)
+
+    def zcard(self, args):
+        return len(self.store.get(args[0], dict) or ())
+
+    def _sorted(self, key):
+        members = self.store.get(key, dict) or {}
+        return sorted(members.items(), key=lambda item: (item[1], item[0]))
+
+    def zrange(self, args):
+        items = self._sorted(args[0])
+        start, stop = int(args[1]), int(args[2])
+        if stop < 0:
+            stop += len(items)
+        items = items[start:stop + 1]
+        if len(args) > 3 and args[3].upper() == 'WITHSCORES':
+            result = []
+            for member, score in items:
+                result += [member, _format_score(score)]
+            return result
+        return [member for member, _ in items]
+
+    def zrangebyscore(self, args):
+        low, high = _score(args[1]), _score(args[2])
+        items = [member for member, score in self._sorted(args[0]) if low <= score <= high]
+        if len(args) > 3 and args[3].upper() == 'LIMIT':
+            offset, count = int(args[4]), int(args[5])
+            items = items[offset:offset + count]
+        return items
+
+    def zpopmin(self, args):
+        items = self._sorted(args[0])[:int(args[1]) if len(args) > 1 else 1]
+        result = []
+        for member, score in items:
+            del self.store.data[args[0]][member]
+            result += [member, _format_score(score)]
+        if items:
+            self.store.touch(args[0])
+            self.store.cleanup(args[0])
+        return result
+
+
+class RespOk(str):
+    """简单字符串回复（+OK）"""
+
+
+def _encode(value):
+    if isinstance(value, RespError):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, RespOk):
+        return f"+{value}\r\n".encode()
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, list):
+        return f"*{len(value)}\r\n".encode() + b"".join(_encode(item) for item in value)
+    data = str(value).encode('utf-8')
+    return f"${len(data)}\r\n".encode() + data + b"\r\n"
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2].decode('utf-8'))
+        return args
+
+    def handle(self):
+        store = self.server.store
+        commands = Commands(store)
+        watched = {}
+        queued = None
+        while True:
+            args = self._read_command()
+            if args is None:
+                break
+            name = args[0].upper()
+            with store.lock:
+                if name == 'WATCH':
+                    for key in args[1:]:
+                        watched[key] = store.versions.get(key, 0)
+                    reply = RespOk("OK")
+                elif name == 'UNWATCH':
+                    watched = {}
+                    reply = RespOk("OK")
+                elif name == 'MULTI':
+                    queued = []
+                    reply = RespOk("OK")
+                elif name == 'DISCARD':
+                    queued, watched = None, {}
+                    reply = RespOk("OK")
+                elif name == 'EXEC':
+                    if queued is None:
+                        reply = RespError("ERR EXEC without MULTI")
+                    elif any(store.versions.get(key, 0) != version for key, version in watched.items()):
+                        reply = None
+                    else:
+                        reply = [self._run(commands, command) for command in queued]
+                    queued, watched = None, {}
+                elif queued is not None:
+                    queued.append(args)
+                    reply = RespOk("QUEUED")
+                else:
+                    reply = self._run(commands, args)
+            if name == 'EXEC' and reply is None:
+                self.wfile.write(b"*-1\r\n")
+            else:
+                self.wfile.write(_encode(reply))
+
+    @staticmethod
+    def _run(commands, args):
+        method = getattr(commands, args[0].lower(), None)
+        if method is None:
+            return RespError(f"ERR unknown command '{args[0]}'")
+        try:
+            return method(args[1:])
+        except RespError as e:
+            return e
+        except (ValueError, IndexError) as e:
+            return RespError(f"ERR {e}")
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, Handler)
+        self.store = Store()
+        self.port = self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
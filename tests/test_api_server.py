@@ -0,0 +1,19 @@
+from api_server import DONE, JobManager
+from config import config
+from conftest import ARTICLE_PAGE
+
+
+def test_api_jobs_do_not_write_url_history(tmp_path, site, crawler, monkeypatch):
+    site.route('/s/a', (200, {'Content-Type': 'text/html'}, ARTICLE_PAGE))
+    site.route('/s/b', (200, {'Content-Type': 'text/html'}, ARTICLE_PAGE))
+    recorded = []
+    monkeypatch.setattr(config, "add_url_to_history", recorded.append)
+    manager = JobManager(crawler, str(tmp_path), workers=1)
+    try:
+        job = manager.submit([site.url + '/s/a', site.url + '/s/b'], {"formats": ["json"]})
+    finally:
+        # 等待已提交的任务执行完
+        manager.stop()
+    assert job.status == DONE
+    assert site.hits == {'/s/a': 1, '/s/b': 1}
+    assert recorded == []
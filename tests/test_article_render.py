@@ -0,0 +1,49 @@
+from article_render import count_images, render_html, render_markdown
+from image_filter import ImageFilter, is_filtered
+
+
+def make_result(images):
+    return {
+        "original_url": "https://mp.weixin.qq.com/s/a",
+        "permanent_url": "https://mp.weixin.qq.com/s/a",
+        "title": "标题",
+        "author": "作者",
+        "publish_time": "2025-01-01",
+        "content_html": "<p>正文</p>",
+        "full_content_text": "正文",
+        "media_files": {"images": images, "videos": []}
+    }
+
+
+IMAGES = [
+    {"original_url": "https://mmbiz.qpic.cn/1/0", "local_path": "media/1.jpg"},
+    {"original_url": "https://mmbiz.qpic.cn/2/0", "skipped": "装饰性图片: 宽度 20px"},
+    {"original_url": "https://mmbiz.qpic.cn/3/0", "skipped": "单篇媒体超出上限"},
+]
+
+
+def test_filter_reasons_are_marked():
+    image_filter = ImageFilter(skip_formats=["gif"])
+    assert is_filtered(image_filter.check("https://mmbiz.qpic.cn/x/0?wx_fmt=gif"))
+    assert is_filtered(image_filter.check_size(10, 10))
+    assert not is_filtered("单篇媒体超出上限")
+    assert not is_filtered(None)
+
+
+def test_count_images_excludes_filtered():
+    assert count_images(IMAGES) == (2, 1)
+
+
+def test_markdown_counts_kept_images():
+    content = render_markdown(make_result(IMAGES), "out/a.md")
+    assert "文章共包含 2 张图片（另有 1 张装饰性图片未下载）" in content
+    content = render_markdown(make_result(IMAGES[:1]), "out/a.md")
+    assert "文章共包含 1 张图片\n" in content
+
+
+def test_html_media_info_counts_kept_images():
+    content = render_html(make_result(IMAGES), "out/a.html", show_media_info=True)
+    assert "<p>图片数量: 2</p>" in content
+    assert "<p>跳过的装饰性图片: 1</p>" in content
+    content = render_html(make_result(IMAGES[:1]), "out/a.html", show_media_info=True)
+    assert "跳过的装饰性图片" not in content
@@ -0,0 +1,17 @@
+import os
+
+import wechat_article_crawler
+from conftest import ARTICLE_PAGE
+
+
+def test_batches_started_in_same_second_use_separate_folders(tmp_path, site, crawler, monkeypatch):
+    site.route('/s/a', (200, {'Content-Type': 'text/html'}, ARTICLE_PAGE))
+    monkeypatch.setattr(wechat_article_crawler.time, "strftime", lambda fmt, *args: "20250101_000000")
+    folders = []
+    for _ in range(3):
+        result = crawler.batch_process([site.url + '/s/a'], output_dir=str(tmp_path), formats=["json"])
+        assert result["success"] == 1
+        folders.append(os.path.basename(result["batch_folder"]))
+    assert folders == ["batch_20250101_000000", "batch_20250101_000000_2", "batch_20250101_000000_3"]
+    for folder in folders:
+        assert os.path.exists(os.path.join(tmp_path, folder, "batch_summary.md"))
@@ -0,0 +1,62 @@
+import sys
+import time
+
+import deadline
+import retry_policy
+import wechat_article_crawler
+from deadline import Deadline, DEADLINE_REASON
+
+
+def test_unlimited_deadline():
+    limit = Deadline(0)
+    assert limit.remaining() is None
+    assert not limit.expired()
+    assert deadline.clip_timeout((5, 10), limit.remaining()) == (5, 10)
+
+
+def test_clip_timeout_to_remaining():
+    assert deadline.clip_timeout((5, 10), 3) == (3, 3)
+    assert deadline.clip_timeout(10, 2) == 2
+    assert deadline.clip_timeout((1, 10), 3) == (1, 3)
+
+
+def test_default_config_retries_503(site, crawler):
+    # 默认配置 article_deadline 为0，process_article 启用的是不限时的 Deadline
+    site.route('/s/retry', (503, {}, b'busy'), (503, {}, b'busy'), (200, {}, b'ok'))
+    decisions = []
+    with retry_policy.recording(decisions), deadline.active(Deadline(crawler.article_deadline)):
+        response = crawler._request(site.url + '/s/retry')
+    assert response is not None and response.status_code == 200
+    assert site.hits['/s/retry'] == 3
+    assert [d["action"] for d in decisions] == ["retry", "retry"]
+
+
+def test_deadline_stops_retrying(site, crawler):
+    site.route('/s/down', (503, {}, b'busy'))
+    crawler.retry_delay = 1
+    decisions = []
+    with retry_policy.recording(decisions), deadline.active(Deadline(0.5)):
+        assert crawler._request(site.url + '/s/down') is None
+    assert site.hits['/s/down'] == 1
+    assert decisions[-1]["action"] == "deadline"
+
+
+def test_expired_deadline_skips_media(tmp_path, site, crawler):
+    site.route('/img.png', (200, {'Content-Type': 'image/png'}, b'\x89PNG' + b'\0' * 100))
+    limit = Deadline(0.01)
+    time.sleep(0.02)
+    with deadline.active(limit):
+        skipped = crawler.download_media(site.url + '/img.png', str(tmp_path), 'a', 1)
+    assert skipped.reason == DEADLINE_REASON
+    assert '/img.png' not in site.hits
+
+
+def test_single_article_cli_respects_deadline(tmp_path, site, monkeypatch):
+    site.route('/s/down', (503, {}, b'busy'))
+    monkeypatch.setattr(sys, 'argv', ['wechat_article_crawler.py', '-u', site.url + '/s/down', '-r', '3',
+                                      '--article_deadline', '0.5', '-d', str(tmp_path)])
+    started = time.monotonic()
+    wechat_article_crawler.main()
+    # 重试等待（2秒）超过剩余时间，第一次失败后直接放弃
+    assert site.hits['/s/down'] == 1
+    assert time.monotonic() - started < 2
@@ -0,0 +1,201 @@
+import asyncio
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+
+import pytest
+import requests
+
+import http2_transport
+from http2_transport import Http2Client
+from wechat_article_crawler import WeChatArticleCrawler
+
+pytest.importorskip("httpx")
+pytest.importorskip("hypercorn")
+import httpx  # noqa: E402
+from hypercorn.asyncio import serve  # noqa: E402
+from hypercorn.config import Config  # noqa: E402
+
+
+async def app(scope, receive, send):
+    """返回请求使用的HTTP版本"""
+    if scope["type"] != "http":
+        return
+    body = scope["http_version"].encode()
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class TlsServer:
+    """本地 hypercorn HTTPS 服务，alpn_protocols 决定能否协商出 HTTP/2"""
+
+    def __init__(self, certfile, keyfile, alpn_protocols):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(128)
+        self.url = f'https://127.0.0.1:{sock.getsockname()[1]}'
+        config = Config()
+        # 监听套接字交给 hypercorn，由它负责关闭
+        config.bind = [f"fd://{sock.detach()}"]
+        config.certfile = certfile
+        config.keyfile = keyfile
+        config.alpn_protocols = alpn_protocols
+        config.accesslog = None
+        config.errorlog = None
+        self.config = config
+        self.loop = asyncio.new_event_loop()
+        self.stopped = asyncio.Event()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self.ready.set)
+        self.loop.run_until_complete(serve(app, self.config, shutdown_trigger=self.stopped.wait))
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.stopped.set)
+        self.thread.join(5)
+        self.loop.close()
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    if shutil.which("openssl") is None:
+        pytest.skip("需要 openssl 生成自签名证书")
+    folder = tmp_path_factory.mktemp("tls")
+    certfile, keyfile = str(folder / "cert.pem"), str(folder / "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", keyfile, "-out", certfile], check=True, capture_output=True)
+    return certfile, keyfile
+
+
+@pytest.fixture
+def verify(certificate):
+    return ssl.create_default_context(cafile=certificate[0])
+
+
+@pytest.fixture
+def make_server(certificate):
+    servers = []
+
+    def make(alpn_protocols=("h2", "http/1.1")):
+        server = TlsServer(*certificate, list(alpn_protocols))
+        server.ready.wait(5)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def fallback(certificate):
+    # 环境变量中的 REQUESTS_CA_BUNDLE 会覆盖会话的 verify
+    session = requests.Session()
+    session.trust_env = False
+    session.verify = certificate[0]
+    yield session
+    session.close()
+
+
+def test_negotiates_http2(make_server, verify, fallback):
+    server = make_server()
+    client = Http2Client(fallback, verify=verify)
+    try:
+        response = client.get(server.url + "/a", timeout=(5, 5))
+        assert response.status_code == 200
+        assert response.text == "2"
+        assert response.raw.version == 20
+        # 流式下载同样经过 HTTP/2
+        response = client.get(server.url + "/b", timeout=(5, 5), stream=True)
+        assert b"".join(response.iter_content(1)) == b"2"
+        response.close()
+    finally:
+        client.close()
+
+
+def test_concurrent_requests_share_http2_connection(make_server, verify, fallback):
+    server = make_server()
+    client = Http2Client(fallback, verify=verify)
+    versions = []
+
+    def fetch(i):
+        versions.append(client.get(f"{server.url}/{i}", timeout=(5, 5)).text)
+
+    try:
+        threads = [threading.Thread(target=fetch, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert versions == ["2"] * 8
+    finally:
+        client.close()
+
+
+def test_falls_back_to_http11_when_server_lacks_h2(make_server, verify, fallback):
+    server = make_server(alpn_protocols=("http/1.1",))
+    client = Http2Client(fallback, verify=verify)
+    try:
+        response = client.get(server.url + "/a", timeout=(5, 5))
+        assert response.text == "1.1"
+        assert response.raw.version == 11
+    finally:
+        client.close()
+
+
+def test_protocol_error_switches_host_to_fallback_session(make_server, verify, fallback, monkeypatch):
+    server = make_server()
+    calls = []
+
+    def broken(request):
+        calls.append(request.url)
+        raise httpx.RemoteProtocolError("bad frame", request=request)
+
+    client = Http2Client(fallback, verify=verify)
+    monkeypatch.setattr(client, "_client", lambda proxy: httpx.Client(transport=httpx.MockTransport(broken)))
+    response = client.get(server.url + "/a", timeout=(5, 5))
+    # fallback 是 requests 会话，只使用 HTTP/1.1
+    assert response.text == "1.1"
+    client.get(server.url + "/b", timeout=(5, 5))
+    assert len(calls) == 1
+
+
+def test_plain_http_uses_fallback_session(site, fallback):
+    site.route('/a', (200, {}, b'plain'))
+    client = Http2Client(fallback)
+    assert client.get(site.url + '/a', timeout=(5, 5)).text == 'plain'
+    assert site.hits['/a'] == 1
+    assert client._clients == {}
+
+
+def test_connection_errors_map_to_requests_exceptions(verify, fallback):
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    client = Http2Client(fallback, verify=verify)
+    try:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.get(f"https://127.0.0.1:{port}/", timeout=(2, 2))
+    finally:
+        client.close()
+
+
+def test_crawler_requests_over_http2(make_server, verify, monkeypatch):
+    assert http2_transport.available()
+    server = make_server()
+    crawler = WeChatArticleCrawler(http2=True, retry_times=0)
+    try:
+        crawler.http2.verify = verify
+        response = crawler._request(server.url + "/s/article")
+        assert response.status_code == 200 and response.raw.version == 20
+    finally:
+        crawler.close()
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from article_parser import SkippedMedia
+from media_budget import ByteCounter, MediaBudget
+
+KB = 1024
+
+
+@pytest.fixture
+def download(tmp_path, site, crawler):
+    """通过本地站点下载 /media/<name>，返回 download_media 的结果"""
+    crawler.image_filter = None
+
+    def run(name, body, budget, declare_length=True):
+        headers = {'Content-Type': 'image/png'}
+        if not declare_length:
+            headers['Content-Length'] = None
+        site.route(f'/media/{name}', (200, headers, body))
+        return crawler.download_media(f'{site.url}/media/{name}', str(tmp_path), name, 1, 'img', budget)
+
+    return run
+
+
+def test_declared_length_over_file_cap_is_not_downloaded(tmp_path, download):
+    batch = ByteCounter()
+    budget = MediaBudget(max_file=2 * KB, batch=batch)
+    skipped = download('big', b'x' * (3 * KB), budget)
+    assert isinstance(skipped, SkippedMedia) and skipped.reason.startswith("文件超过")
+    assert os.listdir(tmp_path) == []
+    assert (budget.article.used, batch.used) == (0, 0)
+
+
+def test_undeclared_length_aborts_mid_stream(tmp_path, download):
+    batch = ByteCounter()
+    budget = MediaBudget(max_file=3 * KB, batch=batch)
+    skipped = download('stream', b'x' * (10 * KB), budget, declare_length=False)
+    assert isinstance(skipped, SkippedMedia) and skipped.reason.startswith("文件超过")
+    # 已写入的部分被删除，计数器只保留中止前实际传输的字节
+    assert os.listdir(tmp_path) == []
+    assert 0 < batch.used <= 3 * KB
+    assert budget.article.used == batch.used
+
+
+def test_undeclared_length_within_cap_is_counted(tmp_path, download):
+    batch = ByteCounter()
+    budget = MediaBudget(max_file=3 * KB, batch=batch)
+    path = download('small', b'x' * (2 * KB + 5), budget, declare_length=False)
+    assert os.path.getsize(path) == 2 * KB + 5
+    assert batch.used == 2 * KB + 5
+
+
+def test_batch_counter_after_skips(tmp_path, site, download):
+    batch = ByteCounter(5 * KB)
+    first = MediaBudget(max_file=3 * KB, batch=batch)
+    assert download('a', b'x' * (2 * KB), first)
+    # 单文件上限跳过的文件不占用批次预算
+    assert isinstance(download('b', b'x' * (4 * KB), first), SkippedMedia)
+    assert batch.used == 2 * KB
+
+    # 另一篇文章：超出批次上限时归还本篇已预占的字节
+    second = MediaBudget(batch=batch)
+    assert download('c', b'x' * (2 * KB), second)
+    skipped = download('d', b'x' * (2 * KB), second)
+    assert skipped.reason.startswith("超出批次媒体预算")
+    assert batch.used == 4 * KB
+    assert second.article.used == 2 * KB
+    assert second.exhausted() is None
+
+    # 批次用完后不再发出请求
+    batch.take(KB)
+    assert download('e', b'x', second).reason.startswith("超出批次媒体预算")
+    assert '/media/e' not in site.hits
+    assert sorted(os.listdir(tmp_path)) == ['a_img_1.jpg', 'c_img_1.jpg']
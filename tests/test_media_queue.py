@@ -0,0 +1,74 @@
+import glob
+import json
+import os
+import struct
+
+import pytest
+
+from config import config
+from media_queue import DEFERRED_REASON, QUEUE_FOLDER, hydrate
+
+# 200x100 的PNG文件头，图片筛选按实际尺寸判断时保留
+PNG = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR' + struct.pack('>II', 200, 100) + b'\0' * 200
+
+
+def article_page(site):
+    return (
+        '<html><body><h1 id="activity-name">图文</h1><span id="js_name">作者</span>'
+        '<em id="publish_time">2025-01-01</em><div id="js_content"><p>正文</p>'
+        f'<img data-src="{site.url}/img/1.png"><img data-src="{site.url}/img/2.png"></div></body></html>'
+    ).encode('utf-8')
+
+
+@pytest.fixture
+def deferred_batch(tmp_path, site, crawler, monkeypatch):
+    """文本优先批次，不启动后台补全（hydrate_workers=0），返回批处理文件夹"""
+    monkeypatch.setitem(config.config, "hydrate_workers", 0)
+    site.route('/s/a', (200, {'Content-Type': 'text/html'}, article_page(site)))
+    result = crawler.batch_process([site.url + '/s/a'], output_dir=str(tmp_path), formats=["json", "html"],
+                                   download_media=True, defer_media=True)
+    assert result["success"] == 1 and result["deferred"] == 1
+    return result["batch_folder"]
+
+
+def read_output(batch_folder):
+    json_path, = [path for path in glob.glob(os.path.join(batch_folder, "*", "*.json"))
+                  if QUEUE_FOLDER not in path]
+    with open(json_path, encoding='utf-8') as f:
+        article = json.load(f)
+    with open(json_path[:-5] + ".html", encoding='utf-8') as f:
+        return article, f.read()
+
+
+def test_text_first_batch_then_hydrate(deferred_batch, site, crawler):
+    site.route('/img/1.png', (200, {'Content-Type': 'image/png'}, PNG))
+    site.route('/img/2.png', (200, {'Content-Type': 'image/png'}, PNG))
+    article, page = read_output(deferred_batch)
+    assert [image["skipped"] for image in article["media_files"]["images"]] == [DEFERRED_REASON] * 2
+    assert f'{site.url}/img/1.png' in page
+    assert '/img/1.png' not in site.hits
+
+    assert hydrate(crawler, [deferred_batch]) == {"hydrated": 1, "failed": 0, "remaining": 0}
+    article, page = read_output(deferred_batch)
+    local_paths = [image.get("local_path") for image in article["media_files"]["images"]]
+    assert all(path and os.path.exists(path) for path in local_paths)
+    assert f'{site.url}/img/1.png' not in page
+    assert not os.path.exists(os.path.join(deferred_batch, QUEUE_FOLDER))
+
+
+def test_failed_download_keeps_article_queued(deferred_batch, site, crawler):
+    site.route('/img/1.png', (200, {'Content-Type': 'image/png'}, PNG))
+    site.route('/img/2.png', (404, {}, b'missing'))
+    assert hydrate(crawler, [deferred_batch]) == {"hydrated": 0, "failed": 1, "remaining": 1}
+    # 已下载的图片写入输出，失败的图片保留在线地址
+    article, page = read_output(deferred_batch)
+    assert "local_path" in article["media_files"]["images"][0]
+    assert f'{site.url}/img/2.png' in page
+    assert os.path.exists(os.path.join(deferred_batch, QUEUE_FOLDER))
+
+    # 之后再次补全成功
+    site.route('/img/2.png', (200, {'Content-Type': 'image/png'}, PNG))
+    assert hydrate(crawler, [deferred_batch]) == {"hydrated": 1, "failed": 0, "remaining": 0}
+    article, page = read_output(deferred_batch)
+    assert all("local_path" in image for image in article["media_files"]["images"])
+    assert not os.path.exists(os.path.join(deferred_batch, QUEUE_FOLDER))
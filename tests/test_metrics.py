@@ -0,0 +1,15 @@
+import urllib.request
+
+from metrics import Registry, start_metrics_server
+
+
+def test_metrics_server_binds_loopback_by_default():
+    server = start_metrics_server(0, registry=Registry())
+    try:
+        host, port = server.server_address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.status == 200
+    finally:
+        server.shutdown()
+        server.server_close()
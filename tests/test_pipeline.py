@@ -0,0 +1,116 @@
+import threading
+import time
+
+from pipeline import ByteBudget, Pipeline, Stage
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_acquire_blocks_at_limit_until_release():
+    budget = ByteBudget(100)
+    budget.acquire(60)
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (budget.acquire(60), acquired.set()), daemon=True)
+    thread.start()
+    assert not acquired.wait(0.2)
+    assert budget.in_flight == 60
+
+    budget.release(60)
+    assert acquired.wait(5)
+    thread.join()
+    assert (budget.in_flight, budget.peak) == (60, 60)
+
+
+def test_oversized_item_passes_when_budget_empty():
+    budget = ByteBudget(100)
+    budget.acquire(500)
+    assert budget.in_flight == 500
+    budget.release(500)
+    # 后续阶段的增减只记账，不阻塞
+    budget.adjust(1000)
+    assert budget.peak == 1000
+
+
+def test_unlimited_budget_never_blocks():
+    budget = ByteBudget(0)
+    budget.acquire(10 ** 9)
+    budget.acquire(10 ** 9)
+    assert budget.in_flight == 2 * 10 ** 9
+
+
+def test_pipeline_limits_bytes_in_flight():
+    release = threading.Event()
+    started = []
+
+    def fetch(item):
+        item.nbytes = 60
+        started.append(item.index)
+
+    def write(item):
+        release.wait(5)
+
+    done = []
+    pipeline = Pipeline([Stage("fetch", fetch, workers=4, admit=True), Stage("write", write, workers=4)],
+                        lambda item: done.append(item.index), queue_size=8, max_bytes=100)
+    runner = threading.Thread(target=pipeline.run, args=([(i, None) for i in range(5)],), daemon=True)
+    runner.start()
+    # 第二个条目申请预算时超出上限，在 write 阶段释放前一直阻塞
+    assert wait_until(lambda: len(started) >= 2)
+    time.sleep(0.2)
+    assert pipeline.budget.in_flight == 60
+    assert done == []
+    release.set()
+    runner.join(10)
+    assert sorted(done) == list(range(5))
+    assert pipeline.budget.in_flight == 0
+    assert pipeline.budget.peak <= 100
+
+
+def test_oversized_item_flows_through_pipeline():
+    def fetch(item):
+        item.nbytes = 1000
+
+    done = []
+    pipeline = Pipeline([Stage("fetch", fetch, admit=True), Stage("write", lambda item: None)],
+                        lambda item: done.append(item.index), max_bytes=100)
+    pipeline.run([(i, None) for i in range(3)])
+    assert done == [0, 1, 2]
+    assert pipeline.budget.in_flight == 0
+
+
+def test_stage_failure_reaches_on_done():
+    def parse(item):
+        if item.index == 1:
+            raise ValueError("解析失败")
+        item.nbytes = 10
+
+    rendered = []
+    done = []
+    pipeline = Pipeline([Stage("parse", parse, workers=2), Stage("render", lambda item: rendered.append(item.index))],
+                        lambda item: done.append((item.index, item.error)), max_bytes=100)
+    pipeline.run([(i, None) for i in range(3)])
+    assert sorted(done) == [(0, None), (1, "解析失败"), (2, None)]
+    # 失败的条目跳过剩余阶段
+    assert sorted(rendered) == [0, 2]
+    stats = pipeline.stats()["stages"]
+    assert (stats["parse"]["processed"], stats["parse"]["failed"]) == (3, 1)
+    assert pipeline.budget.in_flight == 0
+
+
+def test_on_done_error_still_releases_budget():
+    def fetch(item):
+        item.nbytes = 50
+
+    def on_done(item):
+        raise RuntimeError("回调出错")
+
+    pipeline = Pipeline([Stage("fetch", fetch, admit=True)], on_done, max_bytes=60)
+    pipeline.run([(i, None) for i in range(3)])
+    assert pipeline.budget.in_flight == 0
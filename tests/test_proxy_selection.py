@@ -0,0 +1,33 @@
+import pytest
+
+from config import config
+from proxy_pool import ProxyPool
+from wechat_article_crawler import WeChatArticleCrawler
+
+
+@pytest.fixture
+def configured_pool(monkeypatch):
+    monkeypatch.setitem(config.config, "proxy_pool", ["http://10.0.0.1:8080", "http://10.0.0.2:8080"])
+
+
+def make_crawler(**kwargs):
+    crawler = WeChatArticleCrawler(**kwargs)
+    crawler.close()
+    return crawler
+
+
+def test_config_pool_used_without_explicit_proxy(configured_pool):
+    crawler = make_crawler()
+    assert crawler.proxy_pool is not None and len(crawler.proxy_pool) == 2
+
+
+def test_explicit_proxy_overrides_config_pool(configured_pool):
+    crawler = make_crawler(proxy="http://127.0.0.1:7890")
+    assert crawler.proxy_pool is None
+    assert crawler.proxies == {"http": "http://127.0.0.1:7890", "https": "http://127.0.0.1:7890"}
+
+
+def test_explicit_pool_overrides_proxy(configured_pool):
+    pool = ProxyPool(["http://10.0.0.3:8080"])
+    crawler = make_crawler(proxy="http://127.0.0.1:7890", proxy_pool=pool)
+    assert crawler.proxy_pool is pool
@@ -0,0 +1,69 @@
+import requests
+
+import retry_policy
+from retry_policy import RetryBudget
+from conftest import ARTICLE_PAGE
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_classify():
+    assert retry_policy.classify(FakeResponse(503)) == (True, 503)
+    assert retry_policy.classify(FakeResponse(404)) == (False, 404)
+    assert retry_policy.classify(error=requests.exceptions.ConnectTimeout()) == (True, "ConnectTimeout")
+    assert retry_policy.classify(error=requests.exceptions.SSLError()) == (False, "SSLError")
+
+
+def test_retry_after():
+    assert retry_policy.retry_after(FakeResponse(429, {"Retry-After": "7"})) == 7.0
+    assert retry_policy.retry_after(FakeResponse(429)) is None
+    assert retry_policy.retry_after(FakeResponse(429, {"Retry-After": "soon"})) is None
+
+
+def test_budget_denies_after_half_spent():
+    budget = RetryBudget(max_tokens=4, token_ratio=2)
+    assert budget.on_failure()
+    assert not budget.on_failure()
+    budget.on_success()
+    assert budget.on_failure()
+    assert (budget.retries, budget.denied) == (2, 1)
+
+
+def test_process_article_retries_retryable_status(tmp_path, site, crawler):
+    site.route('/s/a', (503, {}, b'busy'), (502, {}, b'bad gateway'), (200, {'Content-Type': 'text/html'}, ARTICLE_PAGE))
+    budget = RetryBudget()
+    entry = crawler.process_article(site.url + '/s/a', 'article_001', str(tmp_path / 'a'), ['json'],
+                                    retry_budget=budget)
+    assert entry["success"]
+    assert site.hits['/s/a'] == 3
+    assert [(d["attempt"], d["outcome"], d["action"]) for d in entry["retries"]] == [
+        (1, 503, "retry"), (2, 502, "retry")
+    ]
+    assert budget.retries == 2
+
+
+def test_process_article_gives_up_on_permanent_status(tmp_path, site, crawler):
+    site.route('/s/gone', (404, {}, b'gone'))
+    entry = crawler.process_article(site.url + '/s/gone', 'article_001', str(tmp_path / 'a'), ['json'])
+    assert not entry["success"]
+    assert site.hits['/s/gone'] == 1
+    assert [(d["outcome"], d["action"]) for d in entry["retries"]] == [(404, "permanent")]
+
+
+def test_process_article_respects_retry_after_limit(tmp_path, site, crawler):
+    site.route('/s/busy', (429, {'Retry-After': '600'}, b'slow down'))
+    entry = crawler.process_article(site.url + '/s/busy', 'article_001', str(tmp_path / 'a'), ['json'])
+    assert not entry["success"]
+    assert site.hits['/s/busy'] == 1
+    assert entry["retries"][0]["action"] == "retry_after"
+
+
+def test_process_article_exhausts_retries(tmp_path, site, crawler):
+    site.route('/s/down', (502, {}, b'bad gateway'))
+    entry = crawler.process_article(site.url + '/s/down', 'article_001', str(tmp_path / 'a'), ['json'])
+    assert site.hits['/s/down'] == crawler.retry_times + 1
+    assert [d["action"] for d in entry["retries"]] == ["retry"] * crawler.retry_times + ["exhausted"]
@@ -0,0 +1,42 @@
+import time
+
+from conftest import ARTICLE_PAGE
+from scheduler import FAILED, GONE, RecrawlScheduler
+
+
+def make_scheduler(tmp_path):
+    return RecrawlScheduler(str(tmp_path / "schedule.db"), min_interval=60, initial_interval=60)
+
+
+def test_scheduled_recrawls_do_not_write_config(tmp_path, site, crawler, no_config_writes):
+    site.route('/s/a', (200, {'Content-Type': 'text/html'}, ARTICLE_PAGE))
+    site.route('/s/b', (200, {'Content-Type': 'text/html'}, ARTICLE_PAGE))
+    scheduler = make_scheduler(tmp_path)
+    try:
+        scheduler.track([site.url + '/s/a', site.url + '/s/b'])
+        totals = scheduler.run(crawler, str(tmp_path / "out"), requests_per_hour=0, once=True)
+    finally:
+        scheduler.close()
+    assert totals["changed"] == 2
+    assert no_config_writes == []
+
+
+def test_permanent_failures_are_deferred_to_max_interval(tmp_path, site, crawler):
+    site.route('/s/gone', (404, {}, b'gone'))
+    site.route('/s/down', (502, {}, b'bad gateway'))
+    crawler.retry_times = 0
+    scheduler = make_scheduler(tmp_path)
+    try:
+        scheduler.track([site.url + '/s/gone', site.url + '/s/down'])
+        started = time.time()
+        totals = scheduler.run(crawler, str(tmp_path / "out"), requests_per_hour=0, once=True)
+        assert (totals["gone"], totals["failed"]) == (1, 1)
+        assert scheduler.history(site.url + '/s/gone')[0][1] == GONE
+        assert scheduler.history(site.url + '/s/down')[0][1] == FAILED
+        # 临时故障按最短间隔退避，不可访问的文章推迟到最长间隔之后
+        assert scheduler.due(10, now=started + 120) == [site.url + '/s/down']
+        assert len(scheduler.due(10, now=started + scheduler.max_interval + 1)) == 2
+        stats = scheduler.stats(now=started + 120)
+        assert (stats["gone"], stats["failing"]) == (1, 2)
+    finally:
+        scheduler.close()
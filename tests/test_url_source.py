@@ -0,0 +1,50 @@
+import os
+import sys
+
+import wechat_article_crawler
+from conftest import ARTICLE_PAGE
+from url_source import BloomFilter, SeenSet, dedupe_urls
+
+
+def test_seen_set_stays_in_memory_below_threshold():
+    seen = SeenSet(threshold=3)
+    urls = ["https://mp.weixin.qq.com/s/a", "https://mp.weixin.qq.com/s/b", "https://mp.weixin.qq.com/s/a?scene=1"]
+    assert list(dedupe_urls(urls, seen)) == urls[:2]
+    assert seen._bloom is None
+    seen.close()
+
+
+def test_seen_set_switches_to_bloom_filter_above_threshold():
+    seen = SeenSet(threshold=2, capacity=1000)
+    urls = [f"https://mp.weixin.qq.com/s/{i}" for i in range(5)]
+    assert list(dedupe_urls(urls + urls, seen)) == urls
+    assert seen._bloom is not None
+    path = seen._bloom.path
+    assert os.path.getsize(path) < 4096
+    seen.close()
+    assert not os.path.exists(path)
+
+
+def test_processed_urls_are_checked_but_not_added(tmp_path):
+    with BloomFilter(str(tmp_path / "seen.bloom"), capacity=1000) as processed:
+        processed.add("https://mp.weixin.qq.com/s/done")
+        urls = ["https://mp.weixin.qq.com/s/done", "http://mp.weixin.qq.com/s/new"]
+        assert list(dedupe_urls(urls, set(), processed)) == urls[1:]
+        assert "https://mp.weixin.qq.com/s/new" not in processed
+
+
+def test_seen_db_only_records_successful_articles(tmp_path, site, monkeypatch):
+    site.route('/s/ok', (200, {'Content-Type': 'text/html'}, ARTICLE_PAGE))
+    site.route('/s/down', (404, {}, b'gone'))
+    url_file = tmp_path / "urls.txt"
+    url_file.write_text(f"{site.url}/s/ok\n{site.url}/s/down\n", encoding='utf-8')
+    argv = ['wechat_article_crawler.py', '-f', str(url_file), '-r', '0', '-d', str(tmp_path / "out"),
+            '--seen_db', str(tmp_path / "seen.bloom")]
+    monkeypatch.setattr(sys, 'argv', argv)
+
+    wechat_article_crawler.main()
+    assert site.hits == {'/s/ok': 1, '/s/down': 1}
+
+    # 第二次运行跳过成功的文章，失败的文章重新处理
+    wechat_article_crawler.main()
+    assert site.hits == {'/s/ok': 1, '/s/down': 2}
@@ -0,0 +1,59 @@
+import os
+
+from conftest import ARTICLE_PAGE
+from warc import WarcRecorder, iter_responses
+
+
+def read_all(files):
+    return [record for path in files for record in iter_responses(path)]
+
+
+def test_recorded_exchanges_read_back(tmp_path, site, crawler):
+    image = os.urandom(5000)
+    site.route('/s/old', (302, {'Location': '/s/a'}, b''))
+    site.route('/s/a', (200, {'Content-Type': 'text/html; charset=utf-8'}, ARTICLE_PAGE))
+    site.route('/img/1.png', (200, {'Content-Type': 'image/png'}, image))
+    crawler.image_filter = None
+
+    # 随机内容的图片压缩后仍超过4KB，写完图片后滚动到新文件
+    recorder = WarcRecorder(str(tmp_path / "warc"), prefix="test", max_file_mb=4 / 1024)
+    recorder.start()
+    try:
+        assert crawler._fetch_article_page(site.url + '/s/old') is not None
+        path = crawler.download_media(site.url + '/img/1.png', str(tmp_path / "media"), "a", 1)
+        assert path and os.path.exists(path)
+        crawler._fetch_article_page(site.url + '/s/a')
+    finally:
+        recorder.stop()
+
+    assert recorder.errors == 0
+    assert recorder.records == 4
+    assert [os.path.basename(path) for path in recorder.files] == ["test-00000.warc.gz", "test-00001.warc.gz"]
+
+    records = read_all(recorder.files)
+    assert [(url, status) for url, status, _, _ in records] == [
+        (site.url + '/s/old', 302),
+        (site.url + '/s/a', 200),
+        (site.url + '/img/1.png', 200),
+        (site.url + '/s/a', 200),
+    ]
+    _, _, headers, body = records[1]
+    assert body == ARTICLE_PAGE
+    assert headers["content-type"] == "text/html; charset=utf-8"
+    assert headers["content-length"] == str(len(ARTICLE_PAGE))
+    _, _, headers, body = records[2]
+    assert body == image
+    assert headers["content-type"] == "image/png"
+    # 滚动后的文件只包含之后的记录
+    assert [url for url, _, _, _ in iter_responses(recorder.files[1])] == [site.url + '/s/a']
+
+
+def test_recorder_inactive_after_stop(tmp_path, site, crawler):
+    site.route('/s/a', (200, {'Content-Type': 'text/html'}, ARTICLE_PAGE))
+    recorder = WarcRecorder(str(tmp_path / "warc"))
+    recorder.start()
+    crawler._fetch_article_page(site.url + '/s/a')
+    recorder.stop()
+    crawler._fetch_article_page(site.url + '/s/a')
+    assert recorder.records == 1
+    assert len(read_all(recorder.files)) == 1
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+from work_queue import RespClient, RedisWorkQueue, SQLiteWorkQueue, run_worker
+from resp_server import RespServer
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_queue(request, tmp_path):
+    """创建连接到同一后端的队列（模拟多个节点）"""
+    queues = []
+    server = RespServer().start() if request.param == "redis" else None
+
+    def make(max_attempts=3):
+        if server is not None:
+            queue = RedisWorkQueue(RespClient('127.0.0.1', server.port), max_attempts=max_attempts)
+        else:
+            queue = SQLiteWorkQueue(str(tmp_path / "queue.db"), max_attempts=max_attempts)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+    if server is not None:
+        server.stop()
+
+
+def test_put_dedupes_urls(make_queue):
+    queue = make_queue()
+    assert queue.put(["https://mp.weixin.qq.com/s/a", "https://mp.weixin.qq.com/s/b"]) == 2
+    assert queue.put(["https://mp.weixin.qq.com/s/a"]) == 0
+    stats = queue.stats()
+    assert (stats["pending"], stats["total"]) == (2, 2)
+
+
+def test_lease_ack(make_queue):
+    queue = make_queue()
+    queue.put(["https://mp.weixin.qq.com/s/a"])
+    task = queue.lease("n1")
+    assert task.url == "https://mp.weixin.qq.com/s/a" and task.attempts == 1
+    assert queue.lease("n2") is None
+    assert queue.extend(task)
+    queue.ack(task, "n1", {"title": "t"})
+    stats = queue.stats()
+    assert (stats["done"], stats["leased"], stats["pending"]) == (1, 0, 0)
+    assert stats["nodes"]["n1"]["done"] == 1
+
+
+def test_nack_retries_until_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    queue.put(["https://mp.weixin.qq.com/s/a"])
+    task = queue.lease("n1")
+    queue.nack(task, "n1", "503")
+    task = queue.lease("n1")
+    assert task.attempts == 2
+    queue.nack(task, "n1", "503")
+    assert queue.lease("n1") is None
+    assert queue.stats()["failed"] == 1
+
+
+def test_permanent_nack_fails_immediately(make_queue):
+    queue = make_queue()
+    queue.put(["https://mp.weixin.qq.com/s/a"])
+    queue.nack(queue.lease("n1"), "n1", "404", permanent=True)
+    stats = queue.stats()
+    assert (stats["failed"], stats["pending"]) == (1, 0)
+
+
+def test_expired_lease_fails_at_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    queue.put(["https://mp.weixin.qq.com/s/a"])
+    # 模拟节点处理时崩溃：租约过期后被重新领取，第二次过期后标记为失败
+    first = queue.lease("n1", visibility_timeout=0.05)
+    time.sleep(0.1)
+    second = queue.lease("n2", visibility_timeout=0.05)
+    assert second.task_id == first.task_id and second.attempts == 2
+    time.sleep(0.1)
+    assert queue.lease("n3") is None
+    stats = queue.stats()
+    assert (stats["failed"], stats["pending"], stats["leased"]) == (1, 0, 0)
+    # 过期的租约不能再确认
+    queue.ack(second, "n2")
+    assert queue.stats()["done"] == 0
+
+
+def test_concurrent_leases_are_exclusive(make_queue):
+    urls = [f"https://mp.weixin.qq.com/s/{i}" for i in range(40)]
+    make_queue().put(urls)
+    leased = []
+    lock = threading.Lock()
+
+    def worker(node):
+        queue = make_queue()
+        while True:
+            task = queue.lease(node)
+            if task is None:
+                break
+            with lock:
+                leased.append(task.url)
+            queue.ack(task, node)
+
+    threads = [threading.Thread(target=worker, args=(f"n{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(leased) == sorted(urls)
+    assert make_queue().stats()["done"] == 40
+
+
+def test_concurrent_put_adds_once(make_queue):
+    added = []
+
+    def worker():
+        added.append(make_queue().put(["https://mp.weixin.qq.com/s/same"]))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(added) == 1
+    assert make_queue().stats()["total"] == 1
+
+
+def test_worker_fails_permanent_errors_without_requeue(tmp_path, site, crawler, make_queue):
+    site.route('/s/gone', (404, {}, b'gone'))
+    queue = make_queue(max_attempts=3)
+    queue.put([site.url + '/s/gone'])
+    processed = run_worker(crawler, queue, str(tmp_path), ['json'], node_id="n1", poll_interval=0.01)
+    assert processed["failed"] == 1
+    assert site.hits['/s/gone'] == 1
+    assert queue.stats()["failed"] == 1
+
+
+def test_worker_requeues_retryable_errors(tmp_path, site, crawler, make_queue):
+    site.route('/s/down', (502, {}, b'bad gateway'))
+    crawler.retry_times = 0
+    queue = make_queue(max_attempts=2)
+    queue.put([site.url + '/s/down'])
+    processed = run_worker(crawler, queue, str(tmp_path), ['json'], node_id="n1", poll_interval=0.01)
+    assert processed["failed"] == 2
+    assert site.hits['/s/down'] == 2
+    assert queue.stats()["failed"] == 1
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 当前运行中的追踪器，None 表示未开启（此时各追踪函数直接返回，没有额外开销）
+_active = None
+_NULL = nullcontext()
+
+
+def span(name, cat="crawler", **args):
+    """记录一个同步跨度（同一线程内开始和结束），未开启追踪时返回空上下文
+
+    用法:
+        with tracing.span("download_media", url=url):
+            ...
+    """
+    tracer = _active
+    if tracer is None:
+        return _NULL
+    return tracer.span(name, cat, args)
+
+
+def article_begin(index, url):
+    """文章开始处理（文章可能跨多个线程处理，使用异步事件记录）"""
+    tracer = _active
+    if tracer is not None:
+        tracer.async_event("b", "article", index, {"url": url})
+
+
+def article_end(index, **args):
+    """文章处理结束"""
+    tracer = _active
+    if tracer is not None:
+        tracer.async_event("e", "article", index, args)
+
+
+class Tracer:
+    """Chrome Trace Event 格式的时间线记录器
+
+    输出的JSON可以在 chrome://tracing 或 https://ui.perfetto.dev 中打开，
+    每个工作线程一条轨道，文章作为跨线程的异步轨道显示。
+    """
+
+    def __init__(self, max_events=1_000_000):
+        """
+        Args:
+            max_events (int, optional): 最多记录的事件数，超出后丢弃新事件。默认为100万。
+        """
+        self.max_events = max_events
+        self.events = []
+        self.dropped = 0
+        self._pid = os.getpid()
+        self._origin = time.perf_counter_ns()
+        self._named_threads = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """开始追踪：各处理阶段（fetch/parse/media/render/write）自动记录为跨度"""
+        global _active
+        _active = self
+        metrics.add_stage_hook(self.stage)
+        self.events.append({
+            "ph": "M", "name": "process_name", "pid": self._pid, "tid": 0,
+            "args": {"name": "wechat_crawler"}
+        })
+        logger.info("时间线追踪已开启")
+
+    def stop(self):
+        """停止追踪"""
+        global _active
+        metrics.remove_stage_hook(self.stage)
+        if _active is self:
+            _active = None
+
+    def _now(self):
+        return (time.perf_counter_ns() - self._origin) / 1000
+
+    def _append(self, event):
+        tid = event["tid"]
+        if tid not in self._named_threads:
+            with self._lock:
+                if tid not in self._named_threads:
+                    self._named_threads.add(tid)
+                    self.events.append({
+                        "ph": "M", "name": "thread_name", "pid": self._pid, "tid": tid,
+                        "args": {"name": threading.current_thread().name}
+                    })
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        self.events.append(event)
+
+    def stage(self, name):
+        """阶段钩子"""
+        return self.span(name, "stage", {})
+
+    @contextmanager
+    def span(self, name, cat, args):
+        started = self._now()
+        try:
+            yield
+        finally:
+            event = {
+                "ph": "X", "name": name, "cat": cat, "pid": self._pid, "tid": threading.get_ident(),
+                "ts": started, "dur": self._now() - started
+            }
+            if args:
+                event["args"] = args
+            self._append(event)
+
+    def async_event(self, phase, name, event_id, args):
+        event = {
+            "ph": phase, "name": name, "cat": name, "id": event_id, "pid": self._pid,
+            "tid": threading.get_ident(), "ts": self._now()
+        }
+        if args:
+            event["args"] = args
+        self._append(event)
+
+    def write(self, path):
+        """写出 Chrome trace JSON 文件
+
+        Returns:
+            str: 文件路径
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "traceEvents": self.events,
+                "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": self.dropped}
+            }, f, ensure_ascii=False)
+        if self.dropped:
+            logger.warning(f"追踪事件超过上限 {self.max_events}，已丢弃 {self.dropped} 个事件")
+        logger.info(f"时间线追踪已保存: {path}")
+        return path
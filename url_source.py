@@ -0,0 +1,249 @@
+import os
+import io
+import sys
+import gzip
+import mmap
+import math
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from incremental import canonical_article_url
+
+logger = logging.getLogger(__name__)
+
+
+def open_url_source(path):
+    """打开URL输入源，支持普通文件、gzip压缩文件和标准输入（"-"）
+
+    Returns:
+        file object: 按行迭代的文本流
+    """
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='ignore')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='ignore')
+    return open(path, 'r', encoding='utf-8', errors='ignore')
+
+
+def iter_urls(sources, prefix='http'):
+    """逐行流式读取URL，不会一次性读入整个文件
+
+    Args:
+        sources (list): 输入源列表，元素可以是文件路径、"-"（标准输入）或已打开的可迭代文本对象
+        prefix (str, optional): 有效URL的前缀。默认为"http"。
+
+    Yields:
+        str: 去除首尾空白后的URL
+    """
+    for source in sources:
+        if isinstance(source, str):
+            stream = open_url_source(source)
+            should_close = source != '-'
+        else:
+            stream = source
+            should_close = False
+        try:
+            for line in stream:
+                url = line.strip()
+                if url and url.startswith(prefix):
+                    yield url
+        finally:
+            if should_close:
+                stream.close()
+
+
+def dedupe_urls(urls, seen, processed=None, key=canonical_article_url):
+    """按规范化URL去重，惰性地产出首次出现的URL
+
+    Args:
+        urls (iterable): URL迭代器
+        seen (set, SeenSet or BloomFilter): 本次运行的已见集合，产出的URL会加入其中
+        processed (BloomFilter, optional): 以前已成功处理过的URL（如 --seen_db），只检查不加入；
+            由调用方在文章处理成功后加入，失败或取消的URL下次运行仍会处理。默认为None。
+        key (callable, optional): 计算去重键的函数。默认为 canonical_article_url。
+
+    Yields:
+        str: 未出现过的URL
+    """
+    duplicates = 0
+    skipped = 0
+    for url in urls:
+        url_key = key(url) if key else url
+        if processed is not None and url_key in processed:
+            skipped += 1
+            continue
+        if isinstance(seen, set):
+            if url_key in seen:
+                duplicates += 1
+                continue
+            seen.add(url_key)
+        elif not seen.add(url_key):
+            duplicates += 1
+            continue
+        yield url
+    if duplicates:
+        logger.info(f"已跳过 {duplicates} 个重复URL")
+    if skipped:
+        logger.info(f"已跳过 {skipped} 个以前成功处理过的URL")
+
+
+class SeenSet:
+    """本次运行的URL已见集合
+
+    数量不超过阈值时使用普通集合（精确，不占磁盘）；超过阈值后把已有元素转入临时布隆过滤器，
+    避免小批量也分配按1亿条URL计算的过滤器文件。
+    """
+
+    def __init__(self, threshold=1_000_000, capacity=100_000_000, error_rate=0.001):
+        """
+        Args:
+            threshold (int, optional): 使用普通集合的最大元素数。默认为100万。
+            capacity (int, optional): 转入布隆过滤器后的预期容量。默认为1亿。
+            error_rate (float, optional): 布隆过滤器的目标误判率。默认为0.001。
+        """
+        self.threshold = threshold
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._items = set()
+        self._bloom = None
+
+    def __contains__(self, item):
+        if self._bloom is not None:
+            return item in self._bloom
+        return item in self._items
+
+    def add(self, item):
+        """添加元素
+
+        Returns:
+            bool: 元素此前不存在（新加入）时返回True
+        """
+        if self._bloom is not None:
+            return self._bloom.add(item)
+        if item in self._items:
+            return False
+        self._items.add(item)
+        if len(self._items) > self.threshold:
+            logger.info(f"去重URL超过 {self.threshold} 条，转为使用布隆过滤器")
+            self._bloom = BloomFilter(capacity=max(self.capacity, len(self._items) * 2), error_rate=self.error_rate)
+            for existing in self._items:
+                self._bloom.add(existing)
+            self._items = set()
+        return True
+
+    def close(self):
+        if self._bloom is not None:
+            self._bloom.close()
+
+
+class BloomFilter:
+    """基于内存映射文件的持久化布隆过滤器
+
+    位数组直接存放在 mmap 文件中，内存占用由操作系统页缓存管理，
+    1亿条URL、误判率0.1%时约占用 172MB 磁盘空间（稀疏文件，按需分配）。
+    """
+
+    MAGIC = b'WXBLOOM1'
+    # magic, capacity, error_rate, num_bits, num_hashes
+    HEADER = struct.Struct('<8sQdQI')
+
+    def __init__(self, path=None, capacity=100_000_000, error_rate=0.001):
+        """打开或创建布隆过滤器
+
+        Args:
+            path (str, optional): 位数组文件路径。为None时使用临时文件，关闭后删除。
+            capacity (int, optional): 预期元素数量。默认为1亿。
+            error_rate (float, optional): 目标误判率。默认为0.001。
+        """
+        self._temporary = path is None
+        if self._temporary:
+            fd, path = tempfile.mkstemp(prefix='wechat_seen_', suffix='.bloom')
+            os.close(fd)
+            os.remove(path)
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.exists(path) and os.path.getsize(path) >= self.HEADER.size:
+            self._file = open(path, 'r+b')
+            magic, capacity, error_rate, num_bits, num_hashes = self.HEADER.unpack(
+                self._file.read(self.HEADER.size)
+            )
+            if magic != self.MAGIC:
+                self._file.close()
+                raise ValueError(f"不是有效的布隆过滤器文件: {path}")
+            logger.info(f"加载已有布隆过滤器: {path} (容量: {capacity}, 误判率: {error_rate})")
+        else:
+            num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+            num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+            self._file = open(path, 'w+b')
+            self._file.write(self.HEADER.pack(self.MAGIC, capacity, error_rate, num_bits, num_hashes))
+            # 扩展为稀疏文件，未写入的页不占用磁盘
+            self._file.truncate(self.HEADER.size + (num_bits + 7) // 8)
+            self._file.flush()
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._offset = self.HEADER.size
+
+    def _positions(self, item):
+        """双重哈希计算位位置"""
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        h2 |= 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, item):
+        mm = self._mm
+        offset = self._offset
+        for pos in self._positions(item):
+            if not mm[offset + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, item):
+        """添加元素
+
+        Returns:
+            bool: 元素此前不存在（新加入）时返回True
+        """
+        positions = self._positions(item)
+        mm = self._mm
+        offset = self._offset
+        added = False
+        with self._lock:
+            for pos in positions:
+                index = offset + (pos >> 3)
+                bit = 1 << (pos & 7)
+                byte = mm[index]
+                if not byte & bit:
+                    mm[index] = byte | bit
+                    added = True
+        return added
+
+    def flush(self):
+        """将位数组刷新到磁盘"""
+        self._mm.flush()
+
+    def close(self):
+        """关闭过滤器，临时文件会被删除"""
+        if self._mm.closed:
+            return
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+        if self._temporary:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
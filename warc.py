@@ -0,0 +1,269 @@
+import os
+import gzip
+import uuid
+import queue
+import base64
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# 当前运行中的记录器，None 表示未开启（此时各记录函数直接返回）
+_active = None
+
+# 请求库已解码压缩的正文，记录中去掉这些与实际正文不符的头部，Content-Length 按解码后的长度重写
+_DROP_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+
+_HTTP_VERSIONS = {10: "HTTP/1.0", 11: "HTTP/1.1", 20: "HTTP/2"}
+
+_STOP = object()
+
+
+def record_response(response):
+    """记录一次HTTP交换（含重定向前的响应），正文取 response.content，未开启时直接返回"""
+    recorder = _active
+    if recorder is not None:
+        for item in list(response.history) + [response]:
+            recorder.submit(item, item.content, None)
+
+
+def record_file(response, path):
+    """记录一次流式下载的HTTP交换，正文为已写入磁盘的文件，由后台线程读取"""
+    recorder = _active
+    if recorder is not None:
+        recorder.submit(response, None, path)
+
+
+def _record_id():
+    return f"<urn:uuid:{uuid.uuid4()}>"
+
+
+def _warc_date():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _sha1_label(digest):
+    return "sha1:" + base64.b32encode(digest.digest()).decode("ascii")
+
+
+def _http_head(response, body_length):
+    """重建响应的状态行和头部"""
+    version = _HTTP_VERSIONS.get(getattr(response.raw, "version", None), "HTTP/1.1")
+    lines = [f"{version} {response.status_code} {response.reason or ''}".rstrip()]
+    for name, value in response.headers.items():
+        if name.lower() not in _DROP_HEADERS:
+            lines.append(f"{name}: {value}")
+    lines.append(f"Content-Length: {body_length}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8", "replace")
+
+
+def _request_head(request):
+    """重建请求行和头部"""
+    path = request.path_url
+    host = request.url.split("/", 3)[2] if "://" in request.url else ""
+    lines = [f"{request.method} {path} HTTP/1.1", f"Host: {host}"]
+    for name, value in request.headers.items():
+        if name.lower() != "host":
+            lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8", "replace")
+
+
+class WarcRecorder:
+    """把抓取到的HTTP交换（文章页面和媒体文件）写入按大小滚动的 gzip 压缩 WARC 文件
+
+    每条记录是一个独立的 gzip 成员，符合 WARC 1.1 和常见工具（warcio、pywb 等）的读取方式。
+    爬虫线程只把响应放入有界队列，压缩和写盘在后台线程完成；队列满时爬虫线程等待，内存占用有上限。
+    requests 已经解码了 gzip 等压缩编码，记录中的正文是解码后的内容，头部中的 Content-Encoding 被去掉。
+    """
+
+    def __init__(self, folder, prefix="crawl", max_file_mb=1024, queue_size=1000):
+        """
+        Args:
+            folder (str): WARC 文件夹
+            prefix (str, optional): 文件名前缀，文件名为 <前缀>-<序号>.warc.gz。默认为"crawl"。
+            max_file_mb (float, optional): 单个WARC文件达到该大小（MB，压缩后）后开始写新文件。默认为1024。
+            queue_size (int, optional): 等待写入的记录数上限。默认为1000。
+        """
+        self.folder = folder
+        self.prefix = prefix
+        self.max_bytes = int(max_file_mb * 1024 * 1024)
+        self.records = 0
+        self.errors = 0
+        self.files = []
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._file = None
+
+    def start(self):
+        """开始记录：爬虫的页面请求和媒体下载自动写入WARC"""
+        global _active
+        os.makedirs(self.folder, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="warc-writer", daemon=True)
+        self._thread.start()
+        _active = self
+        logger.info(f"WARC记录已开启: {self.folder}")
+
+    def stop(self):
+        """停止记录，等待队列中的记录全部写完后关闭文件"""
+        global _active
+        if _active is self:
+            _active = None
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        logger.info(f"WARC记录完成 [记录: {self.records}条, 文件: {len(self.files)}个, 失败: {self.errors}条]")
+
+    def submit(self, response, body, path):
+        """把一次HTTP交换放入写入队列（body 与 path 二选一）"""
+        self._queue.put((response, body, path, _warc_date()))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            try:
+                self._write_exchange(*item)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"写入WARC记录失败 [URL: {item[0].url}, 错误: {e}]")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open_file(self):
+        """打开新的WARC文件并写入 warcinfo 记录"""
+        path = os.path.join(self.folder, f"{self.prefix}-{len(self.files):05d}.warc.gz")
+        self._file = open(path, "wb")
+        self.files.append(path)
+        info = (
+            "software: wechat_crawler\r\n"
+            "format: WARC File Format 1.1\r\n"
+            "conformsTo: http://iipc.github.io/warc-specifications/specifications/warc-format/warc-1.1/\r\n"
+        ).encode("utf-8")
+        self._write_record({
+            "WARC-Type": "warcinfo",
+            "WARC-Record-ID": _record_id(),
+            "WARC-Date": _warc_date(),
+            "WARC-Filename": os.path.basename(path),
+            "Content-Type": "application/warc-fields",
+        }, [info])
+
+    def _write_record(self, headers, blocks, length=None, block_digest=None):
+        """写入一条记录（一个 gzip 成员）
+
+        Args:
+            headers (dict): WARC 头部（不含 Content-Length 和块摘要）
+            blocks (iterable): 记录内容的字节块
+            length (int, optional): 内容总长度，为None时按 blocks 计算（blocks 须为列表）
+            block_digest (str, optional): 内容的摘要
+        """
+        if length is None:
+            length = sum(len(block) for block in blocks)
+        if block_digest is None and isinstance(blocks, list):
+            digest = hashlib.sha1()
+            for block in blocks:
+                digest.update(block)
+            block_digest = _sha1_label(digest)
+        lines = ["WARC/1.1"] + [f"{name}: {value}" for name, value in headers.items()]
+        if block_digest:
+            lines.append(f"WARC-Block-Digest: {block_digest}")
+        lines.append(f"Content-Length: {length}")
+        with gzip.GzipFile(fileobj=self._file, mode="wb") as member:
+            member.write(("\r\n".join(lines) + "\r\n\r\n").encode("utf-8"))
+            for block in blocks:
+                member.write(block)
+            member.write(b"\r\n\r\n")
+
+    def _write_exchange(self, response, body, path, date):
+        """写入一次HTTP交换：response 记录和对应的 request 记录"""
+        if self._file is None:
+            self._open_file()
+
+        # 正文来自内存或磁盘文件；文件先读一遍计算摘要，写入时再流式读取，不整体读入内存
+        if path is not None:
+            body_length = os.path.getsize(path)
+
+            def body_blocks():
+                with open(path, "rb") as f:
+                    yield from iter(lambda: f.read(1024 * 1024), b"")
+        else:
+            body_length = len(body)
+
+            def body_blocks():
+                yield body
+
+        head = _http_head(response, body_length)
+        payload_digest = hashlib.sha1()
+        block_digest = hashlib.sha1(head)
+        for chunk in body_blocks():
+            payload_digest.update(chunk)
+            block_digest.update(chunk)
+
+        response_id = _record_id()
+        self._write_record({
+            "WARC-Type": "response",
+            "WARC-Record-ID": response_id,
+            "WARC-Date": date,
+            "WARC-Target-URI": response.url,
+            "Content-Type": "application/http; msgtype=response",
+            "WARC-Payload-Digest": _sha1_label(payload_digest),
+        }, (block for part in ([head], body_blocks()) for block in part),
+            length=len(head) + body_length, block_digest=_sha1_label(block_digest))
+
+        request = getattr(response, "request", None)
+        if request is not None:
+            self._write_record({
+                "WARC-Type": "request",
+                "WARC-Record-ID": _record_id(),
+                "WARC-Date": date,
+                "WARC-Target-URI": response.url,
+                "WARC-Concurrent-To": response_id,
+                "Content-Type": "application/http; msgtype=request",
+            }, [_request_head(request)])
+        self.records += 1
+
+        if self._file.tell() >= self.max_bytes:
+            self._file.close()
+            self._file = None
+
+
+def iter_responses(path):
+    """读取WARC文件（.warc 或 .warc.gz）中的 response 记录
+
+    Yields:
+        tuple: (目标URL, HTTP状态码, 头部字典（键为小写）, 正文bytes)
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            if not line.startswith(b"WARC/"):
+                raise ValueError(f"无效的WARC记录: {line[:50]!r}")
+            headers = {}
+            for line in iter(f.readline, b"\r\n"):
+                if not line:
+                    return
+                name, _, value = line.decode("utf-8", "replace").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            block = f.read(int(headers.get("content-length", 0)))
+            if headers.get("warc-type") != "response" or "msgtype=response" not in headers.get("content-type", ""):
+                continue
+            head, _, body = block.partition(b"\r\n\r\n")
+            lines = head.decode("iso-8859-1").split("\r\n")
+            try:
+                status = int(lines[0].split()[1])
+            except (IndexError, ValueError):
+                continue
+            http_headers = {}
+            for header in lines[1:]:
+                name, _, value = header.partition(":")
+                http_headers[name.strip().lower()] = value.strip()
+            yield headers.get("warc-target-uri", ""), status, http_headers, body
@@ -1,44 +1,148 @@
 import requests
-from bs4 import BeautifulSoup
-import re
+from requests.adapters import HTTPAdapter
 import json
 import time
 import argparse
-import html
 import os
 import urllib.parse
-from urllib.request import urlretrieve
 import random
 import logging
 from config import config
+from incremental import FingerprintStore, canonical_article_url
+from url_source import BloomFilter, SeenSet, iter_urls, dedupe_urls
+from work_queue import open_work_queue, run_worker
+from scheduler import RecrawlScheduler
+from reprocess import reprocess
+from article_parser import parse_article_page, extract_video_info, extract_permanent_url, MediaMap, SkippedMedia
+from article_model import json_default
+from image_filter import ImageFilter, PROBE_BYTES, image_size, is_filtered
+from media_budget import ByteCounter, MediaBudget
+from retry_policy import RetryBudget
+from article_render import (render_article_outputs, render_text, render_html, render_markdown,
+                            summarize_article, parse_and_render_article)
+from concurrent.futures import ProcessPoolExecutor
+from pipeline import Pipeline, Stage
+import metrics
+import profiling
+import tracing
+import warc
+import retry_policy
+import http2_transport
+import deadline
+from profiling import StageProfiler
+from tracing import Tracer
+from warc import WarcRecorder
+from http2_transport import Http2Client
+from proxy_pool import ProxyPool, is_verification_page, mask_proxy
+from deadline import Deadline, DEADLINE_REASON
+from media_queue import DeferredMedia, MediaQueue, MediaHydrator, QUEUE_FOLDER, hydrate, cleanup
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 输出格式名称映射（界面使用中文名称）
+FORMAT_MAPPING = {
+    "文本": "text",
+    "HTML": "html",
+    "JSON": "json",
+    "Markdown": "markdown",
+    "markdown": "markdown",
+    "html": "html",
+    "text": "text",
+    "json": "json"
+}
+
+# 流水线阶段名称，按处理顺序排列
+PIPELINE_STAGES = ("fetch", "parse", "media", "render", "write")
+
+def normalize_formats(formats):
+    """将输出格式名称统一转换为程序内部使用的名称"""
+    return [FORMAT_MAPPING.get(f, f) for f in formats]
+
 class WeChatArticleCrawler:
-    def __init__(self, proxy=None, timeout=10, retry_times=3, retry_delay=2):
+    def __init__(self, proxy=None, timeout=10, retry_times=3, retry_delay=2, http2=None, proxy_pool=None,
+                 connect_timeout=None):
         """初始化爬虫
         
         Args:
             proxy (str, optional): 代理服务器地址，格式如 http://127.0.0.1:7890。默认为None不使用代理。
-            timeout (int, optional): 请求超时时间，单位秒。默认为10。
+            timeout (int, optional): 读取超时时间（两次收到数据之间的最长间隔），单位秒。默认为10。
             retry_times (int, optional): 请求失败重试次数。默认为3。
             retry_delay (int, optional): 重试延迟时间，单位秒。默认为2。
+            http2 (bool, optional): 是否使用 HTTP/2 传输（需要安装 httpx[http2]）。默认为 config["http2"]。
+            proxy_pool (ProxyPool, optional): 多个出口代理的轮换池，提供时代替 proxy。
+                未提供且未指定 proxy 时按 config["proxy_pool"] 创建，未配置时不使用。
+            connect_timeout (float, optional): 建立连接的超时时间，单位秒，0表示与 timeout 相同。
+                默认为 config["connect_timeout"]。
         """
         self.headers = {
             "User-Agent": config.get("user_agent"),
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7"
         }
         self.proxies = {"http": proxy, "https": proxy} if proxy else None
-        self.timeout = timeout
+        # 显式指定的代理（命令行 -p、界面中填写的代理）优先于配置中的代理池，显式传入的代理池优先于单个代理
+        if proxy_pool is None and not proxy:
+            proxy_pool = ProxyPool.from_config(config)
+        elif proxy_pool is None:
+            if config.get("proxy_pool"):
+                logger.info(f"使用指定的代理 {mask_proxy(proxy)}，忽略配置中的代理池 proxy_pool")
+        elif proxy:
+            logger.info(f"使用代理池 ({len(proxy_pool)}个代理)，忽略指定的代理 {mask_proxy(proxy)}")
+        self.proxy_pool = proxy_pool
+        # 连接超时和读取超时分开设置：连不上的地址尽快放弃，大文件下载不受影响
+        if connect_timeout is None:
+            connect_timeout = config.get("connect_timeout", 5)
+        self.connect_timeout = connect_timeout or timeout
+        self.read_timeout = timeout
+        self.timeout = (self.connect_timeout, self.read_timeout)
+        # 单篇文章（页面、重试等待和全部媒体）的处理时限，单位秒，0表示不限制
+        self.article_deadline = config.get("article_deadline", 0)
         self.retry_times = retry_times
         self.retry_delay = retry_delay
+        # 服务器要求等待超过该秒数（Retry-After）时放弃请求，不再重试
+        self.retry_after_max = config.get("retry_after_max", 60)
+        
+        # 复用连接池和Cookie：同一实例的请求共享会话，连接池大小需覆盖流水线中并发请求的线程数
+        self.session = requests.Session()
+        pool_size = config.get("http_pool_size", 32)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # HTTP/2：同一主机（如图片服务器）的并发请求复用一条连接，不支持时回退到上面的HTTP/1.1会话
+        self.http2 = None
+        if http2 is None:
+            http2 = config.get("http2", False)
+        if http2:
+            if http2_transport.available():
+                self.http2 = Http2Client(self.session, pool_size)
+            else:
+                logger.warning("未安装 httpx[http2]，使用HTTP/1.1 (pip install \"httpx[http2]\")")
+        
+        # 下载图片时的筛选规则（跳过装饰性图片、请求限宽版本）
+        self.image_filter = ImageFilter.from_config(config)
+        
+        # 媒体下载的字节上限（MB，0表示不限制）：单个文件、单篇文章；批次上限见 batch_process
+        self.media_max_file_mb = config.get("media_max_file_mb", 0)
+        self.media_max_article_mb = config.get("media_max_article_mb", 0)
         
-        logger.info(f"爬虫初始化完成 [代理: {proxy if proxy else '无'}, 超时: {timeout}秒, 重试: {retry_times}次]")
+        # 视频信息中是否保留原始嵌入数据（iframe_data，可能是整段HTML）
+        self.keep_iframe_data = config.get("keep_iframe_data", True)
+        
+        proxy_info = f"代理池 {len(self.proxy_pool)}个" if self.proxy_pool else (mask_proxy(proxy) if proxy else '无')
+        logger.info(f"爬虫初始化完成 [代理: {proxy_info}, 超时: 连接{self.connect_timeout}秒/读取{timeout}秒, "
+                    f"重试: {retry_times}次, "
+                    f"HTTP/2: {'是' if self.http2 else '否'}]")
     
     def _request(self, url, method="get", **kwargs):
-        """发送HTTP请求，带有重试机制
+        """发送HTTP请求，按失败类型决定是否重试
+        
+        只有可重试的失败（限流、超时、5xx、连接错误）才会重试，404/403等直接放弃；
+        响应带 Retry-After 时按其等待，超过 config["retry_after_max"] 秒则放弃。
+        在 retry_policy.recording 范围内（批量处理）时使用批次重试预算，并把每次失败的处理决定记入文章结果。
+        使用代理池时每次尝试都从池中选择代理并报告结果，遇到验证页面视为该代理的可重试失败。
+        当前线程启用了文章处理时限（deadline.active）时，每次尝试的超时不超过剩余时间，剩余时间不够等待重试时放弃。
         
         Args:
             url (str): 请求的URL
@@ -46,11 +150,12 @@ class WeChatArticleCrawler:
             **kwargs: 传递给requests的其他参数
         
         Returns:
-            Response: requests的Response对象，如果所有重试都失败则返回None
+            Response: requests的Response对象，如果请求失败则返回None
         """
         if "headers" not in kwargs:
             kwargs["headers"] = self.headers
-        if "proxies" not in kwargs and self.proxies:
+        use_pool = self.proxy_pool is not None and "proxies" not in kwargs
+        if "proxies" not in kwargs and self.proxies and not use_pool:
             kwargs["proxies"] = self.proxies
         if "timeout" not in kwargs:
             kwargs["timeout"] = self.timeout
@@ -61,150 +166,220 @@ class WeChatArticleCrawler:
         
         # 初始化重试次数
         retry_count = 0
+        host = urllib.parse.urlsplit(url).netloc
+        budget = retry_policy.current_budget()
+        time_limit = deadline.current()
+        base_timeout = kwargs["timeout"]
+        session = self.http2 or self.session
         
-        while retry_count <= self.retry_times:
+        while True:
+            response = None
+            error = None
+            verification = False
+            proxy = None
+            if use_pool:
+                proxy = self.proxy_pool.acquire(host)
+                kwargs["proxies"] = {"http": proxy, "https": proxy}
+            if time_limit is not None:
+                kwargs["timeout"] = deadline.clip_timeout(base_timeout, time_limit.remaining())
+            started = time.perf_counter()
             try:
-                if method.lower() == "get":
-                    response = requests.get(url, **kwargs)
-                elif method.lower() == "post":
-                    response = requests.post(url, **kwargs)
-                else:
-                    raise ValueError(f"不支持的请求方法: {method}")
+                with profiling.network():
+                    if method.lower() == "get":
+                        response = session.get(url, **kwargs)
+                    elif method.lower() == "post":
+                        response = session.post(url, **kwargs)
+                    else:
+                        raise ValueError(f"不支持的请求方法: {method}")
+                metrics.REQUESTS.labels(host, response.status_code).inc()
                 
                 # 检查响应状态
                 if response.status_code == 200:
-                    return response
+                    verification = use_pool and not kwargs.get("stream") and is_verification_page(response)
+                    if not verification:
+                        if proxy is not None:
+                            self.proxy_pool.report(proxy, True, time.perf_counter() - started)
+                        if budget is not None:
+                            budget.on_success()
+                        return response
+                    logger.warning(f"遇到验证页面 [URL: {url}, 代理: {mask_proxy(proxy)}]")
                 else:
                     logger.warning(f"请求失败 [URL: {url}, 状态码: {response.status_code}]")
             except Exception as e:
+                error = e
+                metrics.REQUESTS.labels(host, "error").inc()
                 logger.warning(f"请求异常 [URL: {url}, 错误: {str(e)}]")
             
-            # 如果请求失败且未达到最大重试次数，则等待后重试
-            retry_count += 1
-            if retry_count <= self.retry_times:
-                # 使用指数退避策略，延迟时间逐渐增加
-                delay = self.retry_delay * (2 ** (retry_count - 1)) + random.uniform(0, 1)
-                logger.info(f"等待 {delay:.2f} 秒后进行第 {retry_count} 次重试...")
-                time.sleep(delay)
+            # 判断失败类型：不可重试、次数用完、Retry-After 过长、文章时限不够或批次预算不足时放弃
+            retryable, outcome = retry_policy.classify(response, error)
+            if verification:
+                retryable, outcome = True, "verification"
+            if proxy is not None:
+                # 404等说明代理本身正常，连接失败、超时、限流和验证页面计为代理的失败
+                self.proxy_pool.report(proxy, not retryable, time.perf_counter() - started, verification)
+            # 服务器指定了 Retry-After 时按其等待，否则使用指数退避策略，延迟时间逐渐增加
+            wait = retry_policy.retry_after(response)
+            if wait is not None:
+                delay = wait
             else:
-                logger.error(f"达到最大重试次数 {self.retry_times}，请求失败 [URL: {url}]")
+                delay = self.retry_delay * (2 ** retry_count) + random.uniform(0, 1)
+            # 未设置文章处理时限（Deadline(0)）时剩余时间为None，不限制重试
+            remaining = time_limit.remaining() if time_limit is not None else None
+            if not retryable:
+                action = "permanent"
+            elif retry_count >= self.retry_times:
+                action = "exhausted"
+            elif wait is not None and wait > self.retry_after_max:
+                action = "retry_after"
+            elif remaining is not None and delay >= remaining:
+                action = "deadline"
+            elif budget is not None and not budget.on_failure():
+                action = "budget"
+            else:
+                action = "retry"
+            
+            if action != "retry":
+                if response is not None:
+                    response.close()
+                retry_policy.record(url, retry_count + 1, outcome, action)
+                logger.error(f"请求失败，不再重试 [URL: {url}, 原因: {retry_policy.ACTIONS[action]}({outcome})]")
                 return None
+            
+            retry_count += 1
+            metrics.RETRIES.labels(host).inc()
+            if response is not None:
+                response.close()
+            retry_policy.record(url, retry_count, outcome, action, delay)
+            logger.info(f"等待 {delay:.2f} 秒后进行第 {retry_count} 次重试...")
+            with profiling.retry_sleep(), tracing.span("retry_sleep", url=url, attempt=retry_count):
+                time.sleep(delay)
+    
+    def close(self):
+        """关闭HTTP会话，释放连接池中的连接"""
+        if self.http2 is not None:
+            self.http2.close()
+        self.session.close()
                 
-    def download_media(self, url, save_folder, prefix, index, media_type='img'):
-        """下载媒体文件（图片或视频）并返回本地路径"""
+    def download_media(self, url, save_folder, prefix, index, media_type='img', budget=None):
+        """下载媒体文件（图片或视频）并返回本地路径
+
+        提供 budget（MediaBudget）时按 Content-Length 预占字节，边下载边计数，
+        超出单文件、单篇或批次上限时不下载（或中止下载并删除已写入的部分），返回 SkippedMedia。
+        超出当前文章的处理时限时同样不下载或中止下载。
+        """
         if not url or url.startswith('data:'):
             return None
+        time_limit = deadline.current()
+        if time_limit is not None and time_limit.expired():
+            logger.info(f"跳过{media_type} [{DEADLINE_REASON}]: {url}")
+            return SkippedMedia(DEADLINE_REASON)
+        if budget is not None:
+            exhausted = budget.exhausted()
+            if exhausted:
+                logger.info(f"跳过{media_type} [{exhausted}]: {url}")
+                return SkippedMedia(exhausted)
         
-        # 确保文件夹存在
-        os.makedirs(save_folder, exist_ok=True)
-        
-        # 获取文件扩展名
-        if media_type == 'img':
-            # 对于图片，从URL获取扩展名或默认为.jpg
-            ext = os.path.splitext(url.split('?')[0])[1]
-            if not ext or len(ext) > 5:  # 如果扩展名不存在或异常长度，使用默认值
-                ext = '.jpg'
-        else:  # 视频
-            ext = '.mp4'  # 默认视频扩展名
-        
-        # 构建保存路径
-        filename = f"{prefix}_{media_type}_{index}{ext}"
-        save_path = os.path.join(save_folder, filename)
-        
-        try:
-            # 下载文件
-            logger.info(f"正在下载{media_type}: {url}")
-            response = self._request(url, stream=True)
+        with tracing.span("download_media", url=url, kind=media_type):
+            # 确保文件夹存在
+            os.makedirs(save_folder, exist_ok=True)
             
-            if response and response.status_code == 200:
-                with open(save_path, 'wb') as f:
-                    for chunk in response.iter_content(1024):
-                        f.write(chunk)
-                logger.info(f"下载成功: {save_path}")
-                return save_path
-            else:
-                logger.warning(f"下载失败，无法获取内容 [URL: {url}]")
+            # 获取文件扩展名
+            if media_type == 'img':
+                # 对于图片，从URL获取扩展名或默认为.jpg
+                ext = os.path.splitext(url.split('?')[0])[1]
+                if not ext or len(ext) > 5:  # 如果扩展名不存在或异常长度，使用默认值
+                    ext = '.jpg'
+            else:  # 视频
+                ext = '.mp4'  # 默认视频扩展名
+            
+            # 构建保存路径
+            filename = f"{prefix}_{media_type}_{index}{ext}"
+            save_path = os.path.join(save_folder, filename)
+            
+            try:
+                # 下载文件
+                logger.info(f"正在下载{media_type}: {url}")
+                response = self._request(url, stream=True)
+                
+                if response and response.status_code == 200:
+                    downloaded = 0
+                    # 已预占的字节数：声明了长度时先整体预占，超出声明长度的部分边下载边占用
+                    reserved = 0
+                    if budget is not None:
+                        try:
+                            length = int(response.headers.get('Content-Length') or 0)
+                        except ValueError:
+                            length = 0
+                        if length:
+                            skipped = budget.reserve(length)
+                            if skipped:
+                                response.close()
+                                logger.info(f"跳过{media_type} [{skipped}, {length}字节]: {url}")
+                                return SkippedMedia(skipped)
+                            reserved = length
+                    # 图片开头的字节中包含实际尺寸，不符合筛选规则时中止下载
+                    probe = media_type == 'img' and self.image_filter is not None and self.image_filter.probe
+                    header = b''
+                    skipped = None
+                    try:
+                        with profiling.network(), open(save_path, 'wb') as f:
+                            for chunk in response.iter_content(1024):
+                                if time_limit is not None and time_limit.expired():
+                                    skipped = DEADLINE_REASON
+                                    break
+                                if budget is not None and downloaded + len(chunk) > reserved:
+                                    extra = downloaded + len(chunk) - reserved
+                                    skipped = budget.reserve(extra, file_total=downloaded + len(chunk))
+                                    if skipped:
+                                        break
+                                    reserved += extra
+                                f.write(chunk)
+                                downloaded += len(chunk)
+                                if probe:
+                                    header += chunk
+                                    size = image_size(header)
+                                    if size:
+                                        probe = False
+                                        skipped = self.image_filter.check_size(*size)
+                                        if skipped:
+                                            break
+                                    elif len(header) >= PROBE_BYTES:
+                                        probe = False
+                    finally:
+                        response.close()
+                        metrics.DOWNLOADED_BYTES.labels('img' if media_type == 'img' else 'video').inc(downloaded)
+                        # 中止下载时归还预占但没有下载的部分
+                        if budget is not None:
+                            budget.release(reserved - downloaded)
+                    if skipped:
+                        os.remove(save_path)
+                        logger.info(f"跳过{media_type} [{skipped}]: {url}")
+                        return SkippedMedia(skipped)
+                    warc.record_file(response, save_path)
+                    logger.info(f"下载成功: {save_path}")
+                    return save_path
+                elif time_limit is not None and time_limit.expired():
+                    # 请求因剩余时间不够而放弃或超时，与尚未开始的媒体一样记为超出时限
+                    logger.info(f"跳过{media_type} [{DEADLINE_REASON}]: {url}")
+                    return SkippedMedia(DEADLINE_REASON)
+                else:
+                    logger.warning(f"下载失败，无法获取内容 [URL: {url}]")
+                    return None
+            except Exception as e:
+                if time_limit is not None and time_limit.expired():
+                    if os.path.exists(save_path):
+                        os.remove(save_path)
+                    logger.info(f"跳过{media_type} [{DEADLINE_REASON}]: {url}")
+                    return SkippedMedia(DEADLINE_REASON)
+                logger.error(f"下载{media_type}时出错: {e}")
                 return None
-        except Exception as e:
-            logger.error(f"下载{media_type}时出错: {e}")
-            return None
-    
-    def extract_video_info(self, iframe_data, soup):
-        """从iframe数据中提取视频信息"""
-        video_info = {}
-        
-        # 尝试提取视频源
-        video_url = None
-        vid = None
-        
-        # 处理腾讯视频
-        vid_match = re.search(r'vid=([^&]+)', iframe_data)
-        if vid_match:
-            vid = vid_match.group(1)
-            # 修改构建腾讯视频链接的方式，使用更可靠的格式
-            video_url = f"https://v.qq.com/txp/iframe/player.html?vid={vid}"
-            video_info = {
-                'type': 'tencent',
-                'original_url': video_url,
-                'vid': vid,
-                'iframe_data': iframe_data
-            }
-        
-        # 检查是否包含完整URL（常见于视频号）
-        url_match = re.search(r'(https?://[^\s"\'>]+)', iframe_data)
-        if url_match and not video_url:
-            found_url = url_match.group(1)
-            # 检查是否是视频链接
-            if 'v.qq.com' in found_url or 'video' in found_url or '.mp4' in found_url:
-                video_url = found_url
-                video_info = {
-                    'type': 'embedded_url',
-                    'original_url': video_url,
-                    'iframe_data': iframe_data
-                }
         
-        # 处理直接包含视频源的情况
-        src_match = re.search(r'src=[\'"]([^\'"]+)[\'"]', iframe_data)
-        if src_match and not video_url:
-            src = src_match.group(1)
-            if src.endswith('.mp4') or 'video' in src:
-                video_url = src
-                video_info = {
-                    'type': 'direct',
-                    'original_url': video_url,
-                    'iframe_data': iframe_data
-                }
-            elif 'v.qq.com' in src:
-                # 如果是腾讯视频的嵌入链接
-                video_url = src
-                # 检查是否有vid参数
-                vid_in_src = re.search(r'vid=([^&]+)', src)
-                if vid_in_src:
-                    video_info = {
-                        'type': 'tencent',
-                        'original_url': video_url,
-                        'vid': vid_in_src.group(1),
-                        'iframe_data': iframe_data
-                    }
-                else:
-                    video_info = {
-                        'type': 'tencent_embed',
-                        'original_url': video_url,
-                        'iframe_data': iframe_data
-                    }
-        
-        # 如果发现了视频信息但链接可能存在问题，确保提供备选链接
-        if video_info and video_info.get('type') == 'tencent' and 'vid' in video_info:
-            # 提供多个可能的链接格式
-            video_info['alternate_urls'] = [
-                f"https://v.qq.com/txp/iframe/player.html?vid={video_info['vid']}",  # iframe嵌入播放器
-                f"https://v.qq.com/x/page/{video_info['vid']}.html",                # 常规页面
-                f"https://v.qq.com/x/cover/mzc002007knwk8q/{video_info['vid']}.html" # 带封面ID的格式
-            ]
-        
-        return video_info
+    def extract_video_info(self, iframe_data, soup=None):
+        """从iframe数据中提取视频信息"""
+        return extract_video_info(iframe_data, self.keep_iframe_data)
     
-    def get_article_info(self, url, download_media=False, media_folder='media', download_videos=False):
+    def get_article_info(self, url, download_media=False, media_folder='media', download_videos=False, fingerprint_store=None,
+                         batch_bytes=None, deferred=None):
         """
         获取微信文章信息（标题、作者、发布时间、正文）
         
@@ -213,330 +388,274 @@ class WeChatArticleCrawler:
             download_media (bool, optional): 是否下载媒体文件（图片和视频）。默认为False。
             media_folder (str, optional): 媒体文件保存文件夹。默认为'media'。
             download_videos (bool, optional): 是否尝试下载视频文件（需要安装yt-dlp）。默认为False。
+            fingerprint_store (FingerprintStore, optional): 增量模式使用的指纹库。提供时会计算内容指纹，
+                若与上次记录一致则跳过媒体下载和内容处理，直接返回带 "unchanged" 标记的简要信息。默认为None。
+            batch_bytes (ByteCounter, optional): 批次共用的媒体字节计数器（批次媒体预算）。默认为None。
+            deferred (DeferredMedia, optional): 文本优先模式：提供时不下载媒体，全部记录为延后下载，
+                原始页面保存在其中供之后补全。默认为None。
             
         Returns:
             dict or None: 文章信息字典，如果失败则返回None
         """
         try:
-            # 请求文章页面
-            logger.info(f"正在请求文章：{url}")
-            response = self._request(url)
-            
+            with metrics.stage("fetch"):
+                response = self._fetch_article_page(url)
             if not response:
-                logger.error(f"无法获取文章内容 [URL: {url}]")
                 return None
-                
-            # 确保使用正确的编码
-            if response.encoding.lower() != 'utf-8':
-                response.encoding = 'utf-8'
-                
-            # 解析页面内容
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 提取文章标题
-            title = soup.select_one("#activity-name")
-            title_text = title.text.strip() if title else "未找到标题"
-            
-            # 检查是否找到内容，如果标题为"未找到标题"，可能是文章已被删除或者访问受限
-            if title_text == "未找到标题":
-                # 尝试查找其他可能的错误信息
-                error_msg = soup.select_one(".weui-msg__title") or soup.select_one(".tips")
-                if error_msg:
-                    error_text = error_msg.text.strip()
-                    logger.error(f"文章访问受限: {error_text}")
-                    return {
-                        "error": True,
-                        "message": error_text,
-                        "original_url": url
-                    }
-            
-            # 提取文章作者
-            author = soup.select_one("#js_name") or soup.select_one(".wx_article_info .wx_article_info_one span:first-child")
-            author_text = author.text.strip() if author else "未找到作者"
             
-            # 提取发布时间
-            publish_time = soup.select_one("#publish_time") or soup.select_one("#js_publish_time") or soup.select_one(".wx_article_info_one span.time")
-            publish_time_text = publish_time.text.strip() if publish_time else "未找到发布时间"
+            previous = self._previous_fingerprint(fingerprint_store, url, response.url)
             
-            # 创建用于存储媒体文件的字典
-            media_files = {
-                'images': [],
-                'videos': []
-            }
-            
-            # 创建用于文章标识的安全文件名前缀
-            safe_prefix = re.sub(r'[^\w\s-]', '', title_text).replace(' ', '_')
-            if len(safe_prefix) > 50:
-                safe_prefix = safe_prefix[:50]
-            
-            # 提取文章内容
-            content_div = soup.select_one("#js_content")
-            if not content_div:
-                logger.warning("未找到文章内容区域，尝试其他选择器")
-                content_div = soup.select_one(".rich_media_content") or soup.select_one(".wx_article_content")
-                
-            if content_div:
-                # 处理所有图片
-                img_index = 1
-                for img in content_div.find_all("img"):
-                    # 获取图片URL
-                    img_url = None
-                    if img.get("data-src"):
-                        img_url = img["data-src"]
-                        img["src"] = img_url  # 更新src属性
-                    elif img.get("src"):
-                        img_url = img["src"]
-                    
-                    # 如果需要下载图片
-                    if download_media and img_url:
-                        local_path = self.download_media(
-                            img_url, 
-                            media_folder, 
-                            safe_prefix, 
-                            img_index,
-                            'img'
-                        )
-                        if local_path:
-                            # 将本地路径添加到图片列表
-                            media_files['images'].append({
-                                'original_url': img_url,
-                                'local_path': local_path
-                            })
-                            # 修改HTML中的图片路径（相对路径）
-                            img["src"] = os.path.relpath(local_path, '.').replace('\\', '/')
-                            img_index += 1
-                
-                # 处理所有视频
-                video_index = 1
-                # 删除音频元素，因为难以提取
-                for mpvoice in content_div.find_all("mpvoice"):
-                    mpvoice.extract()  
-                
-                # 查找视频元素 - 处理多种可能的视频容器
-                video_elements = []
-                # 1. 常规视频iframe视频
-                video_elements.extend(content_div.find_all("div", class_=lambda c: c and "video_iframe" in c))
-                # 2. iframe标签
-                video_elements.extend(content_div.find_all("iframe"))
-                # 3. video标签
-                video_elements.extend(content_div.find_all("video"))
-                # 4. 包含wxv-video类的div
-                video_elements.extend(content_div.find_all("div", class_=lambda c: c and "wxv-video" in c))
-                # 5. 微信视频号的特殊容器
-                video_elements.extend(content_div.find_all("div", class_=lambda c: c and "js_editor_wxvideo" in c))
-                # 6. 新增：处理js_video_page_wrap类
-                video_elements.extend(content_div.find_all("div", class_=lambda c: c and "js_video_page_wrap" in c))
-                
-                logger.info(f"找到 {len(video_elements)} 个视频元素")
-                
-                for video_div in video_elements:
-                    # 尝试获取视频URL
-                    iframe_data = video_div.get("data-src") or video_div.get("src") or str(video_div)
-                    
-                    # 提取视频元素
-                    if iframe_data:
-                        # 提取视频信息
-                        video_info = self.extract_video_info(iframe_data, soup)
-                        
-                        if video_info:
-                            # 如果需要下载视频
-                            local_video_path = None
-                            if download_media and download_videos:
-                                local_video_path = self.download_video(
-                                    video_info,
-                                    media_folder,
-                                    safe_prefix,
-                                    video_index
-                                )
-                                if local_video_path:
-                                    video_info['local_path'] = local_video_path
-                            
-                            # 收集视频信息
-                            media_files['videos'].append(video_info)
-                            
-                            # 替换为更明显的视频播放提示
-                            new_tag = soup.new_tag("div")
-                            new_tag["style"] = "padding:10px; border:1px solid #ddd; background-color:#f9f9f9; margin:10px 0; text-align:center;"
-                            
-                            # 如果成功下载视频，添加视频标签
-                            if local_video_path:
-                                video_tag = soup.new_tag("video")
-                                video_tag["controls"] = ""
-                                video_tag["width"] = "100%"
-                                video_tag["style"] = "max-width:600px;"
-                                
-                                source_tag = soup.new_tag("source")
-                                source_tag["src"] = os.path.relpath(local_video_path, '.').replace('\\', '/')
-                                source_tag["type"] = "video/mp4"
-                                
-                                video_tag.append(source_tag)
-                                new_tag.append(video_tag)
-                                
-                                video_link = soup.new_tag("p")
-                                video_link.string = "[已下载视频]"
-                                new_tag.append(video_link)
-                            elif video_info.get('type') == 'tencent':
-                                video_link = soup.new_tag("a")
-                                video_link["href"] = video_info['original_url']
-                                video_link["target"] = "_blank"
-                                video_link.string = f"[腾讯视频: {video_info['vid']}]"
-                                new_tag.append(video_link)
-                                
-                                # 如果有备选链接，添加提示
-                                if 'alternate_urls' in video_info:
-                                    new_tag.append(soup.new_tag("br"))
-                                    alt_text = soup.new_tag("small")
-                                    alt_text.string = "若链接无效，请尝试："
-                                    new_tag.append(alt_text)
-                                    
-                                    for i, alt_url in enumerate(video_info['alternate_urls']):
-                                        if i > 0:  # 跳过第一个，因为和原始链接相同
-                                            new_tag.append(soup.new_tag("br"))
-                                            alt_link = soup.new_tag("a")
-                                            alt_link["href"] = alt_url
-                                            alt_link["target"] = "_blank"
-                                            alt_link.string = f"备选链接 {i}"
-                                            new_tag.append(alt_link)
-                            else:
-                                # 其他类型视频
-                                if 'original_url' in video_info and video_info['original_url'].startswith('http'):
-                                    video_link = soup.new_tag("a")
-                                    video_link["href"] = video_info['original_url']
-                                    video_link["target"] = "_blank"
-                                    video_link.string = f"[视频链接: {video_info.get('type', '未知类型')}]"
-                                    new_tag.append(video_link)
-                                else:
-                                    video_text = soup.new_tag("p")
-                                    video_text.string = f"[视频内容: {video_info.get('type', '未知类型')}]"
-                                    new_tag.append(video_text)
-                            
-                            video_div.replace_with(new_tag)
-                            video_index += 1
-                
-                # 获取文本内容 - 清理格式
-                content_text = content_div.get_text(separator="\n", strip=True)
-                
-                # 清理HTML内容 - 去除多余属性，只保留基本结构
-                for tag in content_div.find_all(True):
-                    attrs = dict(tag.attrs)
-                    for attr in attrs:
-                        if attr not in ['src', 'href', 'alt', 'width', 'height', 'style', 'target']:
-                            del tag[attr]
-                
-                # 获取HTML内容
-                content_html = str(content_div)
+            # 解析页面，需要下载的媒体在解析过程中直接下载；文本优先模式下只记录为延后下载
+            if deferred is not None:
+                deferred.page = response.content
+                deferred.final_url = response.url
+                media_resolver = deferred
             else:
-                content_text = "未找到文章内容"
-                content_html = ""
-            
-            # 提取永久链接参数（如果有）
-            permanent_url = None
-            biz_match = re.search(r'__biz=([^&]+)', response.url)
-            mid_match = re.search(r'mid=([^&]+)', response.url)
-            idx_match = re.search(r'idx=([^&]+)', response.url)
-            sn_match = re.search(r'sn=([^&]+)', response.url)
-            
-            if biz_match and mid_match and idx_match and sn_match:
-                biz = biz_match.group(1)
-                mid = mid_match.group(1)
-                idx = idx_match.group(1)
-                sn = sn_match.group(1)
-                permanent_url = f"https://mp.weixin.qq.com/s?__biz={biz}&mid={mid}&idx={idx}&sn={sn}"
-            
-            # 返回结果
-            result = {
-                "original_url": url,
-                "permanent_url": permanent_url if permanent_url else url,
-                "title": title_text,
-                "author": author_text,
-                "publish_time": publish_time_text,
-                "content_text": content_text[:500] + "..." if len(content_text) > 500 else content_text,  # 限制输出长度
-                "full_content_text": content_text,
-                "content_html": content_html,
-                "media_files": media_files
-            }
+                media_resolver = self._media_resolver(media_folder, download_videos, batch_bytes) if download_media else None
+            started = time.perf_counter()
+            with metrics.stage("parse", observe=False):
+                result = parse_article_page(
+                    response.content,
+                    url,
+                    response.url,
+                    media_resolver=media_resolver,
+                    track_fingerprint=fingerprint_store is not None,
+                    previous_fingerprint=previous["fingerprint"] if previous else None,
+                    image_filter=self.image_filter,
+                    keep_iframe_data=self.keep_iframe_data
+                )
+            # 边解析边下载时，把下载耗时从解析耗时中分离出来
+            media_seconds = media_resolver.elapsed[0] if media_resolver and deferred is None else 0.0
+            metrics.STAGE_SECONDS.labels("parse").observe(time.perf_counter() - started - media_seconds)
+            if media_resolver and deferred is None:
+                metrics.STAGE_SECONDS.labels("media").observe(media_seconds)
+            if result.get("unchanged"):
+                result["previous_output"] = previous.get("output_folder")
             
             return result
             
         except Exception as e:
-            print(f"处理URL时出错: {e}")
+            logger.error(f"处理URL时出错 [URL: {url}, 错误: {e}]")
             return None
-
-    def download_video(self, video_info, save_folder, prefix, index):
-        """尝试下载视频到本地"""
-        if not video_info or 'original_url' not in video_info:
+    
+    def _fetch_article_page(self, url):
+        """请求文章页面（网络I/O），失败时返回None"""
+        logger.info(f"正在请求文章：{url}")
+        response = self._request(url)
+        
+        if not response:
+            logger.error(f"无法获取文章内容 [URL: {url}]")
             return None
+        metrics.DOWNLOADED_BYTES.labels("page").inc(len(response.content))
+        warc.record_response(response)
+        return response
+    
+    def _previous_fingerprint(self, fingerprint_store, url, final_url):
+        """查询增量模式下文章上次记录的指纹"""
+        if fingerprint_store is None:
+            return None
+        return fingerprint_store.get(extract_permanent_url(final_url) or url)
+    
+    def _media_resolver(self, media_folder, download_videos=False, batch_bytes=None):
+        """创建边解析边下载的媒体回调，文件编号规则：图片按下载成功的顺序，视频按出现顺序
 
-        # 确保文件夹存在
-        os.makedirs(save_folder, exist_ok=True)
+        每次调用对应一篇文章，按配置创建该文章的媒体预算；batch_bytes 为批次共用的字节计数器。
+        """
+        img_index = [1]
+        elapsed = [0.0]
+        budget = MediaBudget(int(self.media_max_file_mb * 1024 * 1024),
+                             int(self.media_max_article_mb * 1024 * 1024), batch_bytes)
         
-        # 构建保存路径
-        filename = f"{prefix}_video_{index}.mp4"
-        save_path = os.path.join(save_folder, filename)
+        def download(kind, target, position, prefix):
+            if kind == 'img':
+                local_path = self.download_media(target, media_folder, prefix, img_index[0], 'img', budget)
+                if local_path:
+                    img_index[0] += 1
+                return local_path
+            if download_videos:
+                return self.download_video(target, media_folder, prefix, position + 1, budget)
+            return None
         
-        try:
-            # 根据视频类型选择下载方法
-            if video_info.get('type') == 'direct' and video_info['original_url'].endswith('.mp4'):
-                # 直接MP4链接，可以直接下载
-                print(f"正在下载视频: {video_info['original_url']}")
-                return self.download_media(video_info['original_url'], save_folder, prefix, index, 'video')
+        def resolve(kind, target, position, prefix):
+            started = time.perf_counter()
+            try:
+                # 下载耗时单独累计，这里只触发阶段钩子（如性能剖析），不计入阶段耗时直方图
+                with metrics.stage("media", observe=False):
+                    return download(kind, target, position, prefix)
+            finally:
+                elapsed[0] += time.perf_counter() - started
+        
+        # 累计的下载耗时，供统计使用
+        resolve.elapsed = elapsed
+        return resolve
+    
+    def _download_scanned_media(self, scan, media_folder, download_videos=False, batch_bytes=None):
+        """下载扫描得到的媒体（进程池模式），返回可跨进程传递的 MediaMap"""
+        resolve = self._media_resolver(media_folder, download_videos, batch_bytes)
+        media_map = MediaMap()
+        for position, img_url in enumerate(scan["images"]):
+            # 被筛选规则跳过的图片为None，渲染时重新判断并记录原因
+            if img_url is None:
+                continue
+            local_path = resolve('img', img_url, position, scan["safe_prefix"])
+            if local_path is not None:
+                media_map.images[position] = local_path
+        for position, video_info in enumerate(scan["videos"]):
+            local_path = resolve('video', video_info, position, scan["safe_prefix"])
+            if local_path is not None:
+                media_map.videos[position] = local_path
+        return media_map
+    
+    def hydrate_article(self, entry, page, batch_bytes=None, retry_budget=None):
+        """补全文本优先模式下延后的媒体：下载媒体后按原来的输出位置和格式重新渲染，替换已写入的输出
+        
+        Args:
+            entry (dict): MediaQueue 中的文章记录
+            page (bytes): 保存的原始页面
+            batch_bytes (ByteCounter, optional): 共用的媒体字节计数器。默认为None。
+            retry_budget (RetryBudget, optional): 共用的重试预算。默认为None。
             
-            elif 'v.qq.com' in video_info.get('original_url', '') and 'vid' in video_info:
-                # 腾讯视频需要特殊处理
-                vid = video_info['vid']
-                print(f"尝试从腾讯视频下载(VID: {vid})")
-                
-                # 尝试构造直接访问的URL进行下载
-                # 这些大多数情况下不会成功，但某些情况可能有效
-                urls_to_try = [
-                    f"https://ugcws.video.gtimg.com/uwMROfz2r5zAoaQXGdGnC2dfJ7wFjpl1CyOdV6vIfCTkm6VC/{vid}.mp4",
-                    f"https://defaultts.tc.qq.com/{vid}.mp4",
-                    f"https://apd-vlive.apdcdn.tc.qq.com/vmipfsgateway.tc.qq.com/{vid}.mp4"
-                ]
-                
-                for url in urls_to_try:
-                    try:
-                        print(f"尝试从 {url} 下载")
-                        response = requests.head(url, headers=self.headers, timeout=5)
-                        if response.status_code == 200:
-                            return self.download_media(url, save_folder, prefix, index, 'video')
-                    except Exception as e:
-                        print(f"尝试URL失败: {e}")
+        Returns:
+            dict: 文章简要信息（同 summarize_article），retries 中记录请求失败的处理决定，
+                unresolved_media 为仍未下载的媒体数（下载失败、超出媒体预算或处理时限），不为0时应保留页面以便再次补全
+        """
+        retries = []
+        with retry_policy.recording(retries, retry_budget), deadline.active(Deadline(self.article_deadline)):
+            scan = parse_article_page(page, entry["url"], entry["final_url"], None, False, None, True,
+                                      self.image_filter, self.keep_iframe_data)
+            if "scan" not in scan:
+                raise ValueError(scan.get("message", "解析失败"))
+            with metrics.stage("media"):
+                media_map = self._download_scanned_media(scan, entry["media_folder"], entry["videos"], batch_bytes)
+        
+        # 已下载或被图片筛选规则跳过的媒体算作已处理，其余仍保留在线地址
+        def resolved(local_path):
+            if isinstance(local_path, SkippedMedia):
+                return is_filtered(local_path.reason)
+            return bool(local_path)
+        
+        unresolved = sum(1 for position, img_url in enumerate(scan["images"])
+                         if img_url is not None and not resolved(media_map.images.get(position)))
+        if entry["videos"]:
+            unresolved += sum(1 for position in range(len(scan["videos"]))
+                              if not resolved(media_map.videos.get(position)))
+        with metrics.stage("render"):
+            result, outputs = parse_and_render_article(
+                page, entry["url"], entry["final_url"], entry["article_folder"], entry["article_id"], entry["formats"],
+                media_map, entry["fingerprint"], None, True, self.image_filter, self.keep_iframe_data
+            )
+        if "error" in result:
+            raise ValueError(result.get("message", "解析失败"))
+        # 先写临时文件再替换，读取方不会读到写了一半的输出
+        with metrics.stage("write"):
+            for _, file_path, content in outputs:
+                temp_path = file_path + ".tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(temp_path, file_path)
+        result["retries"] = retries
+        result["unresolved_media"] = unresolved
+        return result
+
+    def download_video(self, video_info, save_folder, prefix, index, budget=None):
+        """尝试下载视频到本地，提供 budget 时超出媒体预算的视频返回 SkippedMedia"""
+        if not video_info or 'original_url' not in video_info:
+            return None
+        time_limit = deadline.current()
+        if time_limit is not None and time_limit.expired():
+            return SkippedMedia(DEADLINE_REASON)
+
+        with tracing.span("download_video", url=video_info.get('original_url'), type=video_info.get('type')):
+            # 确保文件夹存在
+            os.makedirs(save_folder, exist_ok=True)
+            
+            # 构建保存路径
+            filename = f"{prefix}_video_{index}.mp4"
+            save_path = os.path.join(save_folder, filename)
+            
+            try:
+                # 根据视频类型选择下载方法
+                if video_info.get('type') == 'direct' and video_info['original_url'].endswith('.mp4'):
+                    # 直接MP4链接，可以直接下载
+                    print(f"正在下载视频: {video_info['original_url']}")
+                    return self.download_media(video_info['original_url'], save_folder, prefix, index, 'video', budget)
                 
-                # 如果上述方法都失败，尝试使用youtube-dl或其他工具下载
-                try:
-                    import yt_dlp
+                elif 'v.qq.com' in video_info.get('original_url', '') and 'vid' in video_info:
+                    # 腾讯视频需要特殊处理
+                    vid = video_info['vid']
+                    print(f"尝试从腾讯视频下载(VID: {vid})")
+                    
+                    # 尝试构造直接访问的URL进行下载
+                    # 这些大多数情况下不会成功，但某些情况可能有效
+                    urls_to_try = [
+                        f"https://ugcws.video.gtimg.com/uwMROfz2r5zAoaQXGdGnC2dfJ7wFjpl1CyOdV6vIfCTkm6VC/{vid}.mp4",
+                        f"https://defaultts.tc.qq.com/{vid}.mp4",
+                        f"https://apd-vlive.apdcdn.tc.qq.com/vmipfsgateway.tc.qq.com/{vid}.mp4"
+                    ]
                     
-                    print("使用yt-dlp尝试下载视频...")
-                    for url in video_info.get('alternate_urls', []):
+                    for url in urls_to_try:
                         try:
-                            ydl_opts = {
-                                'format': 'mp4',
-                                'outtmpl': save_path,
-                                'quiet': True,
-                                'no_warnings': True
-                            }
-                            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                                ydl.download([url])
-                            
-                            if os.path.exists(save_path) and os.path.getsize(save_path) > 0:
-                                print(f"使用yt-dlp成功下载视频到: {save_path}")
-                                return save_path
+                            print(f"尝试从 {url} 下载")
+                            with profiling.network():
+                                response = self.session.head(url, headers=self.headers, timeout=deadline.clip_timeout(
+                                    5, time_limit.remaining() if time_limit is not None else None))
+                            if response.status_code == 200:
+                                return self.download_media(url, save_folder, prefix, index, 'video', budget)
                         except Exception as e:
-                            print(f"yt-dlp下载失败: {e}")
-                except ImportError:
-                    print("未安装yt-dlp，无法下载腾讯视频。请安装: pip install yt-dlp")
-            
-            # 其他类型视频的下载逻辑
-            elif video_info.get('type') == 'embedded_url':
-                # 尝试嵌入URL
-                return self.download_media(video_info['original_url'], save_folder, prefix, index, 'video')
+                            print(f"尝试URL失败: {e}")
+                    
+                    # 如果上述方法都失败，尝试使用youtube-dl或其他工具下载
+                    try:
+                        import yt_dlp
+                        
+                        print("使用yt-dlp尝试下载视频...")
+                        for url in video_info.get('alternate_urls', []):
+                            try:
+                                ydl_opts = {
+                                    'format': 'mp4',
+                                    'outtmpl': save_path,
+                                    'quiet': True,
+                                    'no_warnings': True,
+                                    'socket_timeout': self.read_timeout
+                                }
+                                # yt-dlp 下载过程中无法中止，只在开始前检查文章处理时限
+                                if time_limit is not None and time_limit.expired():
+                                    return SkippedMedia(DEADLINE_REASON)
+                                if budget is not None:
+                                    exhausted = budget.exhausted()
+                                    if exhausted:
+                                        return SkippedMedia(exhausted)
+                                    # yt-dlp 自行下载，由它按剩余预算限制文件大小，下载完成后再计入预算
+                                    max_size = budget.max_download()
+                                    if max_size is not None:
+                                        ydl_opts['max_filesize'] = max_size
+                                with profiling.network(), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                                    ydl.download([url])
+                                
+                                if os.path.exists(save_path) and os.path.getsize(save_path) > 0:
+                                    if budget is not None:
+                                        size = os.path.getsize(save_path)
+                                        skipped = budget.reserve(size)
+                                        if skipped:
+                                            os.remove(save_path)
+                                            return SkippedMedia(skipped)
+                                    print(f"使用yt-dlp成功下载视频到: {save_path}")
+                                    return save_path
+                            except Exception as e:
+                                print(f"yt-dlp下载失败: {e}")
+                    except ImportError:
+                        print("未安装yt-dlp，无法下载腾讯视频。请安装: pip install yt-dlp")
                 
-            print(f"无法下载视频: {video_info.get('original_url')}")
-            return None
-        except Exception as e:
-            print(f"下载视频时出错: {e}")
-            return None
+                # 其他类型视频的下载逻辑
+                elif video_info.get('type') == 'embedded_url':
+                    # 尝试嵌入URL
+                    return self.download_media(video_info['original_url'], save_folder, prefix, index, 'video', budget)
+                    
+                print(f"无法下载视频: {video_info.get('original_url')}")
+                return None
+            except Exception as e:
+                print(f"下载视频时出错: {e}")
+                return None
 
     def export_to_markdown(self, result, output_path):
         """将文章内容导出为Markdown格式
@@ -553,163 +672,412 @@ class WeChatArticleCrawler:
                 logger.error("无法导出为Markdown：无效的文章数据")
                 return False
                 
-            # 获取相对路径的媒体文件夹，用于图片链接
-            media_folder_rel = os.path.relpath(
-                os.path.dirname(output_path),
-                '.'
-            ).replace('\\', '/')
-                
             with open(output_path, 'w', encoding='utf-8') as f:
-                # 写入标题
-                f.write(f"# {result['title']}\n\n")
-                
-                # 写入元数据
-                f.write(f"> **作者:** {result['author']}  \n")
-                f.write(f"> **发布时间:** {result['publish_time']}  \n")
-                f.write(f"> **原文链接:** [{result['permanent_url']}]({result['permanent_url']})  \n\n")
-                
-                # 写入视频信息（如果有）
-                if result['media_files']['videos']:
-                    f.write("## 视频链接\n\n")
-                    for i, video in enumerate(result['media_files']['videos']):
-                        f.write(f"### 视频 {i+1}\n")
-                        
-                        # 如果视频已下载
-                        if 'local_path' in video:
-                            # 获取相对路径
-                            rel_path = os.path.relpath(video['local_path'], os.path.dirname(output_path)).replace('\\', '/')
-                            f.write(f"- 本地视频: [{os.path.basename(video['local_path'])}]({rel_path})\n")
-                            f.write(f"- 播放命令: `<video controls><source src=\"{rel_path}\" type=\"video/mp4\"></video>`\n")
-                        
-                        # 否则提供原始链接
-                        if 'original_url' in video:
-                            f.write(f"- 原始链接: [{video['original_url']}]({video['original_url']})\n")
-                            
-                        # 如果有备选链接
-                        if 'alternate_urls' in video and len(video['alternate_urls']) > 1:
-                            f.write("- 备选链接:\n")
-                            for j, alt_url in enumerate(video['alternate_urls']):
-                                if j > 0:  # 跳过第一个
-                                    f.write(f"  - [{alt_url}]({alt_url})\n")
-                        
-                        f.write("\n")
-                    
-                    f.write("---\n\n")
-                
-                # 处理正文内容 - 转换HTML为Markdown
-                content_html = result.get('content_html', '')
-                if content_html:
-                    # 从BeautifulSoup对象创建
-                    soup = BeautifulSoup(content_html, 'html.parser')
-                    
-                    # 处理图片 - 确保使用正确的相对路径
-                    for i, img in enumerate(soup.find_all('img')):
-                        img_src = img.get('src', '')
-                        img_alt = img.get('alt', f'图片{i+1}')
-                        
-                        # 检查图片是否已下载（是否为相对路径）
-                        if img_src and not img_src.startswith(('http://', 'https://', 'data:')):
-                            img_md = f"![{img_alt}]({img_src})"
-                        elif img_src:
-                            img_md = f"![{img_alt}]({img_src})"
-                        else:
-                            img_md = f"![图片{i+1}](图片链接不可用)"
-                            
-                        # 替换img标签为Markdown格式
-                        img.replace_with(BeautifulSoup(img_md, 'html.parser'))
-                    
-                    # 处理标题
-                    for h in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                        level = int(h.name[1])
-                        h_text = h.get_text().strip()
-                        h.replace_with(BeautifulSoup(f"{'#' * level} {h_text}\n\n", 'html.parser'))
-                    
-                    # 处理段落
-                    for p in soup.find_all('p'):
-                        p_text = p.get_text().strip()
-                        if p_text:
-                            p.replace_with(BeautifulSoup(f"{p_text}\n\n", 'html.parser'))
-                    
-                    # 处理列表
-                    for ul in soup.find_all('ul'):
-                        items = []
-                        for li in ul.find_all('li'):
-                            items.append(f"- {li.get_text().strip()}")
-                        ul.replace_with(BeautifulSoup("\n".join(items) + "\n\n", 'html.parser'))
-                    
-                    for ol in soup.find_all('ol'):
-                        items = []
-                        for i, li in enumerate(ol.find_all('li')):
-                            items.append(f"{i+1}. {li.get_text().strip()}")
-                        ol.replace_with(BeautifulSoup("\n".join(items) + "\n\n", 'html.parser'))
-                    
-                    # 处理链接
-                    for a in soup.find_all('a'):
-                        href = a.get('href', '')
-                        text = a.get_text().strip() or href
-                        a.replace_with(BeautifulSoup(f"[{text}]({href})", 'html.parser'))
-                    
-                    # 处理粗体和斜体
-                    for strong in soup.find_all(['strong', 'b']):
-                        text = strong.get_text().strip()
-                        strong.replace_with(BeautifulSoup(f"**{text}**", 'html.parser'))
-                    
-                    for em in soup.find_all(['em', 'i']):
-                        text = em.get_text().strip()
-                        em.replace_with(BeautifulSoup(f"*{text}*", 'html.parser'))
-                    
-                    # 处理引用
-                    for blockquote in soup.find_all('blockquote'):
-                        lines = blockquote.get_text().strip().split('\n')
-                        quote_text = '\n'.join([f"> {line}" for line in lines])
-                        blockquote.replace_with(BeautifulSoup(quote_text + "\n\n", 'html.parser'))
-                    
-                    # 处理分割线
-                    for hr in soup.find_all('hr'):
-                        hr.replace_with(BeautifulSoup("\n---\n\n", 'html.parser'))
-                    
-                    # 获取转换后的文本
-                    markdown_content = soup.get_text()
-                    
-                    # 清理多余的空行
-                    markdown_content = re.sub(r'\n{3,}', '\n\n', markdown_content)
-                    
-                    # 写入正文
-                    f.write("## 正文\n\n")
-                    f.write(markdown_content)
-                else:
-                    # 如果没有HTML内容，直接使用纯文本
-                    f.write("## 正文\n\n")
-                    f.write(result.get('full_content_text', '未找到文章内容'))
-                
-                # 添加图片信息
-                if result['media_files']['images']:
-                    f.write("\n\n## 图片信息\n\n")
-                    f.write(f"文章共包含 {len(result['media_files']['images'])} 张图片\n\n")
+                f.write(render_markdown(result, output_path))
                 
-                logger.info(f"成功导出为Markdown: {output_path}")
-                return True
+            logger.info(f"成功导出为Markdown: {output_path}")
+            return True
                 
         except Exception as e:
             logger.error(f"导出Markdown时出错: {e}")
             return False
 
-    def batch_process(self, urls, output_dir="outputs", formats=None, download_media=False, download_videos=False):
+    def process_article(self, url, article_id, article_folder, formats, download_media=False,
+                        download_videos=False, media_folder=None, fingerprint_store=None, batch_bytes=None,
+                        retry_budget=None, media_queue=None):
+        """处理单篇文章：获取内容并保存为各种格式
+        
+        批量处理和分布式工作节点共用此方法，异常会被捕获并转换为失败记录。
+        
+        Args:
+            url (str): 微信文章URL
+            article_id (str): 文章ID，用作输出文件名
+            article_folder (str): 文章输出文件夹（获取成功后才会创建）
+            formats (list): 已规范化的输出格式列表
+            download_media (bool, optional): 是否下载媒体文件。默认为False。
+            download_videos (bool, optional): 是否下载视频。默认为False。
+            media_folder (str, optional): 媒体文件保存文件夹。默认为None。
+            fingerprint_store (FingerprintStore, optional): 增量模式的指纹库。默认为None。
+            batch_bytes (ByteCounter, optional): 批次共用的媒体字节计数器。默认为None。
+            retry_budget (RetryBudget, optional): 批次共用的重试预算。默认为None（不限制）。
+            media_queue (MediaQueue, optional): 文本优先模式：提供且需要下载媒体时先写入输出（媒体使用在线地址），
+                媒体加入该队列等待补全。默认为None。
+            
+        Returns:
+            dict: 处理记录，包含 url、success，以及成功时的标题、文件列表和媒体统计或失败时的错误信息；
+                有请求失败时 retries 中记录每次失败的处理决定
+        """
+        retries = []
+        time_limit = Deadline(self.article_deadline)
+        deferred = DeferredMedia(download_videos) if media_queue is not None and download_media else None
+        try:
+            # 获取文章信息（页面请求和媒体下载共用文章处理时限）
+            with retry_policy.recording(retries, retry_budget), deadline.active(time_limit):
+                result = self.get_article_info(
+                    url, 
+                    download_media=download_media, 
+                    media_folder=media_folder if media_folder else "", 
+                    download_videos=download_videos,
+                    fingerprint_store=fingerprint_store,
+                    batch_bytes=batch_bytes,
+                    deferred=deferred
+                )
+            if not result and time_limit.expired():
+                result = {"error": True, "message": DEADLINE_REASON}
+            entry = self._finish_article(url, article_id, article_folder, formats, result,
+                                         download_media=download_media, fingerprint_store=fingerprint_store)
+            if deferred is not None and entry.get("deferred_media"):
+                media_queue.add(deferred.page, url, deferred.final_url, article_id, article_folder, media_folder,
+                                formats, download_videos, fingerprint_store is not None)
+        except Exception as e:
+            logger.error(f"处理文章时出错 [URL: {url}, 错误: {str(e)}]")
+            entry = {
+                "url": url,
+                "success": False,
+                "error": str(e)
+            }
+        if retries:
+            entry["retries"] = retries
+        return entry
+    
+    def _finish_article(self, url, article_id, article_folder, formats, result, outputs=None,
+                        download_media=False, fingerprint_store=None):
+        """保存文章的各种输出格式并生成处理记录
+        
+        Args:
+            result (dict or None): get_article_info 的结果，或流水线中的文章简要信息/错误/未变化字典
+            outputs (list, optional): 已渲染好的输出 [(格式显示名称, 文件路径, 文件内容), ...]，
+                为None时根据 result 渲染。默认为None。
+        """
+        if not result or "error" in result:
+            error_msg = result.get("message", "未知错误") if result else "获取文章失败"
+            logger.error(f"处理失败 [URL: {url}, 错误: {error_msg}]")
+            entry = {
+                "url": url,
+                "success": False,
+                "error": error_msg
+            }
+            # 页面已取到但文章本身不可访问（已删除、违规等），重新处理也不会成功
+            if result and error_msg != DEADLINE_REASON:
+                entry["permanent"] = True
+            return entry
+        
+        # 增量模式下内容未变化，不重新生成输出
+        if result.get("unchanged"):
+            fingerprint_store.touch(result["permanent_url"])
+            return {
+                "url": url,
+                "success": True,
+                "unchanged": True,
+                "title": result["title"],
+                "previous_output": result.get("previous_output")
+            }
+        
+        if outputs is None:
+            with metrics.stage("render"):
+                outputs = render_article_outputs(result, article_folder, article_id, formats, download_media)
+            result = summarize_article(result)
+        
+        # 处理成功，保存各种格式
+        title = result.get("title", f"未命名文章_{article_id}")
+        files_saved = []
+        with metrics.stage("write"):
+            os.makedirs(article_folder, exist_ok=True)
+            for format_name, file_path, content in outputs:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                files_saved.append((format_name, file_path))
+        
+        # 输出写入完成后再记录指纹，避免失败的文章被误判为未变化
+        if fingerprint_store is not None and result.get("fingerprint"):
+            fingerprint_store.update(result["permanent_url"], result["fingerprint"], title, article_folder)
+        
+        logger.info(f"成功处理文章: {title}")
+        
+        return {
+            "url": url,
+            "success": True,
+            "title": title,
+            "author": result['author'],
+            "publish_time": result['publish_time'],
+            "article_folder": article_folder,
+            "files": files_saved,
+            "image_count": result['image_count'],
+            "skipped_images": result.get('skipped_images', 0),
+            "video_count": result['video_count'],
+            "downloaded_videos": result['downloaded_videos'],
+            "skipped_videos": result.get('skipped_videos', 0),
+            "incomplete": result.get('incomplete', False),
+            "deferred_media": result.get('deferred_media', 0)
+        }
+    
+    def _build_pipeline(self, formats, download_media, download_videos, fingerprint_store,
+                        cpu_executor, stage_workers, queue_size, max_bytes, on_done, batch_bytes=None,
+                        retry_budget=None, media_queue=None):
+        """构建 请求→解析→媒体→渲染→写入 五个阶段的文章处理流水线
+        
+        各阶段之间通过有界队列连接，在途数据按字节计量：请求阶段取得页面后申请预算，
+        渲染完成后释放页面、改为计入渲染结果，写入完成后全部释放。媒体文件边下载边写入磁盘，不占用预算。
+        解析和渲染阶段在提供 cpu_executor 时交给进程池执行，否则在阶段线程内执行。
+        不下载媒体（或文本优先模式延后下载媒体）时没有需要提前扫描的内容，解析与渲染合并在渲染阶段一次完成。
+        
+        Args:
+            stage_workers (dict): 各阶段线程数 {"fetch": 8, "parse": 2, "media": 8, "render": 2, "write": 2}
+            queue_size (int): 阶段之间的队列长度
+            max_bytes (int): 在途字节上限
+            on_done (callable): 文章处理完成时的回调 on_done(index, entry)
+            batch_bytes (ByteCounter, optional): 批次共用的媒体字节计数器。默认为None。
+            retry_budget (RetryBudget, optional): 批次共用的重试预算。默认为None。
+            media_queue (MediaQueue, optional): 文本优先模式的媒体队列，写入阶段把有延后媒体的文章加入队列。默认为None。
+            
+        Returns:
+            Pipeline: 流水线实例，调用 run() 开始处理
+        """
+        track_fingerprint = fingerprint_store is not None
+        # 文本优先模式：不扫描、不下载媒体，渲染时记录为延后下载，原始页面保留到写入阶段加入队列
+        defer_media = media_queue is not None and download_media
+        
+        def run_cpu(func, *args):
+            if cpu_executor is None:
+                return func(*args)
+            return cpu_executor.submit(func, *args).result()
+        
+        def fetch(item):
+            data = item.data
+            # 处理时限从请求阶段开始计算，媒体阶段沿用同一个对象
+            data["deadline"] = Deadline(self.article_deadline)
+            with metrics.stage("fetch"), retry_policy.recording(data["retries"], retry_budget), \
+                    deadline.active(data["deadline"]):
+                response = self._fetch_article_page(data["url"])
+            if not response:
+                data["result"] = {"error": True, "message": DEADLINE_REASON} if data["deadline"].expired() else None
+                return
+            previous = self._previous_fingerprint(fingerprint_store, data["url"], response.url)
+            data["page"] = response.content
+            data["final_url"] = response.url
+            data["previous"] = previous
+            data["previous_fingerprint"] = previous["fingerprint"] if previous else None
+            item.nbytes = len(data["page"])
+        
+        def parse(item):
+            data = item.data
+            if "result" in data or not download_media or defer_media:
+                return
+            with metrics.stage("parse"):
+                scan = run_cpu(
+                    parse_article_page, data["page"], data["url"], data["final_url"],
+                    None, track_fingerprint, data["previous_fingerprint"], True, self.image_filter, self.keep_iframe_data
+                )
+            if "error" in scan or scan.get("unchanged"):
+                data["result"] = scan
+            else:
+                data["scan"] = scan
+        
+        def media(item):
+            data = item.data
+            if "scan" in data:
+                with metrics.stage("media"), retry_policy.recording(data["retries"], retry_budget), \
+                        deadline.active(data["deadline"]):
+                    data["media_map"] = self._download_scanned_media(
+                        data.pop("scan"), data["media_folder"] or "", download_videos, batch_bytes
+                    )
+        
+        def render(item):
+            data = item.data
+            if "result" not in data:
+                with metrics.stage("render"):
+                    data["result"], data["outputs"] = run_cpu(
+                        parse_and_render_article, data["page"], data["url"], data["final_url"],
+                        data["article_folder"], data["article_id"], formats,
+                        DeferredMedia(download_videos) if defer_media else data.get("media_map"),
+                        track_fingerprint, data["previous_fingerprint"], download_media, self.image_filter,
+                        self.keep_iframe_data
+                    )
+            result = data["result"]
+            if result and result.get("unchanged"):
+                result["previous_output"] = data["previous"].get("output_folder")
+            if not defer_media:
+                data.pop("page", None)
+            item.nbytes = sum(len(content) for _, _, content in data.get("outputs") or []) + len(data.get("page") or b"")
+        
+        def write(item):
+            data = item.data
+            data["entry"] = self._finish_article(
+                data["url"], data["article_id"], data["article_folder"], formats, data["result"],
+                data.get("outputs"), download_media=download_media, fingerprint_store=fingerprint_store
+            )
+            if defer_media and data["entry"].get("deferred_media"):
+                media_queue.add(data["page"], data["url"], data["final_url"], data["article_id"], data["article_folder"],
+                                data["media_folder"], formats, download_videos, track_fingerprint)
+            data.pop("page", None)
+            data.pop("outputs", None)
+            item.nbytes = 0
+        
+        def done(item):
+            entry = item.data.get("entry")
+            if entry is None:
+                entry = {"url": item.data["url"], "success": False, "error": item.error or "未知错误"}
+            if item.data["retries"]:
+                entry["retries"] = item.data["retries"]
+            on_done(item.index, entry)
+        
+        stages = [
+            Stage("fetch", fetch, stage_workers.get("fetch"), admit=True),
+            Stage("parse", parse, stage_workers.get("parse")),
+            Stage("media", media, stage_workers.get("media")),
+            Stage("render", render, stage_workers.get("render")),
+            Stage("write", write, stage_workers.get("write"))
+        ]
+        return Pipeline(stages, done, queue_size=queue_size, max_bytes=max_bytes)
+    
+    def _write_summary_entry(self, summary_path, index, entry, base_folder, download_media=False, download_videos=False):
+        """向汇总报告追加一篇文章的处理记录"""
+        url = entry["url"]
+        with open(summary_path, 'a', encoding='utf-8') as log:
+            if not entry["success"]:
+                log.write(f"### {index}. ❌ 失败: {url}\n")
+                log.write(f"- 错误: {entry.get('error', '未知错误')}\n")
+                if entry.get("retries"):
+                    log.write(f"- 请求失败: {retry_policy.describe(entry['retries'])}\n")
+                log.write("\n")
+                return
+            
+            if entry.get("unchanged"):
+                log.write(f"### {index}. ⏭️ 未变化: [{entry['title']}]({url})\n")
+                if entry.get("previous_output"):
+                    log.write(f"- 上次输出: {entry['previous_output']}\n")
+                log.write("\n")
+                return
+            
+            files_saved = entry.get("files", [])
+            log.write(f"### {index}. ✅ 成功: [{entry['title']}]({url})\n")
+            log.write(f"- 作者: {entry['author']}\n")
+            log.write(f"- 发布时间: {entry['publish_time']}\n")
+            log.write(f"- 已保存格式: {', '.join([f[0] for f in files_saved])}\n")
+            
+            if download_media:
+                skipped = f" (跳过: {entry['skipped_images']}张)" if entry.get('skipped_images') else ""
+                log.write(f"- 图片: {entry['image_count']}张{skipped}\n")
+                if download_videos:
+                    skipped = f", 跳过: {entry['skipped_videos']}个" if entry.get('skipped_videos') else ""
+                    log.write(f"- 视频: {entry['video_count']}个 (成功下载: {entry['downloaded_videos']}个{skipped})\n")
+                else:
+                    log.write(f"- 视频: {entry['video_count']}个\n")
+            if entry.get("incomplete"):
+                log.write(f"- ⏱️ 未完成: {DEADLINE_REASON}，其余媒体保留原始链接\n")
+            if entry.get("deferred_media"):
+                log.write(f"- 延后下载: {entry['deferred_media']}个媒体，补全后更新输出\n")
+            if entry.get("retries"):
+                log.write(f"- 请求失败: {retry_policy.describe(entry['retries'])}\n")
+            
+            # 添加文件链接列表
+            if files_saved:
+                log.write("- 文件列表:\n")
+                for format_name, file_path in files_saved:
+                    rel_path = os.path.relpath(file_path, base_folder).replace('\\', '/')
+                    log.write(f"  - {format_name}: [{os.path.basename(file_path)}]({rel_path})\n")
+            
+            log.write("\n")
+
+    def _run_pipeline(self, numbered_urls, timestamp, batch_folder, media_folder, formats, download_media,
+                      download_videos, fingerprint_store, cpu_workers, stage_workers, max_inflight_mb, finish,
+                      batch_bytes=None, retry_budget=None, media_queue=None):
+        """以流水线模式处理批量文章（参数含义见 batch_process）
+        
+        Args:
+            numbered_urls (iterable): (序号, URL) 迭代器
+            finish (callable): 文章处理完成时的回调 finish(index, entry)
+        """
+        # 请求、解析、媒体下载、渲染、写入各阶段并发执行，由有界队列和在途字节预算控制背压
+        workers = {**config.default_config["pipeline_workers"], **config.get("pipeline_workers", {}), **(stage_workers or {})}
+        if max_inflight_mb is None:
+            max_inflight_mb = config.get("pipeline_max_inflight_mb", 256)
+        cpu_executor = ProcessPoolExecutor(max_workers=cpu_workers) if cpu_workers else None
+        if cpu_workers:
+            # 解析和渲染交给进程池，阶段线程数至少与进程数相同才能占满所有进程
+            for name in ("parse", "render"):
+                workers[name] = max(workers.get(name) or 1, cpu_workers)
+        logger.info(f"流水线模式 [阶段线程: {workers}, 解析/渲染进程: {cpu_workers}, 在途上限: {max_inflight_mb}MB]")
+        
+        def articles():
+            for index, url in numbered_urls:
+                article_id = f"article_{index:03d}_{timestamp}"
+                yield index, {
+                    "url": url,
+                    "article_id": article_id,
+                    "article_folder": os.path.join(batch_folder, article_id),
+                    "media_folder": os.path.join(media_folder, article_id) if download_media else None,
+                    "retries": []
+                }
+        
+        article_pipeline = self._build_pipeline(
+            formats, download_media, download_videos, fingerprint_store, cpu_executor,
+            workers, config.get("pipeline_queue_size", 16), max_inflight_mb * 1024 * 1024, finish, batch_bytes,
+            retry_budget, media_queue
+        )
+        # 采集时实时读取队列深度和在途字节数
+        for name in PIPELINE_STAGES:
+            metrics.QUEUE_DEPTH.labels(name).set_function(lambda name=name: article_pipeline.queue_depth(name))
+        metrics.BYTES_IN_FLIGHT.set_function(lambda: article_pipeline.budget.in_flight)
+        try:
+            article_pipeline.run(articles())
+        finally:
+            for name in PIPELINE_STAGES:
+                metrics.QUEUE_DEPTH.labels(name).set_function(None)
+                metrics.QUEUE_DEPTH.labels(name).set(0)
+            metrics.BYTES_IN_FLIGHT.set_function(None)
+            metrics.BYTES_IN_FLIGHT.set(0)
+            if cpu_executor is not None:
+                cpu_executor.shutdown(wait=True)
+        stats = article_pipeline.stats()
+        logger.info(f"流水线统计 [在途峰值: {stats['peak_bytes_in_flight'] / 1024 / 1024:.1f}MB, "
+                    + ", ".join(f"{name}: {s['processed']}篇/{s['busy_seconds']:.1f}s"
+                                for name, s in stats["stages"].items()) + "]")
+
+    def batch_process(self, urls, output_dir="outputs", formats=None, download_media=False, download_videos=False,
+                      incremental=False, fingerprint_db=None, keep_results=True, pipeline=None, cpu_workers=None,
+                      stage_workers=None, max_inflight_mb=None, profile=False, trace=False,
+                      progress_callback=None, cancel_event=None, max_media_mb=None, record_warc=False,
+                      defer_media=None, record_history=True):
         """批量处理多个微信文章URL
         
         Args:
-            urls (list): 微信文章URL列表
+            urls (iterable): 微信文章URL列表或惰性迭代器（如 url_source.iter_urls 的结果），逐个取用不会整体读入内存
             output_dir (str, optional): 输出目录。默认为"outputs"。
             formats (list, optional): 输出格式列表，可选值为"text", "html", "json", "markdown"。默认为["json"]。
             download_media (bool, optional): 是否下载媒体文件。默认为False。
             download_videos (bool, optional): 是否下载视频。默认为False。
+            incremental (bool, optional): 增量模式，内容未变化的文章跳过媒体下载和输出。默认为False。
+            fingerprint_db (str, optional): 增量模式的指纹库路径。默认为输出目录下的 config["fingerprint_db"]。
+            keep_results (bool, optional): 是否在返回值中保留每篇成功文章的记录。超大批量时可设为False，
+                只保留失败记录。默认为True。
+            pipeline (bool, optional): 是否使用分阶段流水线并发处理。默认为 config["pipeline"]，
+                指定了 cpu_workers 时总是使用流水线。
+            cpu_workers (int, optional): 解析和渲染使用的进程数，0表示在流水线线程内完成。默认为 config["cpu_workers"]。
+            stage_workers (dict, optional): 流水线各阶段的线程数，未指定的阶段使用 config["pipeline_workers"]。
+            max_inflight_mb (int, optional): 流水线在途数据上限（MB）。默认为 config["pipeline_max_inflight_mb"]。
+            profile (bool, optional): 是否对各处理阶段进行性能剖析，结果（折叠栈和摘要）写入批处理文件夹。默认为False。
+            trace (bool, optional): 是否记录时间线追踪，结果以 Chrome trace 格式写入批处理文件夹的 trace.json。默认为False。
+            progress_callback (callable, optional): 每篇文章处理完成后调用 progress_callback(progress)，
+                progress 包含 index、entry 以及 done/success/failed/unchanged/total 计数。回调是串行的。
+            cancel_event (threading.Event, optional): 取消标记。设置后不再读取新的URL，已开始处理的文章
+                会正常完成并写入摘要，返回值中 cancelled 为True。
+            max_media_mb (float, optional): 整个批次媒体下载的字节上限（MB），用完后其余媒体记录为跳过，
+                0表示不限制。默认为 config["media_max_batch_mb"]。
+            record_warc (bool, optional): 是否把原始HTTP交换（文章页面和媒体文件）记录到批处理文件夹的
+                warc/ 下按大小滚动的 .warc.gz 文件中，供以后离线重新处理。默认为False。
+            defer_media (bool, optional): 文本优先模式（需要 download_media）：文章输出立即写入，图片和视频使用在线地址，
+                媒体加入批处理文件夹的 media_queue/ 中，由 config["hydrate_workers"] 个后台线程补全，
+                为0时留给以后的 --hydrate 补全。默认为 config["defer_media"]。
+            record_history (bool, optional): 是否把处理的URL加入 config 的最近使用记录（每条URL都会写入 config.json）。
+                API服务等后台任务应设为False。默认为True。
             
         Returns:
             dict: 处理结果统计
         """
-        if not urls:
+        if urls is None or (hasattr(urls, '__len__') and len(urls) == 0):
             logger.error("URL列表为空，无法进行批量处理")
-            return {"success": 0, "failed": 0, "total": 0, "results": []}
+            return {"success": 0, "failed": 0, "unchanged": 0, "total": 0, "cancelled": False, "results": []}
             
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
@@ -719,285 +1087,252 @@ class WeChatArticleCrawler:
             formats = ["json"]
             
         # 转换中文格式名称
-        format_mapping = {
-            "文本": "text",
-            "HTML": "html",
-            "JSON": "json",
-            "Markdown": "markdown",
-            "markdown": "markdown",
-            "html": "html",
-            "text": "text",
-            "json": "json"
-        }
+        formats = normalize_formats(formats)
         
-        formats = [format_mapping.get(f, f) for f in formats]
+        if cpu_workers is None:
+            cpu_workers = config.get("cpu_workers", 0)
+        if pipeline is None:
+            pipeline = config.get("pipeline", False)
+        pipeline = pipeline or bool(cpu_workers)
         
-        # 生成时间戳和子文件夹
+        # 生成时间戳和子文件夹：同一秒内开始的批次（如定时重爬连续提交的批次）加序号区分，
+        # 用 mkdir 创建，并发开始的批次也不会共用同一个文件夹
         timestamp = time.strftime("%Y%m%d_%H%M%S")
+        os.makedirs(output_dir, exist_ok=True)
         batch_folder = os.path.join(output_dir, f"batch_{timestamp}")
-        os.makedirs(batch_folder, exist_ok=True)
+        suffix = 1
+        while True:
+            try:
+                os.mkdir(batch_folder)
+                break
+            except FileExistsError:
+                suffix += 1
+                batch_folder = os.path.join(output_dir, f"batch_{timestamp}_{suffix}")
         
         # 准备媒体文件夹
         media_folder = os.path.join(batch_folder, "media")
         if download_media:
             os.makedirs(media_folder, exist_ok=True)
             
+        # 增量模式下打开指纹库
+        fingerprint_store = None
+        if incremental:
+            if not fingerprint_db:
+                fingerprint_db = os.path.join(output_dir, config.get("fingerprint_db", ".fingerprints.db"))
+            fingerprint_store = FingerprintStore(fingerprint_db)
+            logger.info(f"增量模式已启用，指纹库: {fingerprint_db}")
+            
+        # 批次共用的媒体字节计数器，单个文件和单篇文章的上限见 _media_resolver
+        if max_media_mb is None:
+            max_media_mb = config.get("media_max_batch_mb", 0)
+        batch_bytes = ByteCounter(int(max_media_mb * 1024 * 1024)) if download_media else None
+        
+        # 批次共用的重试预算：上游大面积故障时停止重试，失败的请求直接放弃
+        retry_budget = RetryBudget(config.get("retry_budget_tokens", 100), config.get("retry_budget_ratio", 0.1))
+        
+        # 文本优先模式：先写出所有文章的输出，媒体排队由后台线程（或以后单独的 --hydrate）下载并替换输出
+        if defer_media is None:
+            defer_media = config.get("defer_media", False)
+        media_queue = None
+        hydrator = None
+        if defer_media and download_media:
+            media_queue = MediaQueue(os.path.join(batch_folder, QUEUE_FOLDER))
+            hydrate_workers = config.get("hydrate_workers", 2)
+            if hydrate_workers:
+                hydrator = MediaHydrator(self, hydrate_workers, batch_bytes, retry_budget)
+                hydrator.start()
+                media_queue.on_add = hydrator.submit
+            
         # 统计结果
         results = []
         success_count = 0
         failed_count = 0
+        unchanged_count = 0
+        processed_count = 0
+        cancelled = False
+        # 列表输入可以提前得知总数，流式输入则未知
+        total_hint = len(urls) if hasattr(urls, '__len__') else None
+        
+        def record(entry):
+            if keep_results or not entry["success"]:
+                results.append(entry)
         
         # 创建批处理记录文件
         batch_log = os.path.join(batch_folder, "batch_summary.md")
         with open(batch_log, 'w', encoding='utf-8') as log:
             log.write(f"# 微信文章批量爬取结果\n\n")
             log.write(f"- 爬取时间: {timestamp}\n")
-            log.write(f"- 文章数量: {len(urls)}\n")
+            log.write(f"- 文章数量: {total_hint if total_hint is not None else '流式输入'}\n")
             log.write(f"- 输出格式: {', '.join(formats)}\n")
-            log.write(f"- 下载媒体: {'是' if download_media else '否'}\n")
-            log.write(f"- 下载视频: {'是' if download_videos else '否'}\n\n")
+            log.write(f"- 下载媒体: {('是（文本优先，延后下载）' if media_queue is not None else '是') if download_media else '否'}\n")
+            log.write(f"- 下载视频: {'是' if download_videos else '否'}\n")
+            log.write(f"- 增量模式: {'是' if incremental else '否'}\n\n")
             log.write("## 处理结果\n\n")
         
-        # 处理每个URL
-        for i, url in enumerate(urls):
-            logger.info(f"[{i+1}/{len(urls)}] 处理文章: {url}")
+        def finish(index, entry):
+            nonlocal success_count, failed_count, unchanged_count
+            self._write_summary_entry(batch_log, index, entry, batch_folder, download_media, download_videos)
+            metrics.record_article(entry)
+            tracing.article_end(index, success=entry["success"], title=entry.get("title"), error=entry.get("error"))
             
-            try:
-                # 将URL添加到历史记录
-                config.add_url_to_history(url)
-                
-                # 生成文章唯一ID
-                article_id = f"article_{i+1:03d}_{timestamp}"
-                
-                # 创建文章子文件夹
-                article_folder = os.path.join(batch_folder, article_id)
-                os.makedirs(article_folder, exist_ok=True)
-                
-                # 设置文章媒体文件夹
-                article_media_folder = os.path.join(media_folder, article_id) if download_media else None
-                
-                # 获取文章信息
-                result = self.get_article_info(
-                    url, 
-                    download_media=download_media, 
-                    media_folder=article_media_folder if article_media_folder else "", 
-                    download_videos=download_videos
-                )
-                
-                if not result or "error" in result:
-                    error_msg = result.get("message", "未知错误") if result else "获取文章失败"
-                    logger.error(f"处理失败 [URL: {url}, 错误: {error_msg}]")
-                    
-                    # 记录失败结果
-                    with open(batch_log, 'a', encoding='utf-8') as log:
-                        log.write(f"### {i+1}. ❌ 失败: {url}\n")
-                        log.write(f"- 错误: {error_msg}\n\n")
-                    
-                    failed_count += 1
-                    results.append({
-                        "url": url,
-                        "success": False,
-                        "error": error_msg
-                    })
-                    continue
-                
-                # 处理成功，保存各种格式
-                title = result.get("title", f"未命名文章_{article_id}")
-                files_saved = []
-                
-                # 保存JSON格式
-                if "json" in formats:
-                    json_path = os.path.join(article_folder, f"{article_id}.json")
-                    with open(json_path, 'w', encoding='utf-8') as f:
-                        json.dump(result, f, ensure_ascii=False, indent=2)
-                    files_saved.append(("JSON", json_path))
-                
-                # 保存文本格式
-                if "text" in formats:
-                    text_path = os.path.join(article_folder, f"{article_id}.txt")
-                    with open(text_path, 'w', encoding='utf-8') as f:
-                        f.write(f"标题: {result['title']}\n")
-                        f.write(f"作者: {result['author']}\n")
-                        f.write(f"发布时间: {result['publish_time']}\n")
-                        f.write(f"链接: {result['permanent_url']}\n\n")
-                        
-                        # 添加视频信息
-                        if result['media_files']['videos']:
-                            f.write("视频链接:\n")
-                            for i, video in enumerate(result['media_files']['videos']):
-                                if 'local_path' in video:
-                                    f.write(f"视频 {i+1}: 已下载到 {video['local_path']}\n")
-                                elif 'original_url' in video:
-                                    f.write(f"视频 {i+1}: {video['original_url']}\n")
-                            f.write("\n")
-                        
-                        f.write(result['full_content_text'])
-                    files_saved.append(("文本", text_path))
-                
-                # 保存HTML格式
-                if "html" in formats:
-                    html_path = os.path.join(article_folder, f"{article_id}.html")
-                    
-                    # 准备视频HTML部分
-                    videos_html = ""
-                    if result['media_files']['videos']:
-                        videos_html = "<div class='video-links'><h3>视频链接</h3><ul>"
-                        for i, video in enumerate(result['media_files']['videos']):
-                            videos_html += f"<li>"
-                            
-                            # 如果视频已下载，添加视频播放器
-                            if 'local_path' in video:
-                                local_path = os.path.relpath(video['local_path'], os.path.dirname(html_path)).replace('\\', '/')
-                                videos_html += f"""
-                                <div>
-                                    <video controls style="max-width:100%; height:auto;">
-                                        <source src="{local_path}" type="video/mp4">
-                                        您的浏览器不支持视频标签
-                                    </video>
-                                    <p>已下载视频</p>
-                                </div>
-                                """
-                            # 否则提供链接
-                            elif 'original_url' in video:
-                                videos_html += f"<a href='{video['original_url']}' target='_blank'>视频 {i+1}"
-                                if 'type' in video:
-                                    videos_html += f" ({video['type']})"
-                                videos_html += "</a>"
-                                
-                                # 添加备选链接
-                                if 'alternate_urls' in video:
-                                    videos_html += "<div style='margin-left:20px; font-size:0.9em;'><p>备选链接：</p>"
-                                    for j, alt_url in enumerate(video['alternate_urls']):
-                                        if j > 0:  # 跳过第一个，因为和原始链接相同
-                                            videos_html += f"<a href='{alt_url}' target='_blank'>备选 {j}</a><br>"
-                                    videos_html += "</div>"
-                            
-                            videos_html += "</li>"
-                        videos_html += "</ul></div>"
-                    
-                    with open(html_path, 'w', encoding='utf-8') as f:
-                        f.write(f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>{result['title']}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }}
-        h1 {{ font-size: 24px; margin-bottom: 10px; }}
-        .meta {{ color: #666; margin-bottom: 20px; }}
-        img {{ max-width: 100%; height: auto; }}
-        .media-info {{ margin-top: 20px; padding: 10px; background-color: #f5f5f5; border-radius: 5px; }}
-        .video-links {{ margin-top: 20px; padding: 10px; background-color: #e9f7fe; border-radius: 5px; }}
-        .video-links h3 {{ margin-top: 0; }}
-        .video-links ul {{ padding-left: 20px; }}
-        video {{ max-width: 100%; }}
-    </style>
-</head>
-<body>
-    <h1>{result['title']}</h1>
-    <div class="meta">
-        作者: {result['author']}<br>
-        发布时间: {result['publish_time']}<br>
-        原始链接: <a href="{result['original_url']}" target="_blank">{result['original_url']}</a>
-    </div>
-    
-    {videos_html}
-    
-    <div class="content">
-        {result['content_html']}
-    </div>
-    
-    {f'''<div class="media-info">
-        <h3>媒体文件信息</h3>
-        <p>图片数量: {len(result['media_files']['images'])}</p>
-        <p>视频数量: {len(result['media_files']['videos'])}</p>
-    </div>''' if download_media else ''}
-</body>
-</html>""")
-                    files_saved.append(("HTML", html_path))
-                
-                # 保存Markdown格式
-                if "markdown" in formats:
-                    md_path = os.path.join(article_folder, f"{article_id}.md")
-                    self.export_to_markdown(result, md_path)
-                    files_saved.append(("Markdown", md_path))
-                
-                # 统计媒体文件
-                image_count = len(result['media_files']['images'])
-                video_count = len(result['media_files']['videos'])
-                downloaded_videos = sum(1 for v in result['media_files']['videos'] if 'local_path' in v)
-                
-                # 记录成功结果
-                with open(batch_log, 'a', encoding='utf-8') as log:
-                    log.write(f"### {i+1}. ✅ 成功: [{title}]({url})\n")
-                    log.write(f"- 作者: {result['author']}\n")
-                    log.write(f"- 发布时间: {result['publish_time']}\n")
-                    log.write(f"- 已保存格式: {', '.join([f[0] for f in files_saved])}\n")
-                    
-                    if download_media:
-                        log.write(f"- 图片: {image_count}张\n")
-                        if download_videos:
-                            log.write(f"- 视频: {video_count}个 (成功下载: {downloaded_videos}个)\n")
-                        else:
-                            log.write(f"- 视频: {video_count}个\n")
-                    
-                    # 添加文件链接列表
-                    if files_saved:
-                        log.write("- 文件列表:\n")
-                        for format_name, file_path in files_saved:
-                            rel_path = os.path.relpath(file_path, batch_folder).replace('\\', '/')
-                            log.write(f"  - {format_name}: [{os.path.basename(file_path)}]({rel_path})\n")
-                    
-                    log.write("\n")
-                
-                # 更新统计
+            # 更新统计
+            if not entry["success"]:
+                failed_count += 1
+            elif entry.get("unchanged"):
+                unchanged_count += 1
+            else:
                 success_count += 1
-                results.append({
-                    "url": url,
-                    "success": True,
-                    "title": title,
-                    "files": files_saved,
-                    "image_count": image_count,
-                    "video_count": video_count
-                })
-                
-                logger.info(f"成功处理文章: {title}")
-                
-            except Exception as e:
-                logger.error(f"处理文章时出错 [URL: {url}, 错误: {str(e)}]")
-                
-                # 记录错误
-                with open(batch_log, 'a', encoding='utf-8') as log:
-                    log.write(f"### {i+1}. ❌ 失败: {url}\n")
-                    log.write(f"- 错误: {str(e)}\n\n")
+            record(entry)
+            
+            if progress_callback is not None:
+                try:
+                    progress_callback({
+                        "index": index,
+                        "entry": entry,
+                        "done": success_count + failed_count + unchanged_count,
+                        "success": success_count,
+                        "failed": failed_count,
+                        "unchanged": unchanged_count,
+                        "total": total_hint
+                    })
+                except Exception as e:
+                    logger.error(f"进度回调出错: {e}")
+        
+        def handle(index, url):
+            # 生成文章唯一ID
+            article_id = f"article_{index:03d}_{timestamp}"
+            return index, self.process_article(
+                url,
+                article_id,
+                os.path.join(batch_folder, article_id),
+                formats,
+                download_media=download_media,
+                download_videos=download_videos,
+                media_folder=os.path.join(media_folder, article_id) if download_media else None,
+                fingerprint_store=fingerprint_store,
+                batch_bytes=batch_bytes,
+                retry_budget=retry_budget,
+                media_queue=media_queue
+            )
+        
+        def numbered(urls):
+            nonlocal processed_count, cancelled
+            for i, url in enumerate(urls):
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                    logger.info(f"批量处理已取消，已开始处理的 {processed_count} 篇文章完成后结束")
+                    break
+                processed_count = i + 1
+                logger.info(f"[{i+1}/{total_hint if total_hint is not None else '?'}] 处理文章: {url}")
                 
-                failed_count += 1
-                results.append({
-                    "url": url,
-                    "success": False,
-                    "error": str(e)
-                })
+                # 将URL添加到历史记录
+                if record_history:
+                    config.add_url_to_history(url)
+                tracing.article_begin(i + 1, url)
+                yield i + 1, url
+        
+        # 性能剖析：按阶段采样调用栈并区分网络等待与CPU时间
+        profiler = None
+        if profile:
+            profiler = StageProfiler(interval=config.get("profile_interval_ms", 5) / 1000)
+            profiler.start()
+        
+        # 时间线追踪：文章、阶段、媒体下载和重试等待的跨度
+        tracer = None
+        if trace:
+            tracer = Tracer(max_events=config.get("trace_max_events", 1000000))
+            tracer.start()
+        
+        # 原始响应存档：后台线程写入压缩的WARC文件
+        recorder = None
+        if record_warc:
+            recorder = WarcRecorder(
+                os.path.join(batch_folder, "warc"),
+                prefix=f"batch_{timestamp}",
+                max_file_mb=config.get("warc_max_file_mb", 1024),
+                queue_size=config.get("warc_queue_size", 1000)
+            )
+            recorder.start()
+        
+        try:
+            if not pipeline:
+                # 逐篇顺序处理
+                for index, url in numbered(urls):
+                    finish(*handle(index, url))
+            else:
+                self._run_pipeline(numbered(urls), timestamp, batch_folder, media_folder, formats, download_media,
+                                   download_videos, fingerprint_store, cpu_workers, stage_workers, max_inflight_mb, finish,
+                                   batch_bytes, retry_budget, media_queue)
+        finally:
+            # 文章输出都已写入，等待后台补全完已排队的媒体
+            if hydrator is not None:
+                logger.info(f"文章输出已全部写入，等待媒体补全 [{media_queue.count}篇]")
+                hydrator.stop()
+            if profiler is not None:
+                profiler.stop()
+                profiler.write_reports(batch_folder, top=config.get("profile_top", 30))
+            if tracer is not None:
+                tracer.stop()
+                tracer.write(os.path.join(batch_folder, "trace.json"))
+            if recorder is not None:
+                recorder.stop()
         
+
         # 更新批处理摘要
         with open(batch_log, 'a', encoding='utf-8') as log:
             log.write(f"\n## 汇总\n\n")
-            log.write(f"- 总计: {len(urls)} 篇文章\n")
+            log.write(f"- 总计: {processed_count} 篇文章\n")
             log.write(f"- 成功: {success_count} 篇\n")
+            if incremental:
+                log.write(f"- 未变化(跳过): {unchanged_count} 篇\n")
             log.write(f"- 失败: {failed_count} 篇\n")
+            incomplete_count = sum(1 for r in results if r.get("incomplete"))
+            if incomplete_count:
+                log.write(f"- 未完成({DEADLINE_REASON}): {incomplete_count} 篇\n")
+            if cancelled:
+                log.write(f"- 已取消: 是（剩余URL未处理）\n")
+            if batch_bytes is not None:
+                limit = f" / {batch_bytes.limit / 1024 / 1024:.1f}MB" if batch_bytes.limit else ""
+                log.write(f"- 媒体下载: {batch_bytes.used / 1024 / 1024:.1f}MB{limit}\n")
+            if media_queue is not None:
+                remaining = cleanup(media_queue.folder)
+                log.write(f"- 延后下载媒体: {media_queue.count} 篇")
+                if hydrator is not None:
+                    log.write(f" (已补全: {hydrator.hydrated}篇, 失败: {hydrator.failed}篇)")
+                log.write("\n")
+                if remaining:
+                    log.write(f"- 待补全: {remaining} 篇，运行 --hydrate {batch_folder} 下载媒体并更新输出\n")
+            if recorder is not None:
+                log.write(f"- WARC存档: {recorder.records}条记录, {len(recorder.files)}个文件 (warc/)\n")
+            if retry_budget.retries or retry_budget.denied:
+                log.write(f"- 请求重试: {retry_budget.retries}次 (因重试预算不足放弃: {retry_budget.denied}次)\n")
+            if self.proxy_pool is not None:
+                log.write(f"- 代理池: {len(self.proxy_pool)}个代理\n")
+                for item in self.proxy_pool.stats():
+                    latency = f"{item['latency'] * 1000:.0f}ms" if item["latency"] is not None else "-"
+                    log.write(f"  - {item['proxy']}: 请求 {item['requests']}次, 失败 {item['failures']}次, "
+                              f"验证页面 {item['verifications']}次, 平均延迟 {latency}"
+                              f"{', 隔离中' if item['quarantined'] else ''}\n")
             
             if failed_count > 0:
                 log.write("\n### 失败列表\n\n")
                 for i, result in enumerate([r for r in results if not r["success"]]):
                     log.write(f"{i+1}. {result['url']} - {result.get('error', '未知错误')}\n")
         
-        logger.info(f"批量处理完成 [总计: {len(urls)}, 成功: {success_count}, 失败: {failed_count}]")
+        if fingerprint_store is not None:
+            fingerprint_store.close()
+        
+        logger.info(f"批量处理完成 [总计: {processed_count}, 成功: {success_count}, 未变化: {unchanged_count}, 失败: {failed_count}]")
         
         return {
             "success": success_count,
             "failed": failed_count,
-            "total": len(urls),
+            "unchanged": unchanged_count,
+            "total": processed_count,
+            "cancelled": cancelled,
             "batch_folder": batch_folder,
             "batch_log": batch_log,
+            "deferred": media_queue.count if media_queue is not None else 0,
             "results": results
         }
 
@@ -1007,8 +1342,10 @@ def main():
     # 输入参数
     input_group = parser.add_argument_group('输入选项')
     input_group.add_argument('-u', '--url', help='微信文章URL')
-    input_group.add_argument('-f', '--file', help='包含多个URL的文件，每行一个URL')
+    input_group.add_argument('-f', '--file', action='append', help='包含多个URL的文件，每行一个URL；支持 .gz 压缩文件，"-" 表示标准输入，可多次指定')
     input_group.add_argument('-b', '--batch', action='store_true', help='批量模式处理多个URL')
+    input_group.add_argument('--seen_db', help='持久化的URL去重过滤器文件，跨多次运行跳过已成功处理过的URL，失败或取消的URL下次仍会处理 (默认: 仅本次运行去重)')
+    input_group.add_argument('--dedupe_capacity', type=int, help='URL去重过滤器的预期容量 (默认: 100000000)')
     
     # 输出参数
     output_group = parser.add_argument_group('输出选项')
@@ -1017,18 +1354,75 @@ def main():
     output_group.add_argument('-t', '--text', action='store_true', help='同时生成纯文本文件')
     output_group.add_argument('-html', '--html', action='store_true', help='同时生成HTML文件')
     output_group.add_argument('-md', '--markdown', action='store_true', help='同时生成Markdown文件')
+    output_group.add_argument('--no_iframe_data', action='store_true', help='视频信息中不保存原始嵌入数据(iframe_data)，减小内存占用和JSON体积')
     
     # 媒体参数
     media_group = parser.add_argument_group('媒体选项')
-    media_group.add_argument('-m', '--media', action='store_true', help='下载文章中的图片和视频')
+    media_group.add_argument('-m', '--media', action='store_true', help='下载文章中的图片和视频（加 --image_filter 可跳过装饰性图片）')
+    media_group.add_argument('--image_filter', action='store_true', help='下载图片时跳过间隔图、表情等装饰性图片 (配置: image_filter)')
     media_group.add_argument('-v', '--video', action='store_true', help='尝试下载视频文件 (需要安装 yt-dlp)')
     media_group.add_argument('--media_folder', default='media', help='媒体文件保存文件夹 (默认: media)')
+    media_group.add_argument('--max_file_mb', type=float, help='单个媒体文件的大小上限(MB)，超出的文件记录为跳过，0表示不限制 (默认: 0)')
+    media_group.add_argument('--max_article_mb', type=float, help='单篇文章媒体下载总量上限(MB)，0表示不限制 (默认: 0)')
+    media_group.add_argument('--max_batch_mb', type=float, help='整个批次媒体下载总量上限(MB)，0表示不限制 (默认: 0)')
+    media_group.add_argument('--defer_media', action='store_true', help='文本优先：批量模式先写出所有文章的输出(媒体使用在线地址)，媒体由后台线程下载后更新输出')
+    media_group.add_argument('--hydrate', action='append', metavar='PATH',
+                             help='补全 --defer_media 批次中尚未下载的媒体并更新已写入的输出，PATH 为批处理文件夹或其上级目录，可多次指定')
     
     # 网络参数
     network_group = parser.add_argument_group('网络选项')
     network_group.add_argument('-p', '--proxy', help='使用代理服务器 (格式: http://127.0.0.1:7890)')
+    network_group.add_argument('--proxy_file', help='代理池：每行一个代理地址的文件，或逗号分隔的多个地址，按健康状况轮换使用')
+    network_group.add_argument('--pin_proxy', action='store_true', help='代理池按主机固定代理，同一主机的请求使用同一出口IP')
     network_group.add_argument('-r', '--retry', type=int, default=3, help='请求失败重试次数 (默认: 3)')
-    network_group.add_argument('--timeout', type=int, default=10, help='请求超时时间(秒) (默认: 10)')
+    network_group.add_argument('--timeout', type=int, default=10, help='读取超时时间(秒)，两次收到数据之间的最长间隔 (默认: 10)')
+    network_group.add_argument('--connect_timeout', type=float, help='连接超时时间(秒)，0表示与 --timeout 相同 (默认: 5)')
+    network_group.add_argument('--article_deadline', type=float, help='单篇文章处理时限(秒)，包括页面请求和全部媒体下载，超出后保存已获取的内容并标记未完成，0表示不限制 (默认: 0)')
+    network_group.add_argument('--http2', action='store_true', help='使用HTTP/2传输，同一主机的并发请求复用一条连接 (需要安装 httpx[http2])')
+    
+    # 并发参数
+    concurrency_group = parser.add_argument_group('并发选项')
+    concurrency_group.add_argument('--pipeline', action='store_true', help='批量模式使用 请求→解析→媒体→渲染→写入 分阶段流水线并发处理')
+    concurrency_group.add_argument('--stage_workers', help='流水线各阶段线程数，如 fetch=16,media=32 (默认: fetch=8,parse=2,media=8,render=2,write=2)')
+    concurrency_group.add_argument('--max_inflight_mb', type=int, help='流水线在途数据上限(MB)，超出后暂停请求新页面 (默认: 256)')
+    concurrency_group.add_argument('--cpu_workers', type=int, help='流水线中解析和渲染使用的进程数，0表示不使用进程池 (默认: 0)')
+    
+    # 监控参数
+    monitor_group = parser.add_argument_group('监控选项')
+    monitor_group.add_argument('--profile', action='store_true', help='按处理阶段进行性能剖析，折叠栈和摘要写入批处理文件夹 (仅批量模式)')
+    monitor_group.add_argument('--trace', action='store_true', help='记录时间线追踪，以Chrome trace格式写入批处理文件夹的 trace.json (仅批量模式)')
+    monitor_group.add_argument('--warc', action='store_true', help='把原始HTTP响应（文章页面和媒体）存档为批处理文件夹中的 .warc.gz 文件 (仅批量模式)')
+    monitor_group.add_argument('--metrics_port', type=int, help='在指定端口提供Prometheus格式的 /metrics 端点 (批量和工作节点模式)')
+    monitor_group.add_argument('--metrics_host', help='/metrics 端点的监听地址，需要其他主机采集时设为 0.0.0.0 (默认: 127.0.0.1)')
+    
+    # 增量参数
+    incremental_group = parser.add_argument_group('增量选项')
+    incremental_group.add_argument('-i', '--incremental', action='store_true', help='增量模式：跳过内容未变化的文章 (仅批量模式)')
+    incremental_group.add_argument('--fingerprint_db', help='增量模式的指纹库路径 (默认: <输出目录>/.fingerprints.db)')
+    
+    # 分布式参数
+    queue_group = parser.add_argument_group('分布式选项')
+    queue_group.add_argument('--queue', help='共享任务队列地址: sqlite:///path/queue.db 或 redis://host:6379/0')
+    queue_group.add_argument('--queue_name', default='default', help='队列名称 (默认: default)')
+    queue_group.add_argument('--enqueue', action='store_true', help='将 -u/-f 指定的URL加入共享队列后退出')
+    queue_group.add_argument('--worker', action='store_true', help='作为工作节点从共享队列领取URL并处理')
+    queue_group.add_argument('--queue_status', action='store_true', help='打印所有节点的汇总进度后退出')
+    queue_group.add_argument('--node_id', help='工作节点ID (默认: 主机名-进程号)')
+    queue_group.add_argument('--lease_timeout', type=int, default=600, help='任务租约时长(秒) (默认: 600)')
+    
+    # 定时重爬参数
+    schedule_group = parser.add_argument_group('定时重爬选项')
+    schedule_group.add_argument('--track', action='store_true', help='将 -u/-f 指定的URL加入重爬跟踪列表')
+    schedule_group.add_argument('--schedule', action='store_true', help='按各文章的变化频率持续重爬到期的跟踪文章')
+    schedule_group.add_argument('--schedule_once', action='store_true', help='只重爬当前已到期的跟踪文章后退出')
+    schedule_group.add_argument('--schedule_status', action='store_true', help='打印跟踪文章的重爬统计后退出')
+    schedule_group.add_argument('--schedule_db', help='重爬调度数据库路径 (默认: <输出目录>/.schedule.db)')
+    schedule_group.add_argument('--requests_per_hour', type=int, help='每小时最多重爬的文章数，0表示不限制 (默认: 600)')
+    
+    # 离线重处理参数
+    reprocess_group = parser.add_argument_group('离线重处理选项')
+    reprocess_group.add_argument('--reprocess', action='append', metavar='PATH',
+                                 help='不访问网络，从保存的原始页面(.html)、WARC存档(.warc.gz)或文章JSON(目录会递归查找)重新生成输出，可多次指定')
     
     # 解析参数
     args = parser.parse_args()
@@ -1037,9 +1431,25 @@ def main():
     os.makedirs(args.output_dir, exist_ok=True)
     
     # 检查参数有效性
-    if not args.url and not args.file and not args.batch:
+    if args.queue is None and (args.enqueue or args.worker or args.queue_status):
+        parser.error("--enqueue/--worker/--queue_status 需要通过 --queue 指定共享队列")
+    schedule_mode = args.track or args.schedule or args.schedule_once or args.schedule_status
+    if args.track and not args.url and not args.file:
+        parser.error("--track 需要通过 -u/--url 或 -f/--file 指定要跟踪的文章")
+    if (not args.url and not args.file and not args.batch and not (args.queue and (args.worker or args.queue_status))
+            and not schedule_mode and not args.reprocess and not args.hydrate):
         parser.error("必须提供 -u/--url 或 -f/--file 参数指定要爬取的文章")
     
+    # 解析流水线各阶段线程数
+    stage_workers = {}
+    for spec in (args.stage_workers or '').split(','):
+        if not spec.strip():
+            continue
+        name, _, count = spec.partition('=')
+        if name.strip() not in PIPELINE_STAGES or not count.strip().isdigit():
+            parser.error(f"无效的阶段线程数设置: {spec}，可用阶段: {', '.join(PIPELINE_STAGES)}")
+        stage_workers[name.strip()] = int(count)
+    
     # 处理输出格式
     formats = []
     if args.text:
@@ -1059,44 +1469,166 @@ def main():
     logger.info(f"下载视频: {'是' if args.video else '否'}")
     logger.info(f"输出格式: {', '.join(formats)}")
     
+    # 离线重处理模式：不创建爬虫，不访问网络，使用全部CPU核心
+    if args.reprocess:
+        reprocess_result = reprocess(args.reprocess, args.output_dir, formats, workers=args.cpu_workers or None)
+        logger.info(f"结果保存在: {reprocess_result['folder']}")
+        return
+    
     # 创建爬虫实例
+    proxy_pool = None
+    if args.proxy_file:
+        proxy_pool = ProxyPool.from_config(config, args.proxy_file)
+        if proxy_pool is None:
+            logger.error(f"代理池为空: {args.proxy_file}")
+            return
     crawler = WeChatArticleCrawler(
         proxy=args.proxy,
         timeout=args.timeout,
         retry_times=args.retry,
-        retry_delay=2
+        retry_delay=2,
+        http2=args.http2 or None,
+        proxy_pool=proxy_pool,
+        connect_timeout=args.connect_timeout
     )
+    if args.pin_proxy and crawler.proxy_pool is not None:
+        crawler.proxy_pool.pin_hosts = True
+    if args.max_file_mb is not None:
+        crawler.media_max_file_mb = args.max_file_mb
+    if args.max_article_mb is not None:
+        crawler.media_max_article_mb = args.max_article_mb
+    if args.no_iframe_data:
+        crawler.keep_iframe_data = False
+    if args.image_filter and crawler.image_filter is None:
+        crawler.image_filter = ImageFilter.from_config({**config.config, "image_filter": True})
+    if args.article_deadline is not None:
+        crawler.article_deadline = args.article_deadline
+    
+    # 媒体补全模式：下载文本优先批次中延后的媒体并更新已写入的输出
+    if args.hydrate:
+        max_media_mb = args.max_batch_mb if args.max_batch_mb is not None else config.get("media_max_batch_mb", 0)
+        hydrate(
+            crawler,
+            args.hydrate,
+            workers=config.get("hydrate_workers", 2) or 1,
+            batch_bytes=ByteCounter(int(max_media_mb * 1024 * 1024)),
+            retry_budget=RetryBudget(config.get("retry_budget_tokens", 100), config.get("retry_budget_ratio", 0.1))
+        )
+        return
+    
+    # 批量、工作节点和定时重爬模式下可选启动指标端点
+    if args.metrics_port is not None and (args.batch or args.file or args.worker or args.schedule or args.schedule_once):
+        metrics.start_metrics_server(args.metrics_port, args.metrics_host or config.get("metrics_host", "127.0.0.1"))
+    
+    # 定时重爬模式：添加跟踪文章、按变化频率重爬或查看统计
+    if schedule_mode:
+        scheduler = RecrawlScheduler(
+            args.schedule_db or os.path.join(args.output_dir, config.get("schedule_db", ".schedule.db")),
+            min_interval=config.get("schedule_min_interval_hours", 1) * 3600,
+            max_interval=config.get("schedule_max_interval_hours", 720) * 3600,
+            initial_interval=config.get("schedule_initial_interval_hours", 24) * 3600
+        )
+        try:
+            if args.track:
+                sources = ([[args.url]] if args.url else []) + (args.file or [])
+                added = scheduler.track(iter_urls(sources))
+                logger.info(f"已添加 {added} 篇新的跟踪文章")
+            
+            if args.schedule or args.schedule_once:
+                requests_per_hour = args.requests_per_hour
+                if requests_per_hour is None:
+                    requests_per_hour = config.get("schedule_requests_per_hour", 600)
+                try:
+                    scheduler.run(
+                        crawler,
+                        args.output_dir,
+                        formats,
+                        download_media=args.media,
+                        download_videos=args.video,
+                        requests_per_hour=requests_per_hour,
+                        batch_size=config.get("schedule_batch_size", 50),
+                        fingerprint_db=args.fingerprint_db,
+                        once=args.schedule_once,
+                        pipeline=args.pipeline or None,
+                        cpu_workers=args.cpu_workers,
+                        stage_workers=stage_workers,
+                        max_inflight_mb=args.max_inflight_mb,
+                        max_media_mb=args.max_batch_mb,
+                        record_warc=args.warc
+                    )
+                except KeyboardInterrupt:
+                    logger.info("重爬调度已停止")
+            
+            stats = scheduler.stats()
+            print(f"\n跟踪文章: {stats['tracked']}, 已到期: {stats['due']}, 从未爬取: {stats['never_crawled']}, "
+                  f"累计重爬: {stats['crawls']}, 发现变化: {stats['changes']}, 连续失败: {stats['failing']}, "
+                  f"不可访问: {stats['gone']}")
+            print("重爬间隔分布: " + ", ".join(f"{bucket}: {count}" for bucket, count in sorted(stats["intervals"].items())))
+        finally:
+            scheduler.close()
+    
+    # 分布式模式：入队、查看进度或作为工作节点处理
+    elif args.queue and (args.enqueue or args.worker or args.queue_status):
+        queue = open_work_queue(args.queue, name=args.queue_name, max_attempts=args.retry + 1)
+        try:
+            if args.enqueue:
+                sources = ([[args.url]] if args.url else []) + (args.file or [])
+                added = queue.put(iter_urls(sources))
+                logger.info(f"已加入队列 {args.queue_name}: {added} 个新URL")
+            
+            if args.worker:
+                run_worker(
+                    crawler,
+                    queue,
+                    args.output_dir,
+                    formats,
+                    download_media=args.media,
+                    download_videos=args.video,
+                    node_id=args.node_id,
+                    visibility_timeout=args.lease_timeout
+                )
+            
+            stats = queue.stats()
+            print(f"\n队列 {args.queue_name} 进度: 完成 {stats['done']}/{stats['total']}, "
+                  f"失败 {stats['failed']}, 处理中 {stats['leased']}, 待处理 {stats['pending']}")
+            for node, node_stats in sorted(stats["nodes"].items()):
+                print(f"  节点 {node}: 完成 {node_stats['done']}, 失败 {node_stats['failed']}")
+        finally:
+            queue.close()
     
     # 批量处理模式
-    if args.batch or args.file:
-        urls = []
-        
-        # 从文件读取URL
-        if args.file:
-            try:
-                with open(args.file, 'r', encoding='utf-8') as f:
-                    urls = [line.strip() for line in f if line.strip() and line.strip().startswith('http')]
-                logger.info(f"从文件 {args.file} 中读取了 {len(urls)} 个URL")
-            except Exception as e:
-                logger.error(f"读取URL文件失败: {e}")
-                return
+    elif args.batch or args.file:
+        sources = []
         
         # 单URL添加到批处理
         if args.url:
-            urls.append(args.url)
+            sources.append([args.url])
+        
+        # 从文件、gzip文件或标准输入流式读取URL
+        for path in args.file or []:
+            if path != '-' and not os.path.exists(path):
+                logger.error(f"读取URL文件失败: 文件不存在 {path}")
+                return
+            sources.append(path)
             
-        # 检查URL列表
-        if not urls:
+        # 检查URL来源
+        if not sources:
             logger.error("没有有效的URL可供处理")
             return
-            
-        # 去除重复URL并过滤无效URL
-        urls = list(set([url for url in urls if url.startswith('http')]))
-        logger.info(f"准备批量处理 {len(urls)} 个URL")
         
-        # 将所有URL添加到历史记录
-        for url in urls:
-            config.add_url_to_history(url)
+        # 本次运行内去重：URL较少时用普通集合，超过阈值再转入临时布隆过滤器，按需惰性地把URL交给爬虫
+        capacity = args.dedupe_capacity or config.get("dedupe_capacity", 100_000_000)
+        error_rate = config.get("dedupe_error_rate", 0.001)
+        seen = SeenSet(config.get("dedupe_memory_items", 1_000_000), capacity, error_rate)
+        # 跨运行去重：只跳过以前成功处理过的URL，文章处理成功后才加入，失败或取消的URL下次仍会处理
+        processed = BloomFilter(args.seen_db, capacity=capacity, error_rate=error_rate) if args.seen_db else None
+        urls = dedupe_urls(iter_urls(sources), seen, processed)
+        
+        def mark_processed(progress):
+            # 超过文章截止时间而未完成的文章也不记录
+            if progress["entry"]["success"] and not progress["entry"].get("incomplete"):
+                processed.add(canonical_article_url(progress["entry"]["url"]))
+        logger.info(f"开始流式批量处理 [输入: {', '.join(args.file or ['-u'])}]")
         
         # 执行批量处理
         batch_result = crawler.batch_process(
@@ -1104,11 +1636,27 @@ def main():
             output_dir=args.output_dir,
             formats=formats,
             download_media=args.media,
-            download_videos=args.video
+            download_videos=args.video,
+            incremental=args.incremental or config.get("incremental", False),
+            fingerprint_db=args.fingerprint_db,
+            keep_results=False,
+            pipeline=args.pipeline or None,
+            cpu_workers=args.cpu_workers,
+            stage_workers=stage_workers,
+            max_inflight_mb=args.max_inflight_mb,
+            profile=args.profile,
+            trace=args.trace,
+            max_media_mb=args.max_batch_mb,
+            record_warc=args.warc,
+            defer_media=args.defer_media or None,
+            progress_callback=mark_processed if processed is not None else None
         )
+        seen.close()
+        if processed is not None:
+            processed.close()
         
         # 打印批处理结果
-        logger.info(f"批量处理完成 [成功: {batch_result['success']}/{batch_result['total']}]")
+        logger.info(f"批量处理完成 [成功: {batch_result['success']}/{batch_result['total']}, 未变化: {batch_result['unchanged']}]")
         logger.info(f"结果保存在: {batch_result['batch_folder']}")
         logger.info(f"汇总报告: {batch_result['batch_log']}")
         
@@ -1137,10 +1685,19 @@ def main():
         if args.media:
             os.makedirs(media_folder, exist_ok=True)
         
-        # 获取文章信息
-        result = crawler.get_article_info(args.url, download_media=args.media, media_folder=media_folder, download_videos=args.video)
+        # 获取文章信息（页面请求和媒体下载共用文章处理时限）
+        time_limit = Deadline(crawler.article_deadline)
+        with deadline.active(time_limit):
+            result = crawler.get_article_info(args.url, download_media=args.media, media_folder=media_folder, download_videos=args.video)
+        if not result and time_limit.expired():
+            logger.error(f"处理失败 [URL: {args.url}, 错误: {DEADLINE_REASON}]")
         
         if result:
+            media = result.get('media_files') or {}
+            skipped = sum(1 for item in media.get('images', []) + media.get('videos', [])
+                          if item.get('skipped') == DEADLINE_REASON)
+            if skipped:
+                print(f"\n注意: {skipped} 个媒体文件因{DEADLINE_REASON}未下载")
             print(f"\n文章标题: {result['title']}")
             print(f"作者: {result['author']}")
             print(f"发布时间: {result['publish_time']}")
@@ -1168,105 +1725,19 @@ def main():
             
             # 保存完整结果到JSON文件
             with open(json_output, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+                json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
             print(f"完整内容已保存到: {json_output}")
             
             # 如果需要，保存纯文本版本
             if args.text:
                 with open(text_output, 'w', encoding='utf-8') as f:
-                    f.write(f"标题: {result['title']}\n")
-                    f.write(f"作者: {result['author']}\n")
-                    f.write(f"发布时间: {result['publish_time']}\n")
-                    f.write(f"链接: {result['permanent_url']}\n\n")
-                    # 添加视频信息到文本文件
-                    if result['media_files']['videos']:
-                        f.write("视频链接:\n")
-                        for i, video in enumerate(result['media_files']['videos']):
-                            if 'local_path' in video:
-                                f.write(f"视频 {i+1}: 已下载到 {video['local_path']}\n")
-                            elif 'original_url' in video:
-                                f.write(f"视频 {i+1}: {video['original_url']}\n")
-                        f.write("\n")
-                    f.write(result['full_content_text'])
+                    f.write(render_text(result))
                 print(f"纯文本内容已保存到: {text_output}")
             
             # 如果需要，保存HTML版本
             if args.html:
-                videos_html = ""
-                if result['media_files']['videos']:
-                    videos_html = "<div class='video-links'><h3>视频链接</h3><ul>"
-                    for i, video in enumerate(result['media_files']['videos']):
-                        videos_html += f"<li>"
-                        
-                        # 如果视频已下载，添加视频播放器
-                        if 'local_path' in video:
-                            local_path = os.path.relpath(video['local_path'], os.path.dirname(html_output)).replace('\\', '/')
-                            videos_html += f"""
-                            <div>
-                                <video controls style="max-width:100%; height:auto;">
-                                    <source src="{local_path}" type="video/mp4">
-                                    您的浏览器不支持视频标签
-                                </video>
-                                <p>已下载视频</p>
-                            </div>
-                            """
-                        # 否则提供链接
-                        elif 'original_url' in video:
-                            videos_html += f"<a href='{video['original_url']}' target='_blank'>视频 {i+1}"
-                            if 'type' in video:
-                                videos_html += f" ({video['type']})"
-                            videos_html += "</a>"
-                            
-                            # 添加备选链接
-                            if 'alternate_urls' in video:
-                                videos_html += "<div style='margin-left:20px; font-size:0.9em;'><p>备选链接：</p>"
-                                for j, alt_url in enumerate(video['alternate_urls']):
-                                    if j > 0:  # 跳过第一个，因为和原始链接相同
-                                        videos_html += f"<a href='{alt_url}' target='_blank'>备选 {j}</a><br>"
-                                videos_html += "</div>"
-                        
-                        videos_html += "</li>"
-                    videos_html += "</ul></div>"
-                
                 with open(html_output, 'w', encoding='utf-8') as f:
-                    f.write(f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>{result['title']}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }}
-        h1 {{ font-size: 24px; margin-bottom: 10px; }}
-        .meta {{ color: #666; margin-bottom: 20px; }}
-        img {{ max-width: 100%; height: auto; }}
-        .media-info {{ margin-top: 20px; padding: 10px; background-color: #f5f5f5; border-radius: 5px; }}
-        .video-links {{ margin-top: 20px; padding: 10px; background-color: #e9f7fe; border-radius: 5px; }}
-        .video-links h3 {{ margin-top: 0; }}
-        .video-links ul {{ padding-left: 20px; }}
-        video {{ max-width: 100%; }}
-    </style>
-</head>
-<body>
-    <h1>{result['title']}</h1>
-    <div class="meta">
-        作者: {result['author']}<br>
-        发布时间: {result['publish_time']}<br>
-        原始链接: <a href="{result['original_url']}" target="_blank">{result['original_url']}</a>
-    </div>
-    
-    {videos_html}
-    
-    <div class="content">
-        {result['content_html']}
-    </div>
-    
-    {f'''<div class="media-info">
-        <h3>媒体文件信息</h3>
-        <p>图片数量: {len(result['media_files']['images'])}</p>
-        <p>视频数量: {len(result['media_files']['videos'])}</p>
-    </div>''' if args.media else ''}
-</body>
-</html>""")
+                    f.write(render_html(result, html_output, args.media))
                     print(f"HTML内容已保存到: {html_output}")
                 
                 # 如果需要，保存Markdown版本
@@ -6,6 +6,12 @@ import time
 import sys
 import logging
 import re
+import io
+import html
+import uuid
+import queue
+import threading
+from collections import OrderedDict
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -17,7 +23,13 @@ if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
 from wechat_article_crawler import WeChatArticleCrawler
+from article_render import render_text, render_html
+from article_model import json_default
 from config import config
+from url_source import iter_urls, dedupe_urls
+from metrics import start_metrics_server
+from incremental import canonical_article_url
+from result_cache import TTLCache
 
 # 检查是否安装了yt-dlp
 def check_ytdlp_installed():
@@ -27,9 +39,20 @@ def check_ytdlp_installed():
     except ImportError:
         return False
 
-# 创建爬虫实例 - 使用配置中的设置
+# 爬虫实例缓存：键为 (代理, 超时, 重试次数)，相同设置的请求复用同一实例的连接池和Cookie
+crawler_cache = OrderedDict()
+crawler_cache_lock = threading.Lock()
+# 正在使用各实例的任务数，以及已移出缓存、等最后一个任务结束后再关闭的实例
+crawler_users = {}
+retired_crawlers = set()
+
+# 获取爬虫实例 - 使用配置中的设置
 def create_crawler(proxy=None, timeout=None, retry_times=None):
-    """基于当前配置创建爬虫实例"""
+    """基于当前配置获取爬虫实例，相同设置复用缓存中的实例
+    
+    返回的实例登记为使用中，用完后需调用 release_crawler。实例被淘汰或缓存被清空时，
+    没有任务在使用就立即关闭，否则等使用它的任务都结束后再关闭。
+    """
     # 如果没有指定参数，则使用配置中的值
     if proxy is None:
         proxy = config.get("proxy", "")
@@ -37,26 +60,87 @@ def create_crawler(proxy=None, timeout=None, retry_times=None):
         timeout = config.get("timeout", 10)
     if retry_times is None:
         retry_times = config.get("retry_times", 3)
-        
-    return WeChatArticleCrawler(
-        proxy=proxy if proxy else None,
-        timeout=timeout,
-        retry_times=retry_times,
-        retry_delay=config.get("retry_delay", 2)
-    )
+    
+    key = (proxy or "", timeout, retry_times)
+    to_close = []
+    with crawler_cache_lock:
+        crawler = crawler_cache.get(key)
+        if crawler is not None:
+            crawler_cache.move_to_end(key)
+        else:
+            crawler = WeChatArticleCrawler(
+                proxy=proxy if proxy else None,
+                timeout=timeout,
+                retry_times=retry_times,
+                retry_delay=config.get("retry_delay", 2)
+            )
+            crawler_cache[key] = crawler
+            # 超出容量时淘汰最久未使用的实例
+            while len(crawler_cache) > max(1, config.get("crawler_cache_size", 4)):
+                _, evicted = crawler_cache.popitem(last=False)
+                if _retire_crawler(evicted):
+                    to_close.append(evicted)
+        crawler_users[crawler] = crawler_users.get(crawler, 0) + 1
+    for evicted in to_close:
+        evicted.close()
+    return crawler
+
+def _retire_crawler(crawler):
+    """移出缓存的实例（调用方持有 crawler_cache_lock）：返回是否可以立即关闭，仍在使用时留给 release_crawler 关闭"""
+    if crawler_users.get(crawler):
+        retired_crawlers.add(crawler)
+        return False
+    return True
 
-# 创建爬虫实例
-crawler = WeChatArticleCrawler()
+def release_crawler(crawler):
+    """任务用完 create_crawler 返回的实例后调用，已移出缓存的实例在最后一个任务结束时关闭"""
+    with crawler_cache_lock:
+        count = crawler_users.get(crawler, 0) - 1
+        if count > 0:
+            crawler_users[crawler] = count
+            return
+        crawler_users.pop(crawler, None)
+        if crawler not in retired_crawlers:
+            return
+        retired_crawlers.discard(crawler)
+    crawler.close()
 
-def crawl_article(url, output_format, download_media, download_videos, proxy=""):
-    """爬取微信文章并根据选择的格式保存"""
+def clear_crawler_cache():
+    """清空爬虫实例缓存，之后的请求按新配置重新创建实例"""
+    with crawler_cache_lock:
+        to_close = [crawler for crawler in crawler_cache.values() if _retire_crawler(crawler)]
+        crawler_cache.clear()
+    for crawler in to_close:
+        crawler.close()
+
+# 单篇爬取结果缓存：键为 (规范化URL, 输出格式, 下载图片, 下载视频)，值为返回给页面的输出
+result_cache = TTLCache(config.get("result_cache_size", 64), config.get("result_cache_ttl", 3600))
+
+def crawl_article(url, output_format, download_media, download_videos, proxy="", force_refresh=False):
+    """爬取微信文章并根据选择的格式保存
+    
+    相同链接和选项的重复爬取直接返回缓存中已生成的输出，force_refresh 为True时忽略缓存重新爬取。
+    """
     if not url or not url.startswith("https://mp.weixin.qq.com"):
         return "请输入有效的微信文章链接", None, None, None
     
+    crawler = None
     try:
         # 将URL添加到历史记录
         config.add_url_to_history(url)
         
+        # 命中缓存且输出文件仍然存在时直接返回
+        cache_key = (canonical_article_url(url), tuple(sorted(output_format)), bool(download_media), bool(download_videos))
+        if force_refresh:
+            result_cache.invalidate(cache_key)
+        else:
+            cached, age = result_cache.get(cache_key, validate=lambda outputs: all(os.path.exists(f) for f in outputs[2]))
+            if cached is not None:
+                logger.info(f"使用缓存的爬取结果: {url}")
+                output_message, preview_html, download_files, title = cached
+                output_message += f"\n\n> 结果来自缓存（{int(age)}秒前爬取），勾选\"强制刷新\"可重新爬取"
+                return output_message, preview_html, download_files, title
+        
         # 创建输出目录
         output_dir = config.get("output_dir", "outputs")
         os.makedirs(output_dir, exist_ok=True)
@@ -104,7 +188,7 @@ def crawl_article(url, output_format, download_media, download_videos, proxy="")
         
         # 保存JSON文件（始终保存）
         with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+            json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
         
         # 准备输出结果
         output_files = [f"JSON文件已保存: {json_filename}"]
@@ -123,103 +207,14 @@ def crawl_article(url, output_format, download_media, download_videos, proxy="")
         # 如果选择了文本格式
         if "text" in formats:
             with open(text_filename, 'w', encoding='utf-8') as f:
-                f.write(f"标题: {result['title']}\n")
-                f.write(f"作者: {result['author']}\n")
-                f.write(f"发布时间: {result['publish_time']}\n")
-                f.write(f"链接: {result['permanent_url']}\n\n")
-                
-                # 添加视频信息到文本文件
-                if result['media_files']['videos']:
-                    f.write("视频链接:\n")
-                    for i, video in enumerate(result['media_files']['videos']):
-                        if 'local_path' in video:
-                            f.write(f"视频 {i+1}: 已下载到 {video['local_path']}\n")
-                        elif 'original_url' in video:
-                            f.write(f"视频 {i+1}: {video['original_url']}\n")
-                    f.write("\n")
-                
-                f.write(result['full_content_text'])
+                f.write(render_text(result))
             output_files.append(f"文本文件已保存: {text_filename}")
             download_files.append(text_filename)
         
         # 如果选择了HTML格式
         if "html" in formats:
-            # 准备视频HTML部分
-            videos_html = ""
-            if result['media_files']['videos']:
-                videos_html = "<div class='video-links'><h3>视频链接</h3><ul>"
-                for i, video in enumerate(result['media_files']['videos']):
-                    videos_html += f"<li>"
-                    
-                    # 如果视频已下载，添加视频播放器
-                    if 'local_path' in video:
-                        local_path = os.path.relpath(video['local_path'], os.path.dirname(html_filename)).replace('\\', '/')
-                        videos_html += f"""
-                        <div>
-                            <video controls style="max-width:100%; height:auto;">
-                                <source src="{local_path}" type="video/mp4">
-                                您的浏览器不支持视频标签
-                            </video>
-                            <p>已下载视频</p>
-                        </div>
-                        """
-                    # 否则提供链接
-                    elif 'original_url' in video:
-                        videos_html += f"<a href='{video['original_url']}' target='_blank'>视频 {i+1}"
-                        if 'type' in video:
-                            videos_html += f" ({video['type']})"
-                        videos_html += "</a>"
-                        
-                        # 添加备选链接
-                        if 'alternate_urls' in video:
-                            videos_html += "<div style='margin-left:20px; font-size:0.9em;'><p>备选链接：</p>"
-                            for j, alt_url in enumerate(video['alternate_urls']):
-                                if j > 0:  # 跳过第一个，因为和原始链接相同
-                                    videos_html += f"<a href='{alt_url}' target='_blank'>备选 {j}</a><br>"
-                            videos_html += "</div>"
-                    
-                    videos_html += "</li>"
-                videos_html += "</ul></div>"
-            
             with open(html_filename, 'w', encoding='utf-8') as f:
-                f.write(f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>{result['title']}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }}
-        h1 {{ font-size: 24px; margin-bottom: 10px; }}
-        .meta {{ color: #666; margin-bottom: 20px; }}
-        img {{ max-width: 100%; height: auto; }}
-        .media-info {{ margin-top: 20px; padding: 10px; background-color: #f5f5f5; border-radius: 5px; }}
-        .video-links {{ margin-top: 20px; padding: 10px; background-color: #e9f7fe; border-radius: 5px; }}
-        .video-links h3 {{ margin-top: 0; }}
-        .video-links ul {{ padding-left: 20px; }}
-        video {{ max-width: 100%; }}
-    </style>
-</head>
-<body>
-    <h1>{result['title']}</h1>
-    <div class="meta">
-        作者: {result['author']}<br>
-        发布时间: {result['publish_time']}<br>
-        原始链接: <a href="{result['original_url']}" target="_blank">{result['original_url']}</a>
-    </div>
-    
-    {videos_html}
-    
-    <div class="content">
-        {result['content_html']}
-    </div>
-    
-    {f'''<div class="media-info">
-        <h3>媒体文件信息</h3>
-        <p>图片数量: {len(result['media_files']['images'])}</p>
-        <p>视频数量: {len(result['media_files']['videos'])}</p>
-    </div>''' if download_media else ''}
-</body>
-</html>""")
+                f.write(render_html(result, html_filename, download_media))
             output_files.append(f"HTML文件已保存: {html_filename}")
             download_files.append(html_filename)
             
@@ -302,13 +297,16 @@ def crawl_article(url, output_format, download_media, download_videos, proxy="")
         # 准备输出消息
         media_info = ""
         if download_media:
-            img_count = len(result['media_files']['images'])
+            img_count = sum(1 for img in result['media_files']['images'] if 'local_path' in img)
+            skipped_count = sum(1 for img in result['media_files']['images'] if 'skipped' in img)
             video_count = len(result['media_files']['videos'])
             
             # 统计下载成功的视频数
             downloaded_videos = sum(1 for v in result['media_files']['videos'] if 'local_path' in v)
             
             media_info = f"\n\n**媒体文件:**\n- 图片: {img_count}张"
+            if skipped_count:
+                media_info += f" (跳过: {skipped_count}张)"
             
             if download_videos:
                 media_info += f"\n- 视频: {video_count}个 (成功下载: {downloaded_videos}个)"
@@ -325,6 +323,8 @@ def crawl_article(url, output_format, download_media, download_videos, proxy="")
                         media_info += f"\n- 视频 {i+1}{video_type}: 已下载到本地"
                     elif 'original_url' in video:
                         media_info += f"\n- [视频 {i+1}{video_type}]({video['original_url']})"
+                        if 'skipped' in video:
+                            media_info += f" (未下载: {video['skipped']})"
                         
                         # 添加备选链接
                         if 'alternate_urls' in video and len(video['alternate_urls']) > 1:
@@ -348,26 +348,89 @@ def crawl_article(url, output_format, download_media, download_videos, proxy="")
         """
         
         logger.info(f"成功爬取文章: {result['title']}")
+        result_cache.put(cache_key, (output_message, preview_html, download_files, result['title']))
         return output_message, preview_html, download_files, result['title']
     
     except Exception as e:
         logger.error(f"爬取文章时出错: {str(e)}")
         return f"发生错误: {str(e)}", None, None, None
+    finally:
+        if crawler is not None:
+            release_crawler(crawler)
+
+# 正在进行的批量任务的取消标记，键为返回给页面的任务标识
+batch_cancel_events = {}
+
+# 批量爬取时刷新进度的最小间隔（秒）
+BATCH_PROGRESS_INTERVAL = 0.5
+
+# 进度预览中显示的最近完成文章数
+BATCH_RECENT_LIMIT = 20
+
+def format_duration(seconds):
+    """将秒数格式化为便于阅读的时长"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}秒"
+    if seconds < 3600:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    return f"{seconds // 3600}小时{seconds % 3600 // 60}分"
+
+def batch_progress_message(progress, total, elapsed, failures, cancelling=False):
+    """生成批量爬取进度的Markdown文本：完成数、吞吐量、预计剩余时间和失败列表"""
+    done = progress["done"] if progress else 0
+    rate = done / elapsed if elapsed > 0 else 0.0
+    
+    title = "正在取消，等待已开始的文章完成..." if cancelling else "批量爬取进行中..."
+    message = f"## {title}\n\n"
+    message += f"- **进度:** {done}/{total} 篇 ({done / total * 100:.1f}%)\n"
+    if progress:
+        message += f"- **成功:** {progress['success']} 篇\n"
+        message += f"- **失败:** {progress['failed']} 篇\n"
+    message += f"- **已用时间:** {format_duration(elapsed)}\n"
+    message += f"- **速度:** {rate * 60:.1f} 篇/分钟\n"
+    if rate > 0 and not cancelling:
+        message += f"- **预计剩余:** {format_duration((total - done) / rate)}\n"
+    
+    if failures:
+        message += "\n### 失败列表:\n"
+        for i, (url, error) in enumerate(failures):
+            message += f"{i+1}. {url} - {error}\n"
+    return message
+
+def batch_recent_html(recent):
+    """生成最近完成文章的HTML状态列表"""
+    preview_html = "<h3>最近完成的文章:</h3><ul>"
+    for entry in reversed(recent):
+        title = html.escape(entry.get('title') or entry['url'])
+        if not entry['success']:
+            preview_html += f"<li>❌ {html.escape(entry['url'])} - {html.escape(str(entry.get('error', '未知错误')))}</li>"
+        elif entry.get('unchanged'):
+            preview_html += f"<li>⏸ {title}（未变化）</li>"
+        else:
+            preview_html += f"<li>✅ {title}</li>"
+    preview_html += "</ul>"
+    return preview_html
 
 def batch_crawl_articles(urls_text, output_format, download_media, download_videos, proxy=""):
-    """批量爬取多个微信文章"""
-    # 解析输入的URL列表
-    urls = []
-    for line in urls_text.strip().split('\n'):
-        url = line.strip()
-        if url and url.startswith("https://mp.weixin.qq.com"):
-            urls.append(url)
+    """批量爬取多个微信文章
+    
+    以生成器形式运行：爬取在后台线程中进行，每篇文章完成后向页面推送进度（完成数、吞吐量、
+    预计剩余时间、失败列表）。最后一个输出是任务标识，供取消按钮使用。
+    """
+    # 逐行解析输入的URL列表，并按规范化链接去重（输入框内容已在内存中，展开为列表以便计算进度）
+    urls = list(dedupe_urls(iter_urls([io.StringIO(urls_text or "")], prefix="https://mp.weixin.qq.com"), set()))
     
     if not urls:
-        return "未找到有效的微信文章链接，请确保每行一个链接，并以 https://mp.weixin.qq.com 开头", None, None
+        yield "未找到有效的微信文章链接，请确保每行一个链接，并以 https://mp.weixin.qq.com 开头", None, None, None
+        return
+    
+    token = uuid.uuid4().hex
+    cancel_event = threading.Event()
+    batch_cancel_events[token] = cancel_event
     
     try:
-        logger.info(f"开始批量爬取 {len(urls)} 篇文章")
+        logger.info("开始批量爬取文章")
         
         # 将中文格式名称转换为程序使用的格式名称
         format_mapping = {
@@ -381,25 +444,80 @@ def batch_crawl_articles(urls_text, output_format, download_media, download_vide
         # 创建爬虫实例
         crawler = create_crawler(proxy=proxy)
         
-        # 执行批量爬取
-        batch_result = crawler.batch_process(
-            urls=urls,
-            output_dir=config.get("output_dir", "outputs"),
-            formats=formats,
-            download_media=download_media,
-            download_videos=download_videos
-        )
+        # 在后台线程中执行批量爬取，通过队列接收每篇文章的进度
+        updates = queue.Queue()
+        outcome = {}
+        
+        def run():
+            try:
+                outcome["result"] = crawler.batch_process(
+                    urls=urls,
+                    output_dir=config.get("output_dir", "outputs"),
+                    formats=formats,
+                    download_media=download_media,
+                    download_videos=download_videos,
+                    progress_callback=updates.put,
+                    cancel_event=cancel_event
+                )
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                release_crawler(crawler)
+                updates.put(None)
+        
+        worker = threading.Thread(target=run, name="batch-crawl", daemon=True)
+        worker.start()
+        
+        started = time.time()
+        last_yield = 0.0
+        progress = None
+        failures = []
+        recent = []
+        finished = False
+        yield batch_progress_message(None, len(urls), 0, failures), None, None, token
+        
+        while not finished:
+            try:
+                update = updates.get(timeout=BATCH_PROGRESS_INTERVAL)
+            except queue.Empty:
+                update = False
+            if update is None:
+                finished = True
+            elif update:
+                progress = update
+                entry = update["entry"]
+                if not entry["success"]:
+                    failures.append((entry["url"], entry.get("error", "未知错误")))
+                recent.append(entry)
+                del recent[:-BATCH_RECENT_LIMIT]
+                # 同一时间段内完成多篇时合并为一次刷新
+                if not updates.empty():
+                    continue
+            
+            now = time.time()
+            if not finished and now - last_yield >= BATCH_PROGRESS_INTERVAL:
+                last_yield = now
+                message = batch_progress_message(progress, len(urls), now - started, failures, cancel_event.is_set())
+                yield message, batch_recent_html(recent) if recent else None, None, token
+        
+        worker.join()
+        if "error" in outcome:
+            raise outcome["error"]
+        batch_result = outcome["result"]
+        elapsed = time.time() - started
         
         # 准备下载文件列表
         download_files = [batch_result['batch_log']]
         
         # 生成结果报告
+        title = "批量爬取已取消，已完成的文章已保存" if batch_result['cancelled'] else "批量爬取完成！"
         output_message = f"""
-## 批量爬取完成！
+## {title}
 
-- **处理文章总数:** {batch_result['total']} 篇
+- **处理文章总数:** {batch_result['total']} 篇{f" (共 {len(urls)} 篇，剩余未处理)" if batch_result['cancelled'] else ""}
 - **成功:** {batch_result['success']} 篇
 - **失败:** {batch_result['failed']} 篇
+- **用时:** {format_duration(elapsed)}
 - **批处理文件夹:** {batch_result['batch_folder']}
 - **汇总报告:** {batch_result['batch_log']}
 
@@ -416,7 +534,7 @@ def batch_crawl_articles(urls_text, output_format, download_media, download_vide
         
         # 生成简单的HTML预览
         preview_html = f"""
-        <h2>批量爬取完成</h2>
+        <h2>{title}</h2>
         <p>处理文章总数: {batch_result['total']} 篇</p>
         <p>成功: {batch_result['success']} 篇</p>
         <p>失败: {batch_result['failed']} 篇</p>
@@ -433,11 +551,23 @@ def batch_crawl_articles(urls_text, output_format, download_media, download_vide
             preview_html += "</ul>"
         
         logger.info(f"批量爬取完成，成功: {batch_result['success']}/{batch_result['total']}")
-        return output_message, preview_html, download_files
+        yield output_message, preview_html, download_files, None
     
     except Exception as e:
         logger.error(f"批量爬取文章时出错: {str(e)}")
-        return f"批量爬取过程中发生错误: {str(e)}", None, None
+        yield f"批量爬取过程中发生错误: {str(e)}", None, None, None
+    
+    finally:
+        batch_cancel_events.pop(token, None)
+
+def cancel_batch_crawl(token):
+    """取消正在进行的批量爬取：不再处理新的链接，已开始的文章完成后生成汇总报告"""
+    cancel_event = batch_cancel_events.get(token) if token else None
+    if cancel_event is None:
+        return "当前没有正在进行的批量爬取任务"
+    cancel_event.set()
+    logger.info("已请求取消批量爬取")
+    return "已请求取消，正在处理中的文章完成后将停止，已完成的结果会保留在批处理文件夹中"
 
 # 检查是否安装了yt-dlp并提供安装提示
 def check_and_install_ytdlp():
@@ -450,6 +580,7 @@ def check_and_install_ytdlp():
 # 保存配置更改
 def save_config_changes(output_dir, media_folder, proxy, timeout, retry_times):
     """保存用户配置更改"""
+    previous = (config.get("proxy"), config.get("timeout"), config.get("retry_times"))
     config.update_config(
         output_dir=output_dir,
         media_folder=media_folder,
@@ -457,6 +588,9 @@ def save_config_changes(output_dir, media_folder, proxy, timeout, retry_times):
         timeout=int(timeout) if timeout else 10,
         retry_times=int(retry_times) if retry_times else 3
     )
+    # 代理、超时或重试设置变化后，缓存的爬虫实例需要按新配置重建
+    if (config.get("proxy"), config.get("timeout"), config.get("retry_times")) != previous:
+        clear_crawler_cache()
     return "配置已保存"
 
 # 创建Gradio界面
@@ -513,6 +647,12 @@ with gr.Blocks(title="微信文章爬虫工具", theme=gr.themes.Soft()) as app:
                         lines=1
                     )
                     
+                    force_refresh = gr.Checkbox(
+                        label="强制刷新",
+                        value=False,
+                        info="忽略缓存，重新爬取已爬取过的文章"
+                    )
+                    
                     crawl_button = gr.Button("开始爬取", variant="primary")
                 
                 with gr.Column(scale=2):
@@ -577,7 +717,11 @@ with gr.Blocks(title="微信文章爬虫工具", theme=gr.themes.Soft()) as app:
                         lines=1
                     )
                     
-                    batch_crawl_button = gr.Button("开始批量爬取", variant="primary")
+                    with gr.Row():
+                        batch_crawl_button = gr.Button("开始批量爬取", variant="primary")
+                        batch_cancel_button = gr.Button("取消批量爬取", variant="stop")
+                    batch_cancel_status = gr.Markdown("")
+                    batch_task = gr.State(None)
                 
                 with gr.Column(scale=2):
                     gr.Markdown("### 批量爬取说明")
@@ -585,7 +729,8 @@ with gr.Blocks(title="微信文章爬虫工具", theme=gr.themes.Soft()) as app:
                     1. 输入多个微信公众号文章链接，每行一个
                     2. 选择需要的输出格式
                     3. 设置下载选项
-                    4. 点击"开始批量爬取"按钮
+                    4. 点击"开始批量爬取"按钮，页面会实时显示进度、速度和预计剩余时间
+                    5. 需要中途停止时点击"取消批量爬取"，已完成的文章和汇总报告会保留
                     
                     **批量爬取特点：**
                     - 自动处理多篇文章
@@ -660,7 +805,7 @@ with gr.Blocks(title="微信文章爬虫工具", theme=gr.themes.Soft()) as app:
     # 单篇爬取
     crawl_button.click(
         fn=crawl_article, 
-        inputs=[url_input, output_format, download_media, download_videos, proxy_input], 
+        inputs=[url_input, output_format, download_media, download_videos, proxy_input, force_refresh], 
         outputs=[result_output, html_preview, file_output, article_title]
     )
     
@@ -668,7 +813,15 @@ with gr.Blocks(title="微信文章爬虫工具", theme=gr.themes.Soft()) as app:
     batch_crawl_button.click(
         fn=batch_crawl_articles,
         inputs=[urls_input, batch_output_format, batch_download_media, batch_download_videos, batch_proxy_input],
-        outputs=[batch_result_output, batch_preview, batch_file_output]
+        outputs=[batch_result_output, batch_preview, batch_file_output, batch_task]
+    )
+    
+    # 取消批量爬取（不进入队列，批量任务运行时也能立即响应）
+    batch_cancel_button.click(
+        fn=cancel_batch_crawl,
+        inputs=[batch_task],
+        outputs=[batch_cancel_status],
+        queue=False
     )
     
     # 保存设置
@@ -690,5 +843,11 @@ if __name__ == "__main__":
     # 启动前确保配置路径存在
     os.makedirs(config.get("output_dir", "outputs"), exist_ok=True)
     
+    # 配置了指标端口时提供 /metrics 端点
+    if config.get("metrics_port"):
+        start_metrics_server(config.get("metrics_port"), config.get("metrics_host", "127.0.0.1"))
+    
     # 启动Web界面
+    # 批量爬取以生成器形式推送进度，需要启用队列
+    app.queue()
     app.launch(share=False, inbrowser=True) 
\ No newline at end of file
@@ -0,0 +1,645 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+import urllib.parse
+from incremental import canonical_article_url
+import metrics
+import retry_policy
+
+logger = logging.getLogger(__name__)
+
+
+class Task:
+    """从队列租用的任务"""
+
+    def __init__(self, task_id, url, attempts, token):
+        self.task_id = task_id
+        self.url = url
+        self.attempts = attempts
+        self.token = token
+
+    def __repr__(self):
+        return f"Task(id={self.task_id}, url={self.url}, attempts={self.attempts})"
+
+
+class WorkQueue:
+    """基于租约（可见性超时）的共享任务队列接口
+
+    任务被 lease 后对其他节点不可见，直到租约过期；处理成功调用 ack，
+    失败调用 nack 重新入队（不可重试的失败或超过最大尝试次数后标记为失败）。
+    租约过期的任务（节点崩溃）重新领取时同样计入尝试次数，达到上限后标记为失败，不再反复拖垮节点。
+    """
+
+    # 租约过期且尝试次数用完的任务记录的错误信息
+    EXPIRED_ERROR = "租约过期次数达到最大尝试次数"
+
+    def __init__(self, name="default", max_attempts=3):
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def put(self, urls):
+        """添加URL，已存在的（按规范化URL）会被忽略
+
+        Returns:
+            int: 实际新增的任务数
+        """
+        raise NotImplementedError
+
+    def lease(self, node_id, visibility_timeout=600):
+        """租用一个可处理的任务
+
+        Returns:
+            Task or None: 没有可用任务时返回None
+        """
+        raise NotImplementedError
+
+    def extend(self, task, visibility_timeout=600):
+        """延长租约（处理耗时较长时由心跳线程调用）
+
+        Returns:
+            bool: 租约仍属于当前节点时返回True
+        """
+        raise NotImplementedError
+
+    def ack(self, task, node_id, result=None):
+        """确认任务完成"""
+        raise NotImplementedError
+
+    def nack(self, task, node_id, error=None, retry_delay=0, permanent=False):
+        """任务失败，重新入队或标记为最终失败
+
+        Args:
+            permanent (bool, optional): 不可重试的失败（404、文章已删除等），直接标记为最终失败。默认为False。
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        """汇总所有节点的进度
+
+        Returns:
+            dict: {"pending", "leased", "done", "failed", "total", "nodes": {node_id: {...}}}
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """基于SQLite文件的任务队列，适用于同一主机上的多个进程"""
+
+    def __init__(self, db_path, name="default", max_attempts=3):
+        super().__init__(name, max_attempts)
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                url TEXT NOT NULL,
+                url_key TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_token TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                result TEXT,
+                updated REAL,
+                UNIQUE (queue, url_key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (queue, state, available_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                queue TEXT NOT NULL,
+                node TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                last_seen REAL,
+                PRIMARY KEY (queue, node)
+            )
+        """)
+
+    def _node_progress(self, node_id, field):
+        self._conn.execute(
+            "INSERT INTO nodes (queue, node, last_seen) VALUES (?, ?, ?) "
+            "ON CONFLICT (queue, node) DO UPDATE SET last_seen = excluded.last_seen",
+            (self.name, node_id, time.time())
+        )
+        if field:
+            self._conn.execute(
+                f"UPDATE nodes SET {field} = {field} + 1 WHERE queue = ? AND node = ?",
+                (self.name, node_id)
+            )
+
+    def put(self, urls):
+        added = 0
+        now = time.time()
+        batch = []
+        with self._lock:
+            for url in urls:
+                batch.append((self.name, url, canonical_article_url(url), now, now))
+                if len(batch) >= 1000:
+                    added += self._insert(batch)
+                    batch = []
+            if batch:
+                added += self._insert(batch)
+        return added
+
+    def _insert(self, rows):
+        before = self._conn.total_changes
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO tasks (queue, url, url_key, available_at, updated) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        self._conn.execute("COMMIT")
+        return self._conn.total_changes - before
+
+    def lease(self, node_id, visibility_timeout=600):
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 租约过期且尝试次数已用完的任务不再重新领取
+                self._conn.execute(
+                    "UPDATE tasks SET state = 'failed', lease_token = NULL, last_error = ?, updated = ? "
+                    "WHERE queue = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (self.EXPIRED_ERROR, now, self.name, now, self.max_attempts)
+                )
+                row = self._conn.execute(
+                    "SELECT id, url, attempts FROM tasks WHERE queue = ? AND "
+                    "((state = 'pending' AND available_at <= ?) OR (state = 'leased' AND lease_expires < ?)) "
+                    "ORDER BY available_at, id LIMIT 1",
+                    (self.name, now, now)
+                ).fetchone()
+                if not row:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_token = ?, lease_expires = ?, updated = ? WHERE id = ?",
+                    (node_id, token, now + visibility_timeout, now, row[0])
+                )
+                self._node_progress(node_id, None)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Task(row[0], row[1], row[2] + 1, token)
+
+    def extend(self, task, visibility_timeout=600):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE id = ? AND state = 'leased' AND lease_token = ?",
+                (time.time() + visibility_timeout, task.task_id, task.token)
+            )
+        return cursor.rowcount == 1
+
+    def ack(self, task, node_id, result=None):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            cursor = self._conn.execute(
+                "UPDATE tasks SET state = 'done', lease_token = NULL, result = ?, updated = ? "
+                "WHERE id = ? AND lease_token = ?",
+                (json.dumps(result, ensure_ascii=False) if result else None, time.time(), task.task_id, task.token)
+            )
+            if cursor.rowcount == 1:
+                self._node_progress(node_id, "done")
+            self._conn.execute("COMMIT")
+        if cursor.rowcount != 1:
+            logger.warning(f"租约已失效，确认被忽略: {task}")
+
+    def nack(self, task, node_id, error=None, retry_delay=0, permanent=False):
+        final = permanent or task.attempts >= self.max_attempts
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            cursor = self._conn.execute(
+                "UPDATE tasks SET state = ?, lease_token = NULL, available_at = ?, last_error = ?, updated = ? "
+                "WHERE id = ? AND lease_token = ?",
+                ('failed' if final else 'pending', time.time() + retry_delay, error, time.time(),
+                 task.task_id, task.token)
+            )
+            if cursor.rowcount == 1 and final:
+                self._node_progress(node_id, "failed")
+            self._conn.execute("COMMIT")
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM tasks WHERE queue = ? GROUP BY state", (self.name,)
+            ).fetchall())
+            nodes = self._conn.execute(
+                "SELECT node, done, failed, last_seen FROM nodes WHERE queue = ?", (self.name,)
+            ).fetchall()
+        stats = {state: counts.get(state, 0) for state in ('pending', 'leased', 'done', 'failed')}
+        stats["total"] = sum(counts.values())
+        stats["nodes"] = {
+            node: {"done": done, "failed": failed, "last_seen": last_seen}
+            for node, done, failed, last_seen in nodes
+        }
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RespClient:
+    """极简的Redis协议（RESP）客户端，可连接Redis或任何兼容RESP的服务"""
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, timeout=10):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._reader = self._sock.makefile('rb')
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("连接已被服务端关闭")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b'+':
+            return payload.decode('utf-8')
+        if prefix == b'-':
+            raise RuntimeError(payload.decode('utf-8'))
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2].decode('utf-8')
+        if prefix == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RuntimeError(f"无法解析的RESP响应: {line!r}")
+
+    def _call(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = str(arg).encode('utf-8')
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def execute(self, *args):
+        """执行一条命令，连接断开时自动重连一次"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (ConnectionError, OSError):
+                    self.close_connection()
+                    if attempt:
+                        raise
+
+    def transaction(self, keys, build, max_retries=50):
+        """乐观事务：WATCH keys 后由 build 读取当前状态并给出要原子执行的命令，期间 keys 被其他客户端修改时重试
+
+        Args:
+            keys (list): 需要 WATCH 的键
+            build (callable): build(call) 用 call(*args) 读取状态，返回 (命令列表, 附加值)；
+                命令列表为None时不执行事务
+            max_retries (int, optional): 冲突重试次数上限。默认为50。
+
+        Returns:
+            tuple: (EXEC 返回的各命令结果列表，没有执行事务时为None, build 的附加值)
+        """
+        with self._lock:
+            for attempt in range(max_retries):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._call('WATCH', *keys)
+                    commands, value = build(self._call)
+                    if commands is None:
+                        self._call('UNWATCH')
+                        return None, value
+                    self._call('MULTI')
+                    for command in commands:
+                        self._call(*command)
+                    replies = self._call('EXEC')
+                except (ConnectionError, OSError):
+                    self.close_connection()
+                    if attempt:
+                        raise
+                    continue
+                if replies is not None:
+                    return replies, value
+            raise RuntimeError(f"事务冲突次数过多: {keys}")
+
+    def close_connection(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+
+class RedisWorkQueue(WorkQueue):
+    """基于Redis协议的任务队列，适用于多台主机共享
+
+    状态变更（入队、领取、续约、确认、失败和回收过期租约）都在 WATCH/MULTI/EXEC 乐观事务中原子完成，
+    多个节点并发操作同一任务时只有一个生效。只使用基础命令，不依赖Lua脚本，
+    因此也可以连接到测试用的本地兼容服务（tests/resp_server.py）。
+    """
+
+    def __init__(self, client, name="default", max_attempts=3):
+        super().__init__(name, max_attempts)
+        self.client = client
+        self.prefix = f"wechat_crawler:{name}"
+
+    def _key(self, suffix):
+        return f"{self.prefix}:{suffix}"
+
+    def put(self, urls):
+        added = 0
+        urls_key = self._key('urls')
+        for url in urls:
+            url_key = canonical_article_url(url)
+            if self.client.execute('SISMEMBER', urls_key, url_key):
+                continue
+            # 编号在事务外分配，URL已被其他节点加入时编号作废（总数按URL集合计算）
+            task_id = self.client.execute('INCR', self._key('seq'))
+
+            def build(call):
+                if call('SISMEMBER', urls_key, url_key):
+                    return None, False
+                return [
+                    ('SADD', urls_key, url_key),
+                    ('HSET', self._key(f'task:{task_id}'), 'url', url, 'attempts', 0),
+                    ('ZADD', self._key('pending'), time.time(), task_id),
+                ], True
+
+            if self.client.transaction([urls_key], build)[1]:
+                added += 1
+        return added
+
+    def _reclaim_expired(self, now):
+        """把租约过期的任务放回队列，尝试次数已用完的标记为失败"""
+        leased_key = self._key('leased')
+        expired = self.client.execute('ZRANGEBYSCORE', leased_key, '-inf', now, 'LIMIT', 0, 100)
+        for task_id in expired or []:
+            task_key = self._key(f'task:{task_id}')
+
+            def build(call):
+                score = call('ZSCORE', leased_key, task_id)
+                if score is None or float(score) >= now:
+                    return None, None
+                attempts = int(call('HGET', task_key, 'attempts') or 0)
+                if attempts >= self.max_attempts:
+                    return [
+                        ('ZREM', leased_key, task_id),
+                        ('HSET', task_key, 'state', 'failed', 'token', '', 'last_error', self.EXPIRED_ERROR),
+                        ('HINCRBY', self._key('stats'), 'failed', 1),
+                    ], None
+                return [('ZREM', leased_key, task_id), ('ZADD', self._key('pending'), now, task_id)], None
+
+            self.client.transaction([leased_key, task_key], build)
+
+    def lease(self, node_id, visibility_timeout=600):
+        now = time.time()
+        self._reclaim_expired(now)
+        pending_key = self._key('pending')
+        token = uuid.uuid4().hex
+
+        def build(call):
+            head = call('ZRANGE', pending_key, 0, 0, 'WITHSCORES')
+            # 队列为空，或最早的任务还没到重试时间
+            if not head or float(head[1]) > now:
+                return None, None
+            task_id = head[0]
+            task_key = self._key(f'task:{task_id}')
+            return [
+                ('ZREM', pending_key, task_id),
+                ('ZADD', self._key('leased'), now + visibility_timeout, task_id),
+                ('HINCRBY', task_key, 'attempts', 1),
+                ('HSET', task_key, 'token', token, 'owner', node_id),
+                ('HSET', self._key('node_seen'), node_id, now),
+                ('HGET', task_key, 'url'),
+            ], task_id
+
+        replies, task_id = self.client.transaction([pending_key], build)
+        if replies is None:
+            return None
+        return Task(task_id, replies[5], int(replies[2]), token)
+
+    def _finish(self, task, commands):
+        """租约仍属于该任务时原子执行 commands（先移出 leased），返回是否执行"""
+        task_key = self._key(f'task:{task.task_id}')
+        leased_key = self._key('leased')
+
+        def build(call):
+            if call('HGET', task_key, 'token') != task.token or call('ZSCORE', leased_key, task.task_id) is None:
+                return None, False
+            return [('ZREM', leased_key, task.task_id)] + commands, True
+
+        return self.client.transaction([task_key, leased_key], build)[1]
+
+    def extend(self, task, visibility_timeout=600):
+        task_key = self._key(f'task:{task.task_id}')
+        leased_key = self._key('leased')
+
+        def build(call):
+            if call('HGET', task_key, 'token') != task.token or call('ZSCORE', leased_key, task.task_id) is None:
+                return None, False
+            return [('ZADD', leased_key, time.time() + visibility_timeout, task.task_id)], True
+
+        return self.client.transaction([task_key, leased_key], build)[1]
+
+    def ack(self, task, node_id, result=None):
+        task_key = self._key(f'task:{task.task_id}')
+        done = self._finish(task, [
+            ('HSET', task_key, 'state', 'done', 'token', '',
+             'result', json.dumps(result, ensure_ascii=False) if result else ''),
+            ('HINCRBY', self._key('stats'), 'done', 1),
+            ('HINCRBY', self._key('nodes_done'), node_id, 1),
+            ('HSET', self._key('node_seen'), node_id, time.time()),
+        ])
+        if not done:
+            logger.warning(f"租约已失效，确认被忽略: {task}")
+
+    def nack(self, task, node_id, error=None, retry_delay=0, permanent=False):
+        task_key = self._key(f'task:{task.task_id}')
+        commands = [('HSET', task_key, 'token', '', 'last_error', error or '')]
+        if permanent or task.attempts >= self.max_attempts:
+            commands += [
+                ('HSET', task_key, 'state', 'failed'),
+                ('HINCRBY', self._key('stats'), 'failed', 1),
+                ('HINCRBY', self._key('nodes_failed'), node_id, 1),
+            ]
+        else:
+            commands.append(('ZADD', self._key('pending'), time.time() + retry_delay, task.task_id))
+        self._finish(task, commands)
+
+    def stats(self):
+        counters = self.client.execute('HGETALL', self._key('stats')) or []
+        counters = dict(zip(counters[::2], counters[1::2]))
+        stats = {
+            "pending": self.client.execute('ZCARD', self._key('pending')),
+            "leased": self.client.execute('ZCARD', self._key('leased')),
+            "done": int(counters.get('done', 0)),
+            "failed": int(counters.get('failed', 0)),
+        }
+        stats["total"] = self.client.execute('SCARD', self._key('urls'))
+        nodes = {}
+        for field, key in (('done', 'nodes_done'), ('failed', 'nodes_failed'), ('last_seen', 'node_seen')):
+            values = self.client.execute('HGETALL', self._key(key)) or []
+            for node, value in zip(values[::2], values[1::2]):
+                entry = nodes.setdefault(node, {"done": 0, "failed": 0, "last_seen": None})
+                entry[field] = float(value) if field == 'last_seen' else int(value)
+        stats["nodes"] = nodes
+        return stats
+
+    def close(self):
+        self.client.close_connection()
+
+
+def open_work_queue(spec, name="default", max_attempts=3):
+    """根据队列地址创建队列后端
+
+    Args:
+        spec (str): 队列地址。"redis://[:password@]host:port/db" 使用Redis协议后端，
+            "sqlite:///path/queue.db" 或普通文件路径使用SQLite后端。
+        name (str, optional): 队列名称，同一后端可容纳多个队列。默认为"default"。
+        max_attempts (int, optional): 单个任务的最大尝试次数。默认为3。
+
+    Returns:
+        WorkQueue: 队列实例
+    """
+    parsed = urllib.parse.urlsplit(spec)
+    if parsed.scheme == 'redis':
+        db = int(parsed.path.strip('/') or 0)
+        client = RespClient(parsed.hostname or '127.0.0.1', parsed.port or 6379, db, parsed.password)
+        return RedisWorkQueue(client, name=name, max_attempts=max_attempts)
+    if parsed.scheme == 'sqlite':
+        return SQLiteWorkQueue(parsed.path, name=name, max_attempts=max_attempts)
+    return SQLiteWorkQueue(spec, name=name, max_attempts=max_attempts)
+
+
+def run_worker(crawler, queue, output_dir, formats, download_media=False, download_videos=False,
+               node_id=None, visibility_timeout=600, poll_interval=2, exit_when_empty=True, max_tasks=None):
+    """分布式工作节点主循环：从共享队列租用URL并处理，结果写入共享输出目录
+
+    Args:
+        crawler (WeChatArticleCrawler): 爬虫实例
+        queue (WorkQueue): 共享任务队列
+        output_dir (str): 共享输出根目录，结果写入 <output_dir>/queue_<队列名>/
+        formats (list): 已规范化的输出格式列表（见 normalize_formats）
+        download_media (bool, optional): 是否下载媒体文件。默认为False。
+        download_videos (bool, optional): 是否下载视频。默认为False。
+        node_id (str, optional): 节点ID。默认为 主机名-进程号。
+        visibility_timeout (int, optional): 租约时长（秒），处理期间心跳线程会自动续约。默认为600。
+        poll_interval (float, optional): 队列为空时的轮询间隔（秒）。默认为2。
+        exit_when_empty (bool, optional): 队列中没有待处理和处理中的任务时退出。默认为True。
+        max_tasks (int, optional): 处理任务数上限。默认为None不限制。
+
+    Returns:
+        dict: 本节点的处理统计
+    """
+    node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue_root = os.path.join(output_dir, f"queue_{queue.name}")
+    os.makedirs(queue_root, exist_ok=True)
+    summary_path = os.path.join(queue_root, f"summary_{node_id}.md")
+    if not os.path.exists(summary_path):
+        with open(summary_path, 'w', encoding='utf-8') as log:
+            log.write(f"# 节点 {node_id} 处理结果\n\n")
+
+    processed = {"success": 0, "failed": 0, "unchanged": 0}
+    last_report = 0
+    logger.info(f"工作节点启动 [节点: {node_id}, 队列: {queue.name}, 输出: {queue_root}]")
+
+    while max_tasks is None or sum(processed.values()) < max_tasks:
+        task = queue.lease(node_id, visibility_timeout)
+        if task is None:
+            stats = queue.stats()
+            if exit_when_empty and stats["pending"] == 0 and stats["leased"] == 0:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        # 心跳线程：处理期间定期续约，避免长时间的媒体下载导致任务被其他节点重复领取
+        finished = threading.Event()
+
+        def heartbeat():
+            while not finished.wait(visibility_timeout / 3):
+                if not queue.extend(task, visibility_timeout):
+                    break
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+
+        article_id = f"article_{task.task_id}"
+        try:
+            entry = crawler.process_article(
+                task.url,
+                article_id,
+                os.path.join(queue_root, article_id),
+                formats,
+                download_media=download_media,
+                download_videos=download_videos,
+                media_folder=os.path.join(queue_root, "media", article_id) if download_media else None
+            )
+        finally:
+            finished.set()
+            heartbeat_thread.join()
+
+        crawler._write_summary_entry(summary_path, task.task_id, entry, queue_root, download_media, download_videos)
+        metrics.record_article(entry)
+        if entry["success"]:
+            queue.ack(task, node_id, {
+                "title": entry.get("title"),
+                "article_folder": entry.get("article_folder"),
+                "node": node_id
+            })
+            processed["unchanged" if entry.get("unchanged") else "success"] += 1
+        else:
+            # 文章页面返回404等不可重试的状态，或文章已删除，重新入队也不会成功
+            permanent = entry.get("permanent") or retry_policy.is_permanent(entry.get("retries"), task.url)
+            queue.nack(task, node_id, entry.get("error"), retry_delay=crawler.retry_delay * task.attempts,
+                       permanent=permanent)
+            processed["failed"] += 1
+
+        # 定期输出所有节点的汇总进度
+        if time.time() - last_report >= 30:
+            last_report = time.time()
+            stats = queue.stats()
+            logger.info(
+                f"[节点 {node_id}] 全局进度: 完成 {stats['done']}/{stats['total']}, "
+                f"失败 {stats['failed']}, 处理中 {stats['leased']}, 待处理 {stats['pending']}"
+            )
+
+    logger.info(f"工作节点退出 [节点: {node_id}, 成功: {processed['success']}, 失败: {processed['failed']}]")
+    return processed